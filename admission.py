@@ -0,0 +1,286 @@
+# admission.py
+"""
+Admission control for the endpoints that wait on slow dependencies.
+
+/process waits on Gemini, /preview on pdflatex and /download-docx on soffice.
+Without limits a slow dependency holds every worker thread and the rest of the
+app stalls behind it. Each endpoint class gets its own concurrency limit and a
+bounded wait queue. Requests that cannot be served in time get an immediate
+503 with Retry-After instead of queueing:
+
+  - the queue is full,
+  - the expected wait (queue position x recent service time) exceeds
+    ADMISSION_MAX_QUEUE_SECONDS, or
+  - the request waited that long (or until its deadline) without a slot.
+
+Queued requests are served round-robin across clients (X-Session-Id, else the
+client address), and each client may hold at most ADMISSION_QUEUE_PER_CLIENT
+queue entries per class, so one session that sends many requests can neither
+push the others to the back of the queue nor fill it and get them shed.
+
+Limits (0 concurrency disables the limit for that endpoint class):
+  ADMISSION_PROCESS_CONCURRENCY / ADMISSION_PROCESS_QUEUE  (/process)
+  ADMISSION_PREVIEW_CONCURRENCY / ADMISSION_PREVIEW_QUEUE  (/preview, /preview/documents)
+  ADMISSION_DOCX_CONCURRENCY / ADMISSION_DOCX_QUEUE        (/download-docx)
+
+Under gunicorn a queued request still holds a worker thread, so the defaults
+(ADMISSION_LIMITS) are derived from GUNICORN_THREADS: in flight plus queued
+across all classes stays below the thread count, leaving threads free for
+/healthz, static files and the other endpoints. The async app holds a queued
+request as a coroutine rather than a thread and uses the larger
+ASYNC_ADMISSION_LIMITS; the same variables override both.
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+
+from observability import get_logger, metrics
+
+# --- Configuration ---
+GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", "8"))  # Threads per worker (gunicorn.conf.py)
+CLASS_SHARES = {"process": 3, "preview": 2, "docx": 1}  # Sixths of the admitted threads per class
+# class -> (concurrency, queue size) for the async app, where waiting costs no thread
+ASYNC_DEFAULT_LIMITS = {"process": (64, 128), "preview": (16, 32), "docx": (8, 16)}
+
+
+def thread_limits(threads):
+    """
+    Default (concurrency, queue size) per class for a worker with `threads`
+    threads. A quarter of the threads (at least 2) is never admitted, so the
+    totals stay below `threads` from 4 threads up; 8 threads: 2+1, 1+1, 1+0.
+    """
+    budget = max(len(CLASS_SHARES), threads - max(2, threads // 4))
+    limits = {}
+    for name, share in CLASS_SHARES.items():
+        slots = max(1, budget * share // 6)
+        queue = max(1 if slots > 1 else 0, slots // 3)
+        limits[name] = (slots - queue, queue)
+    return limits
+
+
+def admission_limits(defaults):
+    """`defaults` with the ADMISSION_<CLASS>_CONCURRENCY / _QUEUE overrides applied."""
+    return {name: (int(os.getenv(f"ADMISSION_{name.upper()}_CONCURRENCY", str(concurrency))),
+                   int(os.getenv(f"ADMISSION_{name.upper()}_QUEUE", str(queue_size))))
+            for name, (concurrency, queue_size) in defaults.items()}
+
+
+ADMISSION_LIMITS = admission_limits(thread_limits(GUNICORN_THREADS))  # Flask app, one thread per request
+ASYNC_ADMISSION_LIMITS = admission_limits(ASYNC_DEFAULT_LIMITS)       # Quart app (asgi.py)
+ADMISSION_MAX_QUEUE_SECONDS = float(os.getenv("ADMISSION_MAX_QUEUE_SECONDS", "5"))
+# Queue entries one client may hold per class (default: half the queue, at least 1)
+ADMISSION_QUEUE_PER_CLIENT = int(os.getenv("ADMISSION_QUEUE_PER_CLIENT", "0"))
+
+# View function name -> endpoint class (the same names in app.py and asgi.py)
+ADMISSION_ENDPOINTS = {
+    "process_resume": "process",
+    "preview_latex": "preview",
+    "create_preview_document": "preview",
+    "patch_preview_document": "preview",
+    "download_docx": "docx",
+}
+
+SESSION_HEADER = "X-Session-Id"
+SERVICE_SMOOTHING = 0.2  # Weight of the newest sample in the service time average
+MAX_RETRY_AFTER = 60
+
+logger = get_logger('admission')
+
+metrics.describe("resume_tailor_admission_requests_total", "Requests by endpoint class and admission result.")
+metrics.describe("resume_tailor_admission_queue_seconds", "Time admitted requests waited for a slot.")
+metrics.describe("resume_tailor_admission_queue_depth", "Requests waiting for a slot.")
+metrics.describe("resume_tailor_admission_in_flight", "Requests holding a slot.")
+
+
+class Overloaded(Exception):
+    """A request shed by admission control. `retry_after` is in whole seconds."""
+
+    def __init__(self, endpoint, reason, retry_after):
+        super().__init__(f"The {endpoint} service is busy, retry in {retry_after}s.")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """A queued request. Threads wait on `event`; coroutines on `future`."""
+
+    def __init__(self, client, future=None):
+        self.client = client
+        self.granted = False
+        self.event = None if future is not None else threading.Event()
+        self.future = future
+
+    def notify(self):
+        if self.future is None:
+            self.event.set()
+        else:
+            self.future.get_loop().call_soon_threadsafe(_resolve, self.future)
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class AdmissionLimiter:
+    """
+    At most `concurrency` requests in flight and `queue_size` waiting, of which
+    at most `per_client` from one client. A freed slot passes straight to the
+    next waiter, taking clients in turn.
+    """
+
+    def __init__(self, name, concurrency, queue_size, max_queue_seconds=ADMISSION_MAX_QUEUE_SECONDS,
+                 per_client=ADMISSION_QUEUE_PER_CLIENT):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_queue_seconds = max_queue_seconds
+        self.per_client = per_client if per_client > 0 else max(1, queue_size // 2)
+        self._active = 0
+        self._queued = 0
+        self._queues = OrderedDict()  # client -> deque of waiters, in serving order
+        self._service_seconds = None  # Smoothed time a request holds a slot
+        self._lock = threading.Lock()
+
+    def acquire(self, client, deadline=None):
+        """Blocks until admitted. Returns the admission time for release(). Raises Overloaded."""
+        started = time.monotonic()
+        waiter = self._enter(client)
+        if waiter is not None:
+            if not waiter.event.wait(self._wait_timeout(deadline)) and not self._abandon(waiter):
+                self._shed("timeout")
+        return self._admitted(started)
+
+    async def acquire_async(self, client, deadline=None):
+        """Async acquire(): waits on the event loop instead of a thread."""
+        started = time.monotonic()
+        waiter = self._enter(client, asyncio.get_running_loop().create_future())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self._wait_timeout(deadline))
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    self._shed("timeout")
+            except asyncio.CancelledError:
+                if self._abandon(waiter):
+                    # The slot was handed over as the request went away
+                    self.release(time.monotonic())
+                raise
+        return self._admitted(started)
+
+    def release(self, admitted_at):
+        """Frees the slot taken at `admitted_at`, handing it to the next waiter if any."""
+        held = time.monotonic() - admitted_at
+        with self._lock:
+            previous = self._service_seconds
+            self._service_seconds = held if previous is None else SERVICE_SMOOTHING * held + (1 - SERVICE_SMOOTHING) * previous
+            waiter = self._next_waiter_locked()
+            if waiter is None:
+                self._active -= 1
+            else:
+                waiter.granted = True
+            self._report_locked()
+        if waiter is not None:
+            waiter.notify()
+
+    def expected_wait(self, position):
+        """Seconds until the request at queue `position` (1-based) gets a slot, 0 without history."""
+        if not self._service_seconds:
+            return 0.0
+        return math.ceil(position / self.concurrency) * self._service_seconds
+
+    def _enter(self, client, future=None):
+        """Takes a free slot (returns None) or queues the request (returns its _Waiter). Raises Overloaded."""
+        with self._lock:
+            if self._active < self.concurrency and not self._queued:
+                self._active += 1
+                self._report_locked()
+                return None
+            if self._queued >= self.queue_size:
+                reason = "queue_full"
+            elif len(self._queues.get(client, ())) >= self.per_client:
+                reason = "client_queue_full"
+            elif self.expected_wait(self._queued + 1) > self.max_queue_seconds:
+                reason = "queue_time"
+            else:
+                waiter = _Waiter(client, future)
+                self._queues.setdefault(client, deque()).append(waiter)
+                self._queued += 1
+                self._report_locked()
+                return waiter
+        self._shed(reason)
+
+    def _abandon(self, waiter):
+        """Removes a waiter that gave up. Returns True if it was granted a slot in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            queue = self._queues.get(waiter.client)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                self._queued -= 1
+                if not queue:
+                    del self._queues[waiter.client]
+            self._report_locked()
+            return False
+
+    def _next_waiter_locked(self):
+        if not self._queues:
+            return None
+        client, queue = next(iter(self._queues.items()))
+        waiter = queue.popleft()
+        self._queued -= 1
+        if queue:
+            # The client's next request waits for every other client's turn
+            self._queues.move_to_end(client)
+        else:
+            del self._queues[client]
+        return waiter
+
+    def _wait_timeout(self, deadline):
+        if deadline is None:
+            return self.max_queue_seconds
+        return min(self.max_queue_seconds, deadline.remaining())
+
+    def _admitted(self, started):
+        now = time.monotonic()
+        metrics.increment("resume_tailor_admission_requests_total", endpoint=self.name, result="admitted")
+        metrics.observe("resume_tailor_admission_queue_seconds", now - started, endpoint=self.name)
+        return now
+
+    def _shed(self, reason):
+        with self._lock:
+            retry_after = self.expected_wait(self._queued + 1)
+        retry_after = max(1, min(MAX_RETRY_AFTER, math.ceil(retry_after or self.max_queue_seconds)))
+        metrics.increment("resume_tailor_admission_requests_total", endpoint=self.name, result=reason)
+        logger.warning(f"Shedding a {self.name} request ({reason}), retry after {retry_after}s")
+        raise Overloaded(self.name, reason, retry_after)
+
+    def _report_locked(self):
+        metrics.set_gauge("resume_tailor_admission_queue_depth", self._queued, endpoint=self.name)
+        metrics.set_gauge("resume_tailor_admission_in_flight", self._active, endpoint=self.name)
+
+
+class AdmissionControl:
+    """One AdmissionLimiter per endpoint class in `limits` ({name: (concurrency, queue_size)})."""
+
+    def __init__(self, limits=None, max_queue_seconds=ADMISSION_MAX_QUEUE_SECONDS):
+        limits = ADMISSION_LIMITS if limits is None else limits
+        self.limiters = {
+            name: AdmissionLimiter(name, concurrency, queue_size, max_queue_seconds)
+            for name, (concurrency, queue_size) in limits.items() if concurrency > 0
+        }
+
+    def for_endpoint(self, endpoint):
+        """The limiter for a Flask/Quart endpoint name, or None if it is not limited."""
+        if not endpoint:
+            return None
+        return self.limiters.get(ADMISSION_ENDPOINTS.get(endpoint.rsplit('.', 1)[-1]))
+
+def client_key(headers, remote_addr):
+    """The client a request is queued under: its tailoring session, else its address."""
+    return headers.get(SESSION_HEADER) or remote_addr or "anonymous"
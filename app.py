@@ -3,14 +3,9 @@
 import os
 import io
 import re
-import docx  # python-docx
-import PyPDF2  # PyPDF2
-import requests
-from bs4 import BeautifulSoup
-import google.generativeai as genai
-from flask import Flask, request, render_template, jsonify, send_file
+import json
+from flask import Flask, Blueprint, Request, Response, current_app, g, request, render_template, jsonify, send_file
 from dotenv import load_dotenv
-from werkzeug.utils import secure_filename # For secure file handling
 import subprocess
 import tempfile
 import uuid
@@ -18,32 +13,129 @@ import shutil
 import time
 from threading import Timer
 import atexit
+import threading
+from lazy_imports import lazy_import
+from readiness import ReadinessProbe
+from resume_parser import parse_resume
+from toolchain import ToolchainRegistry
+from resume_cache import ResumeStore, SpooledUpload, InvalidUpload
+from context_cache import ContextCache
+from jd_similarity import JobIndex, TailoredOutputCache
+from preview_documents import DocumentStore, CompiledPreviewCache, RevisionConflict, PatchError, source_hash
+from model_routing import GEMINI_MODEL, choose_route, record_failure, record_result, hit_output_limit
+from hedging import hedged_generate, start_request_deadline, clear_request_deadline, current_deadline, DeadlineExceeded
+from admission import AdmissionControl, Overloaded, client_key
+from sessions import SessionStore
+from observability import setup_logging, metrics, span, timed, record_gemini_usage
+
+# Heavy modules are imported on first use so workers boot quickly
+docx = lazy_import('docx')  # python-docx
+PyPDF2 = lazy_import('PyPDF2')
+requests = lazy_import('requests')
+genai = lazy_import('google.generativeai')
+keyword_match = lazy_import('keyword_match')  # NumPy
+docx_patch = lazy_import('docx_patch')  # lxml
 
 # --- Configuration ---
 load_dotenv()  # Load environment variables from .env file
+logger = setup_logging()  # Leveled logger; records are written by a background thread
 
-app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 # Limit file size (e.g., 16MB)
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024 # Limit file size (e.g., 16MB)
+MAX_FORM_MEMORY_SIZE = 2 * 1024 * 1024  # Non-file form fields (job description, LaTeX) held in memory
 # Only allow docx files
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
 ALLOWED_EXTENSIONS = {'docx'}
-
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Tailor SUMMARY and SKILLS with one structured Gemini request instead of two
+GEMINI_COMBINED_MODE = os.getenv("GEMINI_COMBINED_MODE", "true").lower() in ("1", "true", "yes")
+# Give each worker process its own upload directory (set by gunicorn.conf.py)
+UPLOAD_PER_PROCESS = os.getenv("UPLOAD_PER_PROCESS", "false").lower() in ("1", "true", "yes")
+# Concurrent pdflatex/soffice subprocesses allowed per process
+COMPILE_CONCURRENCY = int(os.getenv("COMPILE_CONCURRENCY", str(os.cpu_count() or 2)))
+
+# Per-process state, (re)built by init_worker()
+resume_store = None    # Uploads stored by content hash and parsed once per distinct file
+session_store = None   # Parsed documents kept server-side between /process and /download-docx
+readiness = None       # Background warm-up (toolchain detection, Gemini client) reported by /readyz
+toolchain = None       # pdflatex/soffice/docx2pdf capabilities, probed once and shared across workers on disk
+compile_slots = None   # Bounds concurrent compiler subprocesses
+admission = None       # Per-endpoint concurrency limits and wait queues (503 when shed)
+job_contexts = None    # Job descriptions uploaded once as Gemini cached content, shared by section prompts
+preview_documents = None  # Revisioned LaTeX sources edited through PATCH /preview/documents/<id>
+preview_cache = None      # Compiled /preview results by source hash
+job_index = None          # Near-duplicate job descriptions mapped to a canonical posting
+tailored_outputs = None   # Tailored sections by canonical posting and resume sections
 
 # --- Gemini API Configuration ---
-try:
-    gemini_api_key = os.getenv("GEMINI_API_KEY")
-    if not gemini_api_key:
-        print("Error: GEMINI_API_KEY not found in .env file.")
-        gemini_model = None
-    else:
-        genai.configure(api_key=gemini_api_key)
-        # Use a free, capable model like gemini-1.5-flash
-        gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-        print("Gemini Model configured successfully.")
-except Exception as e:
-    print(f"Error configuring Gemini API: {e}")
-    gemini_model = None
+# Configured on first use by get_gemini_model(); assign a model here to override it
+gemini_model = None
+_gemini_configured = False
+_gemini_models = {}  # Model name -> GenerativeModel created here (see get_gemini_model_for)
+_gemini_lock = threading.Lock()
+
+def get_gemini_model():
+    """Returns the Gemini model, configuring the client on first call. None if unavailable."""
+    global gemini_model, _gemini_configured
+    if gemini_model is None and not _gemini_configured:
+        with _gemini_lock:
+            if gemini_model is None and not _gemini_configured:
+                try:
+                    gemini_api_key = os.getenv("GEMINI_API_KEY")
+                    if not gemini_api_key:
+                        logger.error("GEMINI_API_KEY not found in .env file.")
+                    else:
+                        genai.configure(api_key=gemini_api_key)
+                        # Use a free, capable model like gemini-1.5-flash (GEMINI_MODEL)
+                        gemini_model = _gemini_models[GEMINI_MODEL] = genai.GenerativeModel(GEMINI_MODEL)
+                        logger.info("Gemini Model configured successfully.")
+                except Exception as e:
+                    logger.error(f"Error configuring Gemini API: {e}")
+                _gemini_configured = True
+    return gemini_model
+
+def get_gemini_model_for(route):
+    """The model serving a model_routing.Route. An assigned gemini_model override serves every route."""
+    model = get_gemini_model()
+    if model is None or model is not _gemini_models.get(GEMINI_MODEL):
+        return model
+    with _gemini_lock:
+        routed = _gemini_models.get(route.model_name)
+        if routed is None:
+            routed = _gemini_models[route.model_name] = genai.GenerativeModel(route.model_name)
+    return routed
+
+def shared_job_context(route, model, shared):
+    """
+    Resolves `shared` = (system instruction, context text, short prompt) to
+    (model, prompt) on the route's shared context, or None to send the full prompt.
+    """
+    if shared is None or job_contexts is None:
+        return None
+    system_instruction, context_text, short_prompt = shared
+    context = job_contexts.get(route.model_name, model, system_instruction, context_text,
+                               own_client=model is _gemini_models.get(route.model_name),
+                               deadline=current_deadline())
+    return (context.model, short_prompt) if context is not None else None
+
+def routed_generate(call, text_chars, prompt, make_config, shared=None):
+    """
+    Sends a Gemini request on the route chosen for `call` and the size of the
+    text being rewritten. make_config(max_output_tokens) builds the generation config.
+    With `shared` (see shared_job_context) the job description is read from a
+    context uploaded once instead of being sent with every prompt.
+    """
+    route = choose_route(call, text_chars)
+    model = get_gemini_model_for(route)
+    model, prompt = shared_job_context(route, model, shared) or (model, prompt)
+    started = time.monotonic()
+    try:
+        response = hedged_generate(model, prompt, call,
+                                   generation_config=make_config(route.max_output_tokens))
+    except Exception as e:
+        record_failure(route, e)
+        raise
+    record_result(route, response, time.monotonic() - started)
+    return response
 
 # --- Helper Functions ---
 
@@ -52,153 +144,6 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def parse_resume(file_path):
-    """
-    Parses resume file (PDF or DOCX) and attempts to extract text and basic sections.
-    Returns a dictionary of sections or {"ERROR": "message"}.
-    """
-    text = ""
-    try:
-        file_ext = file_path.rsplit('.', 1)[1].lower()
-        if file_ext == 'docx':
-            doc = docx.Document(file_path)
-            full_text = [para.text for para in doc.paragraphs]
-            text = '\n'.join(full_text)
-        elif file_ext == 'pdf':
-            try:
-                with open(file_path, 'rb') as f:
-                    reader = PyPDF2.PdfReader(f)
-                    if reader.is_encrypted:
-                         # Attempt to decrypt with an empty password, might fail
-                         try:
-                             reader.decrypt('')
-                         except Exception as decrypt_err:
-                             print(f"Could not decrypt PDF: {decrypt_err}")
-                             return {"ERROR": "Could not decrypt password-protected PDF."}
-
-                    full_text = []
-                    for page_num, page in enumerate(reader.pages):
-                        try:
-                            full_text.append(page.extract_text())
-                        except Exception as page_extract_err:
-                             print(f"Warning: Could not extract text from PDF page {page_num + 1}: {page_extract_err}")
-                             # Optionally add placeholder or skip page
-                    text = '\n'.join(filter(None, full_text)) # Filter out None results if extraction failed on a page
-            except PyPDF2.errors.PdfReadError as pdf_err:
-                 print(f"Error reading PDF: {pdf_err}")
-                 return {"ERROR": f"Invalid or corrupted PDF file: {pdf_err}"}
-        else:
-            return {"ERROR": "Unsupported file type"}
-
-        if not text.strip():
-            return {"ERROR": "Could not extract text from file. It might be image-based, empty, or corrupted."}
-
-        # --- Basic Section Extraction (Improved Heuristic) ---
-        parsed_data = {}
-        # Regex to find potential section headers (e.g., all caps, or Title Case followed by newline)
-        # This is still a heuristic and might misinterpret lines.
-        # Prioritize common section names first.
-        common_sections = [
-            "SUMMARY", "PROFILE", "OBJECTIVE",
-            "EXPERIENCE", "EMPLOYMENT HISTORY", "WORK HISTORY",
-            "EDUCATION",
-            "KEY SKILLS", "SKILLS", "TECHNICAL SKILLS", "COMPETENCIES",
-            "PROJECTS",
-            "CERTIFICATIONS", "LICENSES",
-            "AWARDS", "HONORS",
-            "PUBLICATIONS",
-            "REFERENCES" # Often excluded or just a note
-        ]
-        # Normalize text slightly for matching
-        normalized_text = "\n" + text.strip() + "\n" # Add newlines for boundary matching
-        section_indices = {}
-
-        # Find indices of common sections first
-        for section in common_sections:
-            # Search for the section name possibly followed by variations (e.g., space, colon) and newline
-            # Case-insensitive search
-            pattern = re.compile(r'\n\s*(' + re.escape(section) + r'[:\s]*)\n', re.IGNORECASE | re.MULTILINE)
-            match = pattern.search(normalized_text)
-            if match:
-                # Store the start index and the matched header text (preserving original case if possible)
-                section_indices[match.start(1)] = match.group(1).strip()
-
-        # Sort found sections by their appearance order
-        sorted_indices = sorted(section_indices.keys())
-
-        # Extract content between sections
-        last_index = 0
-        current_section_name = "HEADER" # Content before the first recognized section
-
-        for i, index in enumerate(sorted_indices):
-            header_text = section_indices[index]
-            content = normalized_text[last_index:index].strip()
-
-            # Assign content to the previous section name
-            if content:
-                 # Normalize common section names for consistency
-                 normalized_section_name = current_section_name.upper()
-                 if "EXPERIENCE" in normalized_section_name or "EMPLOYMENT" in normalized_section_name or "WORK HISTORY" in normalized_section_name:
-                     normalized_section_name = "EXPERIENCE"
-                 elif "EDUCATION" in normalized_section_name:
-                     normalized_section_name = "EDUCATION"
-                 elif normalized_section_name == "KEY SKILLS":
-                     normalized_section_name = "KEY SKILLS"  # Preserve KEY SKILLS as distinct
-                 elif "SKILLS" in normalized_section_name or "TECHNICAL" in normalized_section_name or "COMPETENCIES" in normalized_section_name:
-                     normalized_section_name = "SKILLS"
-                 elif "SUMMARY" in normalized_section_name or "OBJECTIVE" in normalized_section_name or "PROFILE" in normalized_section_name:
-                     normalized_section_name = "SUMMARY"
-                 elif "PROJECTS" in normalized_section_name:
-                     normalized_section_name = "PROJECTS"
-                 # Add more normalizations if needed
-
-                 parsed_data[normalized_section_name] = content
-
-            # Update for the next iteration
-            current_section_name = header_text # Use the found header as the next section name
-            last_index = index + len(header_text) # Start next content search after the header
-
-        # Add the content after the last found section
-        final_content = normalized_text[last_index:].strip()
-        if final_content:
-             # Normalize the last section name as well
-             normalized_section_name = current_section_name.upper()
-             if "EXPERIENCE" in normalized_section_name or "EMPLOYMENT" in normalized_section_name or "WORK HISTORY" in normalized_section_name:
-                 normalized_section_name = "EXPERIENCE"
-             elif "EDUCATION" in normalized_section_name:
-                 normalized_section_name = "EDUCATION"
-             elif normalized_section_name == "KEY SKILLS":
-                 normalized_section_name = "KEY SKILLS"  # Preserve KEY SKILLS as distinct
-             elif "SKILLS" in normalized_section_name or "TECHNICAL" in normalized_section_name or "COMPETENCIES" in normalized_section_name:
-                 normalized_section_name = "SKILLS"
-             elif "SUMMARY" in normalized_section_name or "OBJECTIVE" in normalized_section_name or "PROFILE" in normalized_section_name:
-                 normalized_section_name = "SUMMARY"
-             elif "PROJECTS" in normalized_section_name:
-                 normalized_section_name = "PROJECTS"
-
-             parsed_data[normalized_section_name] = final_content
-
-        # If no sections were found, put everything under "FULL_TEXT"
-        if not parsed_data and text.strip():
-             parsed_data["FULL_TEXT"] = text.strip()
-             # Remove the default "HEADER" if it's empty and we have FULL_TEXT
-             if "HEADER" in parsed_data and not parsed_data["HEADER"]:
-                 del parsed_data["HEADER"]
-
-        # Remove empty sections
-        parsed_data = {k: v for k, v in parsed_data.items() if v and v.strip()}
-
-        print(f"Parsed Sections: {list(parsed_data.keys())}")
-        if not parsed_data:
-             return {"ERROR": "Parsing finished, but no content sections were identified."}
-
-        return parsed_data
-
-    except Exception as e:
-        print(f"Error parsing resume {file_path}: {e}")
-        import traceback
-        traceback.print_exc() # Print detailed traceback for debugging
-        return {"ERROR": f"An unexpected error occurred during parsing: {e}"}
 
 def escape_latex_text(text):
     """Basic LaTeX escaping for text content."""
@@ -240,6 +185,7 @@ def escape_latex_text(text):
     
     return text
 
+@timed("latex_build")
 def convert_to_latex(parsed_data):
     """Converts parsed resume data into a basic LaTeX string using a template."""
     if "ERROR" in parsed_data:
@@ -410,128 +356,109 @@ def convert_to_latex(parsed_data):
             latex_string += f"\n\\section{{{escaped_name}}}\n{escaped_content}\n"
 
     latex_string += "\n\\end{document}\n"
-    print("LaTeX conversion complete.")
+    logger.debug("LaTeX conversion complete.")
     return latex_string
 
 
 def scrape_job_description(url):
     """Scrapes the main job description text from a URL using basic heuristics."""
+    from http_cache import get_http_client, ResponseTooLarge
+    from jd_extract import extract_job_text, clean_job_text, ExtractionError
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Referer': 'https://www.google.com/' # Sometimes helps
-        }
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+        # Shared pooled client with an on-disk cache (raises HTTPError for 4xx or 5xx)
+        response = get_http_client().get(url, timeout=15)
+        if response.from_cache:
+            logger.info(f"Serving job posting from HTTP cache: {url}")
 
         # Check content type - only parse HTML
         content_type = response.headers.get('Content-Type', '').lower()
         if 'html' not in content_type:
              return f"ERROR: URL points to non-HTML content ({content_type})"
 
-        soup = BeautifulSoup(response.content, 'html.parser')
-
         # --- Job Description Extraction Logic (Heuristics - Needs Improvement) ---
-        job_text = ""
-        selectors = [
-            'div[class*="job-description"]', 'div[id*="job-description"]',
-            'div[class*="jobdescription"]', 'div[id*="jobdescription"]',
-            'div[class*="job-details"]', 'div[id*="job-details"]',
-            'div[class*="jobDetails"]', 'div[id*="jobDetails"]',
-            'section[class*="job-description"]', 'article[class*="job-description"]',
-            'div[role="main"]', # Common on some platforms
-            'main'
-        ]
-
-        potential_containers = []
-        for selector in selectors:
-            try:
-                elements = soup.select(selector)
-                if elements:
-                    potential_containers.extend(elements)
-            except Exception as e:
-                print(f"Warning: CSS selector '{selector}' failed: {e}")
-
-
-        if potential_containers:
-            # Find the container with the most text content, preferring deeper elements
-            best_container = max(potential_containers, key=lambda tag: len(tag.get_text(strip=True, separator=' ')))
-            # Clean the chosen container before extracting text
-            for element in best_container(['script', 'style', 'button', 'input', 'nav', 'header', 'footer', 'aside', 'form', 'figure', 'img']):
-                element.decompose()
-            job_text = best_container.get_text(separator='\n', strip=True)
-        else:
-            # Fallback: Get text from body, after cleaning common noise tags
-            print("Warning: Could not find specific job description container via selectors. Falling back to cleaned body text.")
-            body = soup.find('body')
-            if body:
-                for element in body(['script', 'style', 'nav', 'header', 'footer', 'aside', 'form', 'figure', 'img', 'button', 'input', 'svg']):
-                    element.decompose()
-                job_text = body.get_text(separator='\n', strip=True)
-                # Basic cleaning (remove excessive blank lines)
-                job_text = re.sub(r'\n\s*\n', '\n', job_text)
-            else:
-                return "ERROR: Could not find body tag in HTML."
+        try:
+            job_text = extract_job_text(response.content, response.url)
+        except ExtractionError as e:
+            return f"ERROR: {e}"
 
         # Further cleaning: remove short lines that are likely remnants of UI elements
-        job_text_lines = [line for line in job_text.split('\n') if len(line.strip()) > 10 or line.strip().endswith(':')]
-        job_text = '\n'.join(job_text_lines)
-
+        job_text = clean_job_text(job_text)
+        if job_index is not None:
+            # Makes the posting canonical for pasted copies of it (or maps it to one seen before)
+            job_index.canonicalize(job_text)
 
         if len(job_text) < 150: # Increased threshold
-             print(f"Warning: Extracted text seems too short ({len(job_text)} chars). Scraping might have failed or the description is minimal.")
+             logger.warning(f"Extracted text seems too short ({len(job_text)} chars). Scraping might have failed or the description is minimal.")
              # Consider returning error if too short: return "ERROR: Extracted text too short, likely failed."
 
-        print(f"Scraped job description (length: {len(job_text)} chars)")
+        logger.info(f"Scraped job description (length: {len(job_text)} chars)")
         return job_text
 
     except requests.exceptions.Timeout:
-        print(f"Error fetching URL {url}: Timeout")
+        logger.warning(f"Error fetching URL {url}: Timeout")
         return "ERROR: The request timed out."
+    except ResponseTooLarge as e:
+        logger.warning(f"Error fetching URL {url}: {e}")
+        return f"ERROR: The page is too large to process. {e}"
     except requests.exceptions.HTTPError as e:
-        print(f"Error fetching URL {url}: HTTP {e.response.status_code}")
+        logger.warning(f"Error fetching URL {url}: HTTP {e.response.status_code}")
         return f"ERROR: Could not fetch URL (HTTP {e.response.status_code}). Check the URL or website permissions."
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching URL {url}: {e}")
+        logger.warning(f"Error fetching URL {url}: {e}")
         return f"ERROR: Could not fetch URL: {e}"
     except Exception as e:
-        print(f"Error scraping job description: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error scraping job description: {e}")
         return f"ERROR: Failed to scrape or parse the page: {e}"
 
 
-def tailor_section_with_gemini(section_name, section_content, job_description):
-    """Uses Gemini to tailor a resume section based on the job description."""
-    if not gemini_model:
-        return "ERROR: Gemini model not configured."
-    if not section_content or not section_content.strip():
-        return "ERROR: Section content is empty."
-    if not job_description or not job_description.strip():
-        return "ERROR: Job description is empty."
+@timed("sanitize")
+def sanitize_tailored_content(tailored_content):
+    """Strips placeholders, suggestions and stray headers from Gemini output and normalizes LaTeX lists."""
+    # Remove any suggestion patterns
+    tailored_content = re.sub(r'\[Suggest.*?\]', '', tailored_content)
+    tailored_content = re.sub(r'\(e\.g\.,.*?\)', '', tailored_content)
+    tailored_content = re.sub(r'\(add.*?\)', '', tailored_content)
+
+    # Remove text in brackets, parentheses that suggest edits/additions
+    tailored_content = re.sub(r'\[.*?\]', '', tailored_content) # Remove any [text]
+    tailored_content = re.sub(r'\(.*?\)', '', tailored_content) # Remove any (text)
+    tailored_content = re.sub(r'<.*?>', '', tailored_content)   # Remove any <text>
+    # Remove common placeholder patterns
+    tailored_content = re.sub(r'(?i)(insert|add|include|write|describe|specify|enter|input|your|paste|put)(\s+.*?)(here|below|above)', '', tailored_content)
+    # Remove "TODO" style comments
+    tailored_content = re.sub(r'(?i)(todo|note|fixme|xxx|placeholder).*?\n', '', tailored_content)
+    # Remove lines with common placeholder indicators
+    tailored_content = re.sub(r'.*\.\.\.$', '', tailored_content, flags=re.MULTILINE)
+    tailored_content = re.sub(r'.*_+.*', '', tailored_content, flags=re.MULTILINE)
+    # Clean up any resulting empty lines
+    tailored_content = re.sub(r'\n\s*\n+', '\n\n', tailored_content)
+    tailored_content = tailored_content.strip()
+
+    # Remove any section headers that might have been included
+    tailored_content = re.sub(r'^\\section.*?$', '', tailored_content, flags=re.MULTILINE)
+    tailored_content = re.sub(r'^\\section\*.*?$', '', tailored_content, flags=re.MULTILINE)
+
+    # Ensure proper list formatting
+    if '\\item' in tailored_content:
+        # If content contains \item but no list environment, wrap it in itemize
+        if not (r'\begin{itemize}' in tailored_content and r'\end{itemize}' in tailored_content):
+            tailored_content = r'\begin{itemize}' + '\n' + tailored_content + '\n' + r'\end{itemize}'
 
-    print(f"Tailoring section '{section_name}' with Gemini...")
+    # Fix any double-escaped backslashes
+    tailored_content = tailored_content.replace(r'\\textbackslash{}', r'\textbackslash{}')
+    tailored_content = tailored_content.replace(r'\\&', r'\&')
+    tailored_content = tailored_content.replace(r'\\%', r'\%')
+    tailored_content = tailored_content.replace(r'\\$', r'\$')
+    tailored_content = tailored_content.replace(r'\\#', r'\#')
+    tailored_content = tailored_content.replace(r'\\_', r'\_')
+    tailored_content = tailored_content.replace(r'\\{', r'\{')
+    tailored_content = tailored_content.replace(r'\\}', r'\}')
 
-    # For KEY SKILLS and SUMMARY sections, return the original content with proper LaTeX formatting
-    if section_name in ["KEY SKILLS", "SUMMARY"]:
-        # Convert the content to a proper LaTeX list if it contains bullet points
-        lines = [line.strip() for line in section_content.split('\n') if line.strip()]
-        if section_name == "KEY SKILLS" or any(line.startswith(('•', '*', '-')) for line in lines):
-            formatted_content = r'\begin{itemize}' + '\n'
-            for line in lines:
-                # Remove any existing bullets and add LaTeX bullet
-                line = line.replace('•', '').replace('*', '').replace('-', '').strip()
-                formatted_content += r'  \item ' + escape_latex_text(line) + '\n'
-            formatted_content += r'\end{itemize}'
-        else:
-            # If no bullet points, keep as paragraph
-            formatted_content = escape_latex_text(section_content)
-        return formatted_content
+    return tailored_content
 
-    # Construct a more detailed prompt for other sections
-    prompt = f"""
+
+# Instruction block of the single-section prompt; also the system instruction of its shared context
+SECTION_INSTRUCTIONS = """
 You are an expert resume writer and career coach. Your task is to rewrite the following resume section to be more impactful and specifically tailored to the provided job description.
 
 **Instructions:**
@@ -547,110 +474,122 @@ You are an expert resume writer and career coach. Your task is to rewrite the fo
     - Preserve the exact job title and company name from the original
     - Keep the dates exactly as they appear in the original
     - Format each experience as:
-      \\textbf{{Job Title}} \\hfill \\textit{{Date}}
-      \\textbf{{Company Name}}
-      \\begin{{itemize}}
+      \\textbf{Job Title} \\hfill \\textit{Date}
+      \\textbf{Company Name}
+      \\begin{itemize}
       \\item First bullet point
       \\item Second bullet point
-      \\end{{itemize}}
-10. **LaTeX Escaping:** Make sure to escape special LaTeX characters like &, %, $, #, _, {{, }}, ~, ^ with a backslash. For example, write 'R\\&D' instead of 'R&D'.
+      \\end{itemize}
+10. **LaTeX Escaping:** Make sure to escape special LaTeX characters like &, %, $, #, _, {, }, ~, ^ with a backslash. For example, write 'R\\&D' instead of 'R&D'.
 11. **List Formatting:** For lists, use this exact format:
-    \\begin{{itemize}}
+    \\begin{itemize}
     \\item First item
     \\item Second item
-    \\end{{itemize}}
+    \\end{itemize}
 
-**Job Description:**
+"""
+
+def section_job_context(job_description):
+    """The job description block of the single-section prompt."""
+    return f"""**Job Description:**
 ---
 {job_description[:3000]}
 ---
-(Job description truncated if too long)
+(Job description truncated if too long)"""
 
-**Original Resume Section ({section_name}):**
+def build_section_prompt(section_name, section_content, job_description=None):
+    """
+    Builds the single-section prompt. Without `job_description` only the
+    section part is returned; the instructions and job description are then in
+    the shared context (see routed_generate).
+    """
+    section_part = f"""**Original Resume Section ({section_name}):**
 ---
 {section_content}
 ---
 
 **Rewritten Resume Section Content (LaTeX format only, no headers):**
 """
+    if job_description is None:
+        return section_part
+    return f"{SECTION_INSTRUCTIONS}{section_job_context(job_description)}\n\n{section_part}"
+
+def tailor_section_with_gemini(section_name, section_content, job_description):
+    """Uses Gemini to tailor a resume section based on the job description."""
+    model = get_gemini_model()
+    if not model:
+        return "ERROR: Gemini model not configured."
+    if not section_content or not section_content.strip():
+        return "ERROR: Section content is empty."
+    if not job_description or not job_description.strip():
+        return "ERROR: Job description is empty."
+
+    logger.info(f"Tailoring section '{section_name}' with Gemini...")
+
+    # For KEY SKILLS and SUMMARY sections, return the original content with proper LaTeX formatting
+    if section_name in ["KEY SKILLS", "SUMMARY"]:
+        # Convert the content to a proper LaTeX list if it contains bullet points
+        lines = [line.strip() for line in section_content.split('\n') if line.strip()]
+        if section_name == "KEY SKILLS" or any(line.startswith(('•', '*', '-')) for line in lines):
+            formatted_content = r'\begin{itemize}' + '\n'
+            for line in lines:
+                # Remove any existing bullets and add LaTeX bullet
+                line = line.replace('•', '').replace('*', '').replace('-', '').strip()
+                formatted_content += r'  \item ' + escape_latex_text(line) + '\n'
+            formatted_content += r'\end{itemize}'
+        else:
+            # If no bullet points, keep as paragraph
+            formatted_content = escape_latex_text(section_content)
+        return formatted_content
+
+    # Construct a more detailed prompt for other sections
+    prompt = build_section_prompt(section_name, section_content, job_description)
+    shared = (SECTION_INSTRUCTIONS, section_job_context(job_description),
+              build_section_prompt(section_name, section_content))
 
     try:
-        response = gemini_model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=1024,
-                temperature=0.7
+        with span("gemini", call="section"):
+            response = routed_generate(
+                "section", len(section_content), prompt,
+                lambda max_output_tokens: genai.types.GenerationConfig(
+                    max_output_tokens=max_output_tokens,
+                    temperature=0.7
+                ),
+                shared=shared
             )
-        )
+        record_gemini_usage(response, "section")
 
         if not response.candidates:
             feedback = response.prompt_feedback
-            print(f"Gemini Warning: No candidates generated. Feedback: {feedback}")
+            logger.warning(f"Gemini: No candidates generated. Feedback: {feedback}")
             if feedback.block_reason == 'SAFETY':
                 return f"ERROR: Content generation blocked due to safety concerns: {feedback.safety_ratings}"
             else:
                 return f"ERROR: AI model did not generate a response. Reason: {feedback.block_reason or 'Unknown'}"
 
+        if hit_output_limit(response, "section"):
+            return "ERROR: AI model response was cut off at the output token limit."
+
         if response.candidates[0].content.parts:
             tailored_content = response.text.strip()
             if not tailored_content:
-                print("Gemini Warning: Generated content is empty.")
+                logger.warning("Gemini: Generated content is empty.")
                 return "ERROR: AI model returned empty content."
 
-            # Remove any suggestion patterns
-            tailored_content = re.sub(r'\[Suggest.*?\]', '', tailored_content)
-            tailored_content = re.sub(r'\(e\.g\.,.*?\)', '', tailored_content)
-            tailored_content = re.sub(r'\(add.*?\)', '', tailored_content)
-
-            # Remove text in brackets, parentheses that suggest edits/additions
-            tailored_content = re.sub(r'\[.*?\]', '', tailored_content) # Remove any [text]
-            tailored_content = re.sub(r'\(.*?\)', '', tailored_content) # Remove any (text)
-            tailored_content = re.sub(r'<.*?>', '', tailored_content)   # Remove any <text>
-            # Remove common placeholder patterns
-            tailored_content = re.sub(r'(?i)(insert|add|include|write|describe|specify|enter|input|your|paste|put)(\s+.*?)(here|below|above)', '', tailored_content)
-            # Remove "TODO" style comments
-            tailored_content = re.sub(r'(?i)(todo|note|fixme|xxx|placeholder).*?\n', '', tailored_content)
-            # Remove lines with common placeholder indicators
-            tailored_content = re.sub(r'.*\.\.\.$', '', tailored_content, flags=re.MULTILINE)
-            tailored_content = re.sub(r'.*_+.*', '', tailored_content, flags=re.MULTILINE)
-            # Clean up any resulting empty lines
-            tailored_content = re.sub(r'\n\s*\n+', '\n\n', tailored_content)
-            tailored_content = tailored_content.strip()
-
-            # Remove any section headers that might have been included
-            tailored_content = re.sub(r'^\\section.*?$', '', tailored_content, flags=re.MULTILINE)
-            tailored_content = re.sub(r'^\\section\*.*?$', '', tailored_content, flags=re.MULTILINE)
-
-            # Ensure proper list formatting
-            if '\\item' in tailored_content:
-                # If content contains \item but no list environment, wrap it in itemize
-                if not (r'\begin{itemize}' in tailored_content and r'\end{itemize}' in tailored_content):
-                    tailored_content = r'\begin{itemize}' + '\n' + tailored_content + '\n' + r'\end{itemize}'
-
-            # Fix any double-escaped backslashes
-            tailored_content = tailored_content.replace(r'\\textbackslash{}', r'\textbackslash{}')
-            tailored_content = tailored_content.replace(r'\\&', r'\&')
-            tailored_content = tailored_content.replace(r'\\%', r'\%')
-            tailored_content = tailored_content.replace(r'\\$', r'\$')
-            tailored_content = tailored_content.replace(r'\\#', r'\#')
-            tailored_content = tailored_content.replace(r'\\_', r'\_')
-            tailored_content = tailored_content.replace(r'\\{', r'\{')
-            tailored_content = tailored_content.replace(r'\\}', r'\}')
+            tailored_content = sanitize_tailored_content(tailored_content)
 
             # Final validation - if content is empty after cleaning, return error
             if not tailored_content.strip():
                 return "ERROR: Generated content was empty or contained only placeholders."
 
-            print(f"Gemini tailoring successful for section '{section_name}'.")
+            logger.info(f"Gemini tailoring successful for section '{section_name}'.")
             return tailored_content
         else:
-            print(f"Gemini Warning: Response candidate has no content parts. Candidate: {response.candidates[0]}")
+            logger.warning(f"Gemini: Response candidate has no content parts. Candidate: {response.candidates[0]}")
             return "ERROR: AI model response structure invalid (no content parts)."
 
     except Exception as e:
-        print(f"Error calling Gemini API for section '{section_name}': {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error calling Gemini API for section '{section_name}': {e}")
         return f"ERROR: Failed to interact with AI model: {e}"
 
 
@@ -682,7 +621,7 @@ def update_latex(original_latex, section_name, tailored_content):
     match = full_pattern.search(original_latex)
 
     if not match:
-        print(f"Warning: Could not find section marker for '{section_name}' in LaTeX. Skipping update.")
+        logger.warning(f"Could not find section marker for '{section_name}' in LaTeX. Skipping update.")
         return original_latex
 
     # Get the section marker and content
@@ -695,11 +634,11 @@ def update_latex(original_latex, section_name, tailored_content):
     # Replace the old content with the new tailored content, keeping the section marker
     updated_latex = original_latex[:match.start(2)] + formatted_tailored_content + original_latex[match.end(2):]
 
-    print(f"Successfully updated section: {section_name}")
+    logger.info(f"Successfully updated section: {section_name}")
     return updated_latex
 
 
-def check_latex_packages():
+def check_latex_packages(pdflatex='pdflatex'):
     """Check if required LaTeX packages are installed and install them if needed."""
     required_packages = [
         'latex-base',
@@ -713,7 +652,7 @@ def check_latex_packages():
     
     try:
         # Check if pdflatex is installed
-        subprocess.run(['pdflatex', '--version'], capture_output=True, check=True)
+        subprocess.run([pdflatex, '--version'], capture_output=True, check=True)
         
         # Try to compile a minimal test document
         with tempfile.TemporaryDirectory() as temp_dir:
@@ -731,31 +670,33 @@ Test
 \end{document}
 """)
             try:
-                subprocess.run(['pdflatex', '-interaction=nonstopmode', test_tex], 
+                subprocess.run([pdflatex, '-interaction=nonstopmode', test_tex], 
                              cwd=temp_dir, 
                              capture_output=True, 
                              check=True)
-                print("LaTeX packages check passed")
+                logger.info("LaTeX packages check passed")
                 return True
             except subprocess.CalledProcessError as e:
-                print(f"LaTeX test compilation failed: {e.stderr}")
+                logger.error(f"LaTeX test compilation failed: {e.stderr}")
                 return False
     except subprocess.CalledProcessError:
-        print("pdflatex not found")
+        logger.error("pdflatex not found")
         return False
     except Exception as e:
-        print(f"Error checking LaTeX packages: {e}")
+        logger.error(f"Error checking LaTeX packages: {e}")
         return False
 
-def cleanup_pdf_file(file_path, delay=300):  # 5 minutes delay
+PREVIEW_PDF_LIFETIME = 300  # Seconds a preview PDF is served before cleanup_pdf_file removes it
+
+def cleanup_pdf_file(file_path, delay=PREVIEW_PDF_LIFETIME):  # 5 minutes delay
     """Delete a PDF file after a specified delay."""
     def delete_file():
         try:
             if os.path.exists(file_path):
                 os.remove(file_path)
-                print(f"Cleaned up PDF file: {file_path}")
+                logger.debug(f"Cleaned up PDF file: {file_path}")
         except Exception as e:
-            print(f"Error cleaning up PDF file {file_path}: {e}")
+            logger.error(f"Error cleaning up PDF file {file_path}: {e}")
     
     Timer(delay, delete_file).start()
 
@@ -771,15 +712,10 @@ def check_libreoffice():
             'C:\\Program Files (x86)\\LibreOffice\\program\\soffice.exe'  # Windows 32-bit
         ]
         
-        # First try which/where command
-        try:
-            if os.name == 'nt':  # Windows
-                result = subprocess.run(['where', 'soffice'], capture_output=True, text=True, check=True)
-            else:  # Unix-like
-                result = subprocess.run(['which', 'soffice'], capture_output=True, text=True, check=True)
-            return result.stdout.strip()
-        except subprocess.CalledProcessError:
-            pass
+        # First search PATH (same lookup as which/where, without a subprocess)
+        found = shutil.which('soffice')
+        if found:
+            return found
         
         # Then check common paths
         for path in possible_paths:
@@ -788,23 +724,24 @@ def check_libreoffice():
                 
         return None
     except Exception as e:
-        print(f"Error checking for LibreOffice: {e}")
+        logger.error(f"Error checking for LibreOffice: {e}")
         return None
 
 def convert_to_pdf(docx_path, output_dir):
     """Convert DOCX to PDF using available tools."""
-    soffice_path = check_libreoffice()
+    soffice_path = toolchain.path("soffice")  # A failed lookup is retried after TOOLCHAIN_FAILURE_TTL
     
     if soffice_path:
         try:
             pdf_path = os.path.join(output_dir, 'updated.pdf')
-            subprocess.run([
-                soffice_path,
-                '--headless',
-                '--convert-to', 'pdf:writer_pdf_Export',
-                '--outdir', output_dir,
-                docx_path
-            ], check=True)
+            with compile_slots, span("soffice"):
+                subprocess.run([
+                    soffice_path,
+                    '--headless',
+                    '--convert-to', 'pdf:writer_pdf_Export',
+                    '--outdir', output_dir,
+                    docx_path
+                ], check=True)
             
             # Find the generated PDF
             if not os.path.exists(pdf_path):
@@ -814,30 +751,403 @@ def convert_to_pdf(docx_path, output_dir):
                         break
             return pdf_path
         except Exception as e:
-            print(f"LibreOffice conversion failed: {e}")
+            logger.error(f"LibreOffice conversion failed: {e}")
             return None
     
     # Fallback: Try using python-docx2pdf if available
+    if not toolchain.available("docx2pdf"):
+        logger.warning("docx2pdf not installed")
+        return None
     try:
         import docx2pdf
         pdf_path = os.path.join(output_dir, 'updated.pdf')
-        docx2pdf.convert(docx_path, pdf_path)
+        with span("docx2pdf"):
+            docx2pdf.convert(docx_path, pdf_path)
         return pdf_path
     except ImportError:
-        print("docx2pdf not installed")
+        logger.warning("docx2pdf not installed")
     except Exception as e:
-        print(f"docx2pdf conversion failed: {e}")
+        logger.warning(f"docx2pdf conversion failed: {e}")
     
     return None
 
+# --- Warm-up Checks ---
+
+LATEX_INSTALL_HINT = (
+    "Required LaTeX packages may not be installed.\n"
+    "Please install the following packages:\n"
+    "  - texlive-latex-base\n"
+    "  - texlive-latex-extra\n"
+    "  - texlive-fonts-recommended\n"
+    "  - texlive-fonts-extra\n"
+    "\nOn macOS: brew install basictex\n"
+    "On Ubuntu/Debian: sudo apt-get install texlive-latex-base texlive-latex-extra texlive-fonts-recommended texlive-fonts-extra\n"
+    "On Windows: Install MiKTeX or TeX Live")
+
+def probe_pdflatex(path):
+    """Toolchain probe: compiles the test document with the located pdflatex."""
+    return {"available": check_latex_packages(path)}
+
+def check_pdflatex():
+    """Readiness check: pdflatex with the required packages, plus the install hint when unavailable."""
+    ok = toolchain.available("pdflatex")
+    if not ok:
+        logger.warning(LATEX_INSTALL_HINT)
+    return ok
+
+def locate_docx2pdf():
+    """The docx2pdf module file, found without importing it."""
+    import importlib.util
+    spec = importlib.util.find_spec('docx2pdf')
+    return spec.origin if spec is not None else None
+
+def build_toolchain_registry():
+    """Returns the ToolchainRegistry for the PDF tools. Only pdflatex needs a probe beyond locating it."""
+    registry = ToolchainRegistry()
+    registry.register("pdflatex", lambda: shutil.which('pdflatex'), probe_pdflatex)
+    registry.register("soffice", check_libreoffice, lambda path: {"available": True})
+    registry.register("docx2pdf", locate_docx2pdf, lambda path: {"available": True})
+    return registry
+
+def pdflatex_command():
+    """The pdflatex binary to run: the located path, or the bare name if it was not found."""
+    return toolchain.get("pdflatex")["path"] or 'pdflatex'
+
+def warm_imports():
+    """Imports the lazily loaded document libraries ahead of the first request."""
+    for module in (docx, PyPDF2, requests):
+        module.load()
+    return True
+
+def build_readiness_probe():
+    """Returns a ReadinessProbe with the app's warm-up checks registered."""
+    probe = ReadinessProbe()
+    probe.register("imports", warm_imports)
+    probe.register("gemini", get_gemini_model, required=True)
+    probe.register("pdflatex", check_pdflatex)
+    probe.register("soffice", lambda: toolchain.path("soffice"))
+    return probe
+
+# --- Summary & Skills Tailoring ---
+
+# Schema for the combined request: one JSON object carrying both rewritten sections.
+TAILORING_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tailored_summary": {"type": "string"},
+        "tailored_skills": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["tailored_summary", "tailored_skills"]
+}
+
+# System instruction of the shared context used by the SUMMARY and SKILLS prompts
+JOB_CONTEXT_INSTRUCTION = (
+    "You are an expert resume writer. Each request rewrites one section of a candidate's resume "
+    "to be highly tailored to the job description provided here."
+)
+
+def job_description_block(job_description):
+    """The job description part of the SUMMARY / SKILLS prompts (empty when it is in the shared context)."""
+    return "" if job_description is None else f"Job Description:\n{job_description}\n\n"
+
+def build_summary_prompt(summary, job_description=None):
+    """Builds the prompt used to tailor the SUMMARY section on its own."""
+    return f"""
+You are an expert resume writer. Rewrite the following resume summary so that it is highly tailored to the provided job description and optimized to pass Applicant Tracking Systems (ATS). Use keywords from the job description naturally. Do not include any section headers or explanations. Return only the rewritten summary text.
+
+{job_description_block(job_description)}Original Summary:
+{summary}
+
+Rewritten Summary:
+"""
+
+def build_skills_prompt(skills, job_description=None):
+    """Builds the prompt used to tailor the SKILLS section on its own."""
+    return f"""
+You are an expert resume writer. Rewrite the following skills section to be highly tailored to the provided job description. Focus on:
+1. Prioritizing skills that match the job requirements
+2. Using the exact terminology from the job description
+3. Grouping related skills together
+4. Removing irrelevant skills
+5. Adding any missing critical skills from the job description that the candidate likely has
+
+Format the output as a bullet-point list, with each skill on a new line starting with a bullet point (•). Do not include any section headers or explanations.
+
+{job_description_block(job_description)}Original Skills:
+{skills}
+
+Rewritten Skills (bullet points only):
+"""
+
+def build_combined_prompt(summary, skills, job_description):
+    """Builds a single prompt that asks for both sections as one JSON object."""
+    return f"""
+You are an expert resume writer. Rewrite the resume summary and the skills section below so that both are highly tailored to the provided job description and optimized to pass Applicant Tracking Systems (ATS).
+
+For the summary: use keywords from the job description naturally and return only the rewritten summary text.
+For the skills: prioritize skills that match the job requirements, use the exact terminology from the job description, group related skills together, remove irrelevant skills, and add any missing critical skills from the job description that the candidate likely has. Return one skill (or skill group) per array item, without bullet characters.
+
+Do not include any section headers or explanations. Respond with a JSON object with the keys "tailored_summary" (string) and "tailored_skills" (array of strings).
+
+Job Description:
+{job_description}
+
+Original Summary:
+{summary}
+
+Original Skills:
+{skills}
+"""
+
+def parse_combined_tailoring_response(response_text):
+    """
+    Validates the JSON returned by the combined request and splits it into
+    (tailored_summary, tailored_skills). Returns None if the payload is unusable.
+    """
+    if not response_text or not response_text.strip():
+        return None
+    text = response_text.strip()
+    # Tolerate a fenced ```json block even though a JSON mime type was requested
+    fence_match = re.match(r'^```(?:json)?\s*(.*?)\s*```$', text, re.DOTALL)
+    if fence_match:
+        text = fence_match.group(1)
+    try:
+        payload = json.loads(text)
+    except ValueError as e:
+        logger.warning(f"Combined tailoring response is not valid JSON: {e}")
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    summary = payload.get("tailored_summary")
+    skills = payload.get("tailored_skills")
+    if not isinstance(summary, str) or not summary.strip():
+        return None
+    if isinstance(skills, str):
+        skills = skills.split('\n')
+    if not isinstance(skills, list):
+        return None
+    skill_lines = []
+    for item in skills:
+        if not isinstance(item, str):
+            return None
+        item = item.strip().lstrip('•*-').strip()
+        if item:
+            skill_lines.append(f"• {item}")
+    if not skill_lines:
+        return None
+    return summary.strip(), '\n'.join(skill_lines)
+
+def combined_generation_config(max_output_tokens=1024):
+    """Generation settings for the structured SUMMARY + SKILLS request."""
+    return genai.types.GenerationConfig(
+        max_output_tokens=max_output_tokens,
+        temperature=0.7,
+        response_mime_type="application/json",
+        response_schema=TAILORING_RESPONSE_SCHEMA
+    )
+
+def section_generation_config(max_output_tokens=512):
+    """Generation settings for a single-section request."""
+    return genai.types.GenerationConfig(
+        max_output_tokens=max_output_tokens,
+        temperature=0.7
+    )
+
+def read_combined_tailoring_response(response):
+    """Validates a combined tailoring response. Returns (summary, skills) or None."""
+    record_gemini_usage(response, "combined")
+    if not response or not response.candidates or not response.candidates[0].content.parts:
+        logger.warning("Combined tailoring returned no content, falling back to separate requests.")
+        metrics.increment("resume_tailor_combined_fallbacks_total", reason="empty")
+        return None
+    if hit_output_limit(response, "combined"):
+        metrics.increment("resume_tailor_combined_fallbacks_total", reason="truncated")
+        return None
+    with span("sanitize"):
+        tailored = parse_combined_tailoring_response(response.text)
+    if tailored is None:
+        logger.warning("Combined tailoring response failed validation, falling back to separate requests.")
+        metrics.increment("resume_tailor_combined_fallbacks_total", reason="invalid")
+    return tailored
+
+def read_section_response(response, call):
+    """Returns the stripped text of a single-section response, or None (also when it was cut off)."""
+    record_gemini_usage(response, call)
+    if hit_output_limit(response, call):
+        return None
+    return response.text.strip() if response and hasattr(response, 'text') else None
+
+def tailor_summary_and_skills_combined(summary, skills, job_description):
+    """
+    Tailors SUMMARY and SKILLS with one structured Gemini request so the job
+    description is only sent once. Returns (summary, skills) or None on failure.
+    """
+    try:
+        with span("gemini", call="combined"):
+            response = routed_generate(
+                "combined", len(summary) + len(skills),
+                build_combined_prompt(summary, skills, job_description), combined_generation_config
+            )
+        return read_combined_tailoring_response(response)
+    except DeadlineExceeded:
+        raise  # No time left for the separate requests either
+    except Exception as e:
+        logger.warning(f"Combined tailoring request failed, falling back to separate requests: {e}")
+        metrics.increment("resume_tailor_combined_fallbacks_total", reason="error")
+        return None
+
+def tailor_summary_only(summary, job_description):
+    """Tailors SUMMARY with a single Gemini request. Returns the text or None."""
+    with span("gemini", call="summary"):
+        summary_response = routed_generate(
+            "summary", len(summary), build_summary_prompt(summary, job_description), section_generation_config,
+            shared=(JOB_CONTEXT_INSTRUCTION, job_description_block(job_description), build_summary_prompt(summary))
+        )
+    return read_section_response(summary_response, "summary")
+
+def format_skill_lines(skills):
+    """Formats a SKILLS section the way tailored skills are returned (one "• skill" per line)."""
+    lines = (line.strip().lstrip('•*-').strip() for line in skills.split('\n'))
+    return '\n'.join(f"• {line}" for line in lines if line)
+
+def tailor_summary_and_skills_separately(summary, skills, job_description):
+    """Tailors SUMMARY and SKILLS with one Gemini request each. Returns (summary, skills)."""
+    # Generate tailored summary
+    tailored_summary = tailor_summary_only(summary, job_description)
+
+    # Generate tailored skills
+    with span("gemini", call="skills"):
+        skills_response = routed_generate(
+            "skills", len(skills), build_skills_prompt(skills, job_description), section_generation_config,
+            shared=(JOB_CONTEXT_INSTRUCTION, job_description_block(job_description), build_skills_prompt(skills))
+        )
+    tailored_skills = read_section_response(skills_response, "skills")
+
+    return tailored_summary, tailored_skills
+
+# --- DOCX Section Editing ---
+
+def find_docx_section(paragraphs, section_name):
+    """
+    Locates a section in a DOCX paragraph list. Returns a dict with the header
+    index, the index where the section ends, and the style names of the header
+    and its content paragraphs, or None if the section is not found.
+    """
+    start_idx = None
+    end_idx = len(paragraphs)
+    section_style = None
+    content_styles = []
+    
+    # First pass: find section and collect styles
+    for i, para in enumerate(paragraphs):
+        if para.text.strip().upper().startswith(section_name):
+            start_idx = i
+            section_style = para.style.name if para.style is not None else None
+            # Find where section ends (next all-caps heading or end)
+            for j in range(i+1, len(paragraphs)):
+                t = paragraphs[j].text.strip()
+                if t.isupper() and len(t) > 2 and not t.startswith(section_name):
+                    end_idx = j
+                    break
+            # Collect styles of content paragraphs
+            for j in range(i+1, end_idx):
+                if paragraphs[j].text.strip():
+                    content_styles.append(paragraphs[j].style.name if paragraphs[j].style is not None else None)
+            break
+    if start_idx is None:
+        return None
+    return {
+        "start": start_idx,
+        "end": end_idx,
+        "section_style": section_style,
+        "content_styles": content_styles
+    }
+
+def index_docx_sections(doc):
+    """Builds the index of the SUMMARY and SKILLS sections that /download-docx rewrites."""
+    paragraphs = doc.paragraphs
+    return {
+        "SUMMARY": find_docx_section(paragraphs, 'SUMMARY'),
+        # Try both common names
+        "SKILLS": find_docx_section(paragraphs, 'SKILLS') or find_docx_section(paragraphs, 'KEY SKILLS')
+    }
+
+def build_docx_section_index(file_path):
+    """Loads a DOCX file and returns its section index."""
+    return index_docx_sections(docx.Document(file_path))
+
+def tailored_section_lines(tailored_summary, tailored_skills):
+    """The paragraphs that replace the SUMMARY and SKILLS content, in the order they are applied."""
+    # For skills, we want to preserve bullet point formatting
+    if not any('•' in line for line in tailored_skills.split('\n')):
+        # If no bullets in input, add them
+        tailored_skills = '\n'.join(f'• {line.strip()}' for line in tailored_skills.split('\n') if line.strip())
+    return {
+        "SUMMARY": [p.strip() for p in tailored_summary.split('\n') if p.strip()],
+        "SKILLS": [p.strip() for p in tailored_skills.split('\n') if p.strip()]
+    }
+
+def apply_tailored_sections(doc, section_index, tailored_summary, tailored_skills):
+    """Replaces the indexed SUMMARY and SKILLS content in `doc` with the tailored text."""
+    # Snapshot the paragraphs once: the index refers to the original document order
+    paragraphs = doc.paragraphs
+    for section_name, lines in tailored_section_lines(tailored_summary, tailored_skills).items():
+        section = section_index.get(section_name)
+        if not section:
+            continue
+        header = paragraphs[section["start"]]
+        if header._p.getparent() is None:
+            continue  # Header was inside a section that has already been replaced
+        # Preserve the section header
+        header.style = section["section_style"]
+
+        # Remove old content
+        for para in paragraphs[section["start"] + 1:section["end"]]:
+            if para._p.getparent() is not None:
+                para._p.getparent().remove(para._p)
+
+        # Insert new content after the header, cycling through the original content styles
+        content_styles = section["content_styles"]
+        anchor = header._p
+        for i, para_text in enumerate(lines):
+            style = content_styles[i % len(content_styles)] if content_styles else None
+            new_para = doc.add_paragraph(para_text, style=style)
+            anchor.addnext(new_para._p)  # Move after the header / previous new paragraph
+            anchor = new_para._p
+
+def build_tailored_docx(key, load, section_index, tailored_summary, tailored_skills):
+    """
+    Returns the tailored DOCX as a docx_patch.PatchedDocx. `key` identifies the
+    base resume and `load()` returns its bytes. Only document.xml is rewritten;
+    packages the patch writer cannot handle are rebuilt with python-docx.
+    """
+    patched = docx_patch.render_tailored(key, load, section_index,
+                                        tailored_section_lines(tailored_summary, tailored_skills))
+    if patched is not None:
+        return patched
+    doc = docx.Document(io.BytesIO(load()))
+    if section_index is None:
+        section_index = index_docx_sections(doc)
+    apply_tailored_sections(doc, section_index, tailored_summary, tailored_skills)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return docx_patch.PatchedDocx([buffer.getvalue()])
+
+def read_file_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
 # --- Flask Routes ---
 
-@app.route('/')
+bp = Blueprint('resume_tailor', __name__)
+
+@bp.route('/')
 def index():
     """Serves the main HTML page."""
     return render_template('index.html')
 
-@app.route('/process', methods=['POST'])
+@bp.route('/process', methods=['POST'])
 def process_resume():
     """Handles file upload, parsing, and returns tailored summary and skills."""
     if 'resume' not in request.files:
@@ -852,15 +1162,14 @@ def process_resume():
         return jsonify({"error": "Job description is required."}), 400
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        if not filename:
-            filename = "uploaded_resume.docx"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        content_hash = None
         try:
-            file.save(file_path)
-            print(f"File saved to: {file_path}")
-            # Parse resume
-            parsed_data = parse_resume(file_path)
+            with span("upload_save"):
+                content_hash, file_path = resume_store.save(file, extension)
+            logger.debug(f"File saved to: {file_path}")
+            # Parse resume (cached per distinct file content)
+            parsed_data = resume_store.parse(content_hash, parse_resume)
             if "ERROR" in parsed_data:
                 return jsonify({"error": f"Parsing failed: {parsed_data['ERROR']}"}), 400
             if not parsed_data:
@@ -876,180 +1185,315 @@ def process_resume():
                 return jsonify({"error": "No SKILLS section found in the resume."}), 400
 
             # Tailor both sections using Gemini
-            if not gemini_model:
+            if not get_gemini_model():
                 return jsonify({"error": "AI model is not configured."}), 500
 
-            # Tailor summary
-            summary_prompt = f"""
-You are an expert resume writer. Rewrite the following resume summary so that it is highly tailored to the provided job description and optimized to pass Applicant Tracking Systems (ATS). Use keywords from the job description naturally. Do not include any section headers or explanations. Return only the rewritten summary text.
-
-Job Description:
-{manual_jd}
-
-Original Summary:
-{summary}
-
-Rewritten Summary:
-"""
-            # Tailor skills
-            skills_prompt = f"""
-You are an expert resume writer. Rewrite the following skills section to be highly tailored to the provided job description. Focus on:
-1. Prioritizing skills that match the job requirements
-2. Using the exact terminology from the job description
-3. Grouping related skills together
-4. Removing irrelevant skills
-5. Adding any missing critical skills from the job description that the candidate likely has
-
-Format the output as a bullet-point list, with each skill on a new line starting with a bullet point (•). Do not include any section headers or explanations.
-
-Job Description:
-{manual_jd}
+            # Copies of a posting from other job boards use the canonical text, so keywords,
+            # the shared Gemini context and tailored sections are reused across them
+            job = job_index.canonicalize(manual_jd)
 
-Original Skills:
-{skills}
-
-Rewritten Skills (bullet points only):
-"""
+            # Local keyword coverage; also decides whether SKILLS needs rewriting at all
+            with span("keyword_match"):
+                match = keyword_match.match_resume_to_job(parsed_data, job.text)
 
             try:
-                # Generate tailored summary
-                summary_response = gemini_model.generate_content(
-                    summary_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=512,
-                        temperature=0.7
-                    )
-                )
-                tailored_summary = summary_response.text.strip() if summary_response and hasattr(summary_response, 'text') else None
-
-                # Generate tailored skills
-                skills_response = gemini_model.generate_content(
-                    skills_prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=512,
-                        temperature=0.7
-                    )
-                )
-                tailored_skills = skills_response.text.strip() if skills_response and hasattr(skills_response, 'text') else None
+                skills_covered = keyword_match.skills_cover_job(match)
+                mode = "summary" if skills_covered else "summary+skills"
+                tailored = tailored_outputs.get(job.job_id, mode, summary, skills)
+                if tailored is not None:
+                    logger.info(f"Reusing tailored sections for job description {job.job_id}")
+                elif skills_covered:
+                    logger.info("SKILLS already covers the job keywords, tailoring SUMMARY only")
+                    metrics.increment("resume_tailor_gemini_skipped_total", section="skills")
+                    tailored = tailor_summary_only(summary, job.text), format_skill_lines(skills)
+                elif GEMINI_COMBINED_MODE:
+                    tailored = tailor_summary_and_skills_combined(summary, skills, job.text)
+                if tailored is None:
+                    tailored = tailor_summary_and_skills_separately(summary, skills, job.text)
+                tailored_summary, tailored_skills = tailored
 
                 if not tailored_summary or not tailored_skills:
                     return jsonify({"error": "AI did not return complete content."}), 500
+                tailored_outputs.put(job.job_id, mode, (summary, skills), tailored)
+
+                # Keep the document server-side so /download-docx only needs the handle
+                section_index = resume_store.parse(content_hash, build_docx_section_index, kind="section_index")
+                with open(file_path, 'rb') as f:
+                    docx_bytes = f.read()
+                session_id = session_store.create(content_hash, docx_bytes, section_index, parsed_data, manual_jd)
 
                 return jsonify({
                     "tailored_summary": tailored_summary,
-                    "tailored_skills": tailored_skills
+                    "tailored_skills": tailored_skills,
+                    "session_id": session_id,
+                    "match": match
                 })
 
+            except DeadlineExceeded as e:
+                logger.warning(f"Tailoring gave up at the request deadline: {e}")
+                return jsonify({"error": f"AI request timed out: {e}"}), 504
             except Exception as e:
-                print(f"Error calling Gemini: {e}")
+                logger.error(f"Error calling Gemini: {e}")
                 return jsonify({"error": f"AI error: {e}"}), 500
 
         finally:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except OSError as e:
-                    print(f"Error removing file {file_path}: {e}")
+            if content_hash:
+                resume_store.release(content_hash)
     else:
         return jsonify({"error": "Invalid file type. Only .docx is allowed."}), 400
 
-@app.route('/preview', methods=['POST'])
-def preview_latex():
-    """Handles LaTeX preview and PDF generation."""
-    print("Received preview request")
-    latex_content = request.form.get('latex', '').strip()
-    print(f"LaTeX content length: {len(latex_content)}")
-    
-    if not latex_content:
-        print("Error: No LaTeX content provided")
-        return jsonify({"error": "No LaTeX content provided"}), 400
-
-    try:
-        # Create a temporary directory for LaTeX compilation
-        with tempfile.TemporaryDirectory() as temp_dir:
-            print(f"Created temporary directory: {temp_dir}")
-            # Generate unique filenames
-            base_name = str(uuid.uuid4())
-            tex_file = os.path.join(temp_dir, f"{base_name}.tex")
-            pdf_file = os.path.join(temp_dir, f"{base_name}.pdf")
-            log_file = os.path.join(temp_dir, f"{base_name}.log")
-
-            # Write LaTeX content to file
-            with open(tex_file, 'w', encoding='utf-8') as f:
-                f.write(latex_content)
-            print(f"Wrote LaTeX content to: {tex_file}")
-
-            # Compile LaTeX to PDF using pdflatex
-            try:
-                print("Attempting to compile LaTeX...")
-                result = subprocess.run(['pdflatex', '-interaction=nonstopmode', tex_file], 
+@bp.route('/match', methods=['POST'])
+def match_resume():
+    """
+    Scores a resume against a job description locally (no Gemini call).
+    Accepts a `session_id` from /process or a resume file, plus `job_description`.
+    """
+    job_description = request.form.get('job_description', '').strip()
+    session_id = request.form.get('session_id', '').strip()
+    if not job_description:
+        return jsonify({"error": "Job description is required."}), 400
+    if session_id:
+        session = session_store.get(session_id)
+        if session is None:
+            return jsonify({'error': 'Session expired or not found. Please upload your resume again.'}), 410
+        parsed_data = session.parsed_sections
+    else:
+        file = request.files.get('resume')
+        if not file or not allowed_file(file.filename):
+            return jsonify({"error": "A .docx resume or a session_id is required."}), 400
+        content_hash = None
+        try:
+            with span("upload_save"):
+                content_hash, _ = resume_store.save(file, file.filename.rsplit('.', 1)[1].lower())
+            parsed_data = resume_store.parse(content_hash, parse_resume)
+        finally:
+            if content_hash:
+                resume_store.release(content_hash)
+        if "ERROR" in parsed_data:
+            return jsonify({"error": f"Parsing failed: {parsed_data['ERROR']}"}), 400
+
+    with span("keyword_match"):
+        return jsonify(keyword_match.match_resume_to_job(parsed_data, job_description))
+
+@bp.app_errorhandler(InvalidUpload)
+def invalid_upload(e):
+    return jsonify({"error": e.description}), 415
+
+@bp.before_app_request
+def start_deadline():
+    start_request_deadline(request.headers)
+
+@bp.teardown_app_request
+def end_deadline(exc):
+    clear_request_deadline()
+
+@bp.before_app_request
+def start_warmup():
+    """Starts the background warm-up on the first request this process serves."""
+    if not readiness.started:
+        readiness.start()
+
+@bp.before_app_request
+def admit_request():
+    """Waits for a slot of the endpoint's class (runs before the body is read). Raises Overloaded."""
+    limiter = admission.for_endpoint(request.endpoint)
+    if limiter is not None:
+        admitted_at = limiter.acquire(client_key(request.headers, request.remote_addr), current_deadline())
+        g.admission = (limiter, admitted_at)
+
+@bp.teardown_app_request
+def release_admission(exc):
+    held = g.pop('admission', None)
+    if held is not None:
+        held[0].release(held[1])
+
+@bp.app_errorhandler(Overloaded)
+def overloaded(e):
+    return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
+
+@bp.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok", "uptime_seconds": round(time.time() - readiness.created_at, 1)})
+
+@bp.route('/readyz')
+def readyz():
+    """Readiness: warm-up has finished and required dependencies are available."""
+    status = readiness.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Exposes stage latencies, Gemini token usage and cache hit counters for Prometheus."""
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def compile_latex_preview(latex_content):
+    """
+    Compiles LaTeX to a preview PDF under static/pdfs.
+    Returns (payload, status, static PDF path or None).
+    """
+    # Create a temporary directory for LaTeX compilation
+    with tempfile.TemporaryDirectory() as temp_dir:
+        logger.debug(f"Created temporary directory: {temp_dir}")
+        # Generate unique filenames
+        base_name = str(uuid.uuid4())
+        tex_file = os.path.join(temp_dir, f"{base_name}.tex")
+        pdf_file = os.path.join(temp_dir, f"{base_name}.pdf")
+        log_file = os.path.join(temp_dir, f"{base_name}.log")
+
+        # Write LaTeX content to file
+        with open(tex_file, 'w', encoding='utf-8') as f:
+            f.write(latex_content)
+        logger.debug(f"Wrote LaTeX content to: {tex_file}")
+
+        # Compile LaTeX to PDF using pdflatex
+        try:
+            logger.debug("Attempting to compile LaTeX...")
+            with compile_slots, span("pdflatex"):
+                result = subprocess.run([pdflatex_command(), '-interaction=nonstopmode', tex_file], 
                                      cwd=temp_dir, 
                                      capture_output=True, 
                                      text=True, 
                                      check=True)
-                print("LaTeX compilation successful")
-            except subprocess.CalledProcessError as e:
-                print(f"LaTeX compilation failed: {e.stderr}")
-                # Read the log file for more detailed error information
-                error_details = ""
-                if os.path.exists(log_file):
-                    with open(log_file, 'r', encoding='utf-8') as f:
-                        error_details = f.read()
-                    print(f"LaTeX log file contents: {error_details}")
-                return jsonify({
-                    "error": f"LaTeX compilation failed: {e.stderr}",
-                    "details": error_details
-                }), 400
-
-            # Check if PDF was generated
-            if not os.path.exists(pdf_file):
-                print("Error: PDF file was not generated")
-                # Read the log file for error information
-                error_details = ""
-                if os.path.exists(log_file):
-                    with open(log_file, 'r', encoding='utf-8') as f:
-                        error_details = f.read()
-                    print(f"LaTeX log file contents: {error_details}")
-                return jsonify({
-                    "error": "PDF generation failed",
-                    "details": error_details
-                }), 500
-
-            # Create a static directory for PDFs if it doesn't exist
-            static_dir = os.path.join(app.root_path, 'static', 'pdfs')
-            os.makedirs(static_dir, exist_ok=True)
-            print(f"Created static directory: {static_dir}")
-
-            # Copy the PDF to the static directory
-            static_pdf_path = os.path.join(static_dir, f"{base_name}.pdf")
+            logger.info("LaTeX compilation successful")
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"LaTeX compilation failed: {e.stderr}")
+            # Read the log file for more detailed error information
+            error_details = ""
+            if os.path.exists(log_file):
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    error_details = f.read()
+                logger.debug(f"LaTeX log file contents: {error_details}")
+            return {
+                "error": f"LaTeX compilation failed: {e.stderr}",
+                "details": error_details
+            }, 400, None
+
+        # Check if PDF was generated
+        if not os.path.exists(pdf_file):
+            logger.error("PDF file was not generated")
+            # Read the log file for error information
+            error_details = ""
+            if os.path.exists(log_file):
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    error_details = f.read()
+                logger.debug(f"LaTeX log file contents: {error_details}")
+            return {
+                "error": "PDF generation failed",
+                "details": error_details
+            }, 500, None
+
+        # Create a static directory for PDFs if it doesn't exist
+        static_dir = os.path.join(current_app.root_path, 'static', 'pdfs')
+        os.makedirs(static_dir, exist_ok=True)
+        logger.debug(f"Created static directory: {static_dir}")
+
+        # Copy the PDF to the static directory
+        static_pdf_path = os.path.join(static_dir, f"{base_name}.pdf")
+        with span("file_serve"):
             with open(pdf_file, 'rb') as src, open(static_pdf_path, 'wb') as dst:
                 dst.write(src.read())
-            print(f"Copied PDF to: {static_pdf_path}")
+        logger.debug(f"Copied PDF to: {static_pdf_path}")
 
-            # Schedule cleanup of the PDF file
-            cleanup_pdf_file(static_pdf_path)
+        # Schedule cleanup of the PDF file
+        cleanup_pdf_file(static_pdf_path, PREVIEW_PDF_LIFETIME)
 
-            # Generate URLs for preview and download
-            preview_url = f"/static/pdfs/{base_name}.pdf"
-            download_url = f"/download/{base_name}.pdf"
-            print(f"Generated URLs - Preview: {preview_url}, Download: {download_url}")
+        # Generate URLs for preview and download
+        preview_url = f"/static/pdfs/{base_name}.pdf"
+        download_url = f"/download/{base_name}.pdf"
+        logger.info(f"Generated URLs - Preview: {preview_url}, Download: {download_url}")
 
-            return jsonify({
-                "preview_url": preview_url,
-                "download_url": download_url
-            })
+        return {
+            "preview_url": preview_url,
+            "download_url": download_url
+        }, 200, static_pdf_path
 
+def render_preview(latex_content):
+    """
+    Returns (payload, status) for a LaTeX source, reusing the compile result of
+    identical source while its PDF is still being served.
+    """
+    key = source_hash(latex_content)
+    cached = preview_cache.get(key)
+    if cached is not None:
+        logger.debug("Preview served from the compiled-output cache")
+        return cached
+    payload, status, pdf_path = compile_latex_preview(latex_content)
+    if status in (200, 400):  # Compile errors are as deterministic as successes
+        preview_cache.put(key, payload, status, pdf_path, PREVIEW_PDF_LIFETIME)
+    return payload, status
+
+@bp.route('/preview', methods=['POST'])
+def preview_latex():
+    """Handles LaTeX preview and PDF generation."""
+    logger.debug("Received preview request")
+    latex_content = request.form.get('latex', '').strip()
+    logger.debug(f"LaTeX content length: {len(latex_content)}")
+    
+    if not latex_content:
+        logger.warning("No LaTeX content provided")
+        return jsonify({"error": "No LaTeX content provided"}), 400
+
+    try:
+        payload, status = render_preview(latex_content)
+        return jsonify(payload), status
     except Exception as e:
-        print(f"Error in preview generation: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error in preview generation: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/download/<filename>')
+@bp.route('/preview/documents', methods=['POST'])
+def create_preview_document():
+    """
+    Starts a revisioned preview document from the full LaTeX source (JSON
+    {"latex"}) and compiles it. Later edits go to PATCH /preview/documents/<id>.
+    """
+    data = request.get_json(silent=True) or {}
+    latex_content = data.get('latex')
+    if not isinstance(latex_content, str) or not latex_content.strip():
+        return jsonify({"error": "No LaTeX content provided"}), 400
+    document = preview_documents.create(latex_content)
+    try:
+        payload, status = render_preview(latex_content.strip())
+    except Exception as e:
+        logger.exception(f"Error in preview generation: {e}")
+        payload, status = {"error": str(e)}, 500
+    return jsonify({**payload, "document_id": document.document_id, "revision": document.revision}), status
+
+@bp.route('/preview/documents/<document_id>', methods=['PATCH'])
+def patch_preview_document(document_id):
+    """
+    Applies text patches (JSON {"base_revision", "patches", "sha256"?}) to a
+    preview document and compiles the new revision. 409 means the client must
+    resync; 404 means it must create the document again.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('base_revision'), int):
+        return jsonify({"error": "base_revision and patches are required."}), 400
+    try:
+        updated = preview_documents.update(document_id, data['base_revision'], data.get('patches', []),
+                                           data.get('sha256'))
+    except RevisionConflict as e:
+        return jsonify({"error": str(e), "revision": e.current_revision}), 409
+    except PatchError as e:
+        return jsonify({"error": str(e)}), 400
+    if updated is None:
+        return jsonify({"error": "Document expired or not found. Create it again with the full source."}), 404
+
+    revision, latex_content = updated
+    if not latex_content.strip():
+        return jsonify({"error": "No LaTeX content provided", "document_id": document_id, "revision": revision}), 400
+    try:
+        payload, status = render_preview(latex_content.strip())
+    except Exception as e:
+        logger.exception(f"Error in preview generation: {e}")
+        payload, status = {"error": str(e)}, 500
+    return jsonify({**payload, "document_id": document_id, "revision": revision}), status
+
+@bp.route('/download/<filename>')
 def download_pdf(filename):
     """Handles PDF downloads."""
     try:
-        pdf_path = os.path.join(app.root_path, 'static', 'pdfs', filename)
+        pdf_path = os.path.join(current_app.root_path, 'static', 'pdfs', filename)
         if not os.path.exists(pdf_path):
             return jsonify({"error": "PDF not found"}), 404
         
@@ -1058,104 +1502,58 @@ def download_pdf(filename):
         
         return send_file(pdf_path, as_attachment=True, download_name=filename)
     except Exception as e:
-        print(f"Error in PDF download: {e}")
+        logger.error(f"Error in PDF download: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/download-docx', methods=['POST'])
+@bp.route('/download-docx', methods=['POST'])
 def download_docx():
     """
     Creates a new document preserving all formatting from the original,
     replacing only the summary and skills sections with tailored content.
+    Accepts either a `session_id` returned by /process or the resume file itself.
+    Returns a PDF, or the DOCX itself when `format=docx` is posted (or PDF conversion fails).
     """
-    if 'resume' not in request.files or 'tailored_summary' not in request.form or 'tailored_skills' not in request.form:
+    session_id = request.form.get('session_id', '').strip()
+    if (not session_id and 'resume' not in request.files) or 'tailored_summary' not in request.form or 'tailored_skills' not in request.form:
         return jsonify({'error': 'Missing file or tailored sections.'}), 400
-    resume_file = request.files['resume']
     tailored_summary = request.form['tailored_summary']
     tailored_skills = request.form['tailored_skills']
-    if not resume_file.filename.lower().endswith('.docx'):
+    output_format = request.form.get('format', 'pdf').strip().lower()
+    if output_format not in ('pdf', 'docx'):
+        return jsonify({'error': 'format must be pdf or docx.'}), 400
+    if not session_id and not request.files['resume'].filename.lower().endswith('.docx'):
         return jsonify({'error': 'Only .docx files are supported.'}), 400
+    content_hash = None
     try:
-        # Save uploaded docx to temp file
-        with tempfile.TemporaryDirectory() as tmpdir:
-            orig_docx_path = os.path.join(tmpdir, 'orig.docx')
-            resume_file.save(orig_docx_path)
-            
-            # Load the original document
-            doc = docx.Document(orig_docx_path)
-            
-            def find_section_with_formatting(section_name):
-                start_idx = None
-                end_idx = len(doc.paragraphs)
-                section_style = None
-                content_styles = []
-                
-                # First pass: find section and collect styles
-                for i, para in enumerate(doc.paragraphs):
-                    if para.text.strip().upper().startswith(section_name):
-                        start_idx = i
-                        section_style = para.style
-                        # Find where section ends (next all-caps heading or end)
-                        for j in range(i+1, len(doc.paragraphs)):
-                            t = doc.paragraphs[j].text.strip()
-                            if t.isupper() and len(t) > 2 and not t.startswith(section_name):
-                                end_idx = j
-                                break
-                        # Collect styles of content paragraphs
-                        for j in range(i+1, end_idx):
-                            if doc.paragraphs[j].text.strip():
-                                content_styles.append(doc.paragraphs[j].style)
-                        break
-                return start_idx, end_idx, section_style, content_styles
+        if session_id:
+            # The original document and its section index are already server-side
+            session = session_store.get(session_id)
+            if session is None:
+                return jsonify({'error': 'Session expired or not found. Please upload your resume again.'}), 410
+            docx_bytes = session.docx_bytes
+            template_key, load = session.content_hash, lambda: docx_bytes
+            section_index = session.section_index
+        else:
+            # Reuse the content-addressed copy if /process already stored these bytes
+            with span("upload_save"):
+                content_hash, orig_docx_path = resume_store.save(request.files['resume'], 'docx')
+            template_key, load = content_hash, lambda: read_file_bytes(orig_docx_path)
+            section_index = resume_store.parse(content_hash, build_docx_section_index, kind="section_index")
+
+        with span("docx_build"):
+            tailored_docx = build_tailored_docx(template_key, load, section_index, tailored_summary, tailored_skills)
+
+        if output_format == 'docx':
+            # Chunks are mostly views into the original package; nothing is assembled in memory
+            return Response(tailored_docx, mimetype=DOCX_MIMETYPE, direct_passthrough=True, headers={
+                'Content-Length': str(tailored_docx.size),
+                'Content-Disposition': 'attachment; filename=tailored_resume.docx'
+            })
 
-            def insert_formatted_content(start_idx, end_idx, content, section_style, content_styles):
-                if start_idx is None:
-                    return
-                
-                # Remove old content
-                for _ in range(end_idx - start_idx - 1):
-                    del doc.paragraphs[start_idx+1]._element
-                
-                # Split content into paragraphs
-                paragraphs = [p.strip() for p in content.split('\n') if p.strip()]
-                
-                # Insert new content with preserved formatting
-                if paragraphs:
-                    # First paragraph gets the first content style (or default if none)
-                    style = content_styles[0] if content_styles else None
-                    p = doc.add_paragraph(paragraphs[0], style=style)
-                    p._p.addnext(doc.paragraphs[start_idx]._p)  # Move after section header
-                    
-                    # Remaining paragraphs get subsequent styles (cycling if needed)
-                    for i, para_text in enumerate(paragraphs[1:], 1):
-                        style = content_styles[i % len(content_styles)] if content_styles else None
-                        p = doc.add_paragraph(para_text, style=style)
-                        p._p.addnext(doc.paragraphs[start_idx+1]._p)  # Keep in order
-
-            # Update SUMMARY section
-            summary_start, summary_end, summary_style, summary_content_styles = find_section_with_formatting('SUMMARY')
-            if summary_start is not None:
-                # Preserve the section header
-                doc.paragraphs[summary_start].style = summary_style
-                insert_formatted_content(summary_start, summary_end, tailored_summary, summary_style, summary_content_styles)
-
-            # Update SKILLS section (try both common names)
-            skills_start, skills_end, skills_style, skills_content_styles = find_section_with_formatting('SKILLS')
-            if skills_start is None:
-                skills_start, skills_end, skills_style, skills_content_styles = find_section_with_formatting('KEY SKILLS')
-            
-            if skills_start is not None:
-                # Preserve the section header
-                doc.paragraphs[skills_start].style = skills_style
-                # For skills, we want to preserve bullet point formatting
-                if not any('•' in line for line in tailored_skills.split('\n')):
-                    # If no bullets in input, add them
-                    tailored_skills = '\n'.join(f'• {line.strip()}' for line in tailored_skills.split('\n') if line.strip())
-                insert_formatted_content(skills_start, skills_end, tailored_skills, skills_style, skills_content_styles)
-
-            # Save the updated document
+        with tempfile.TemporaryDirectory() as tmpdir:
             updated_docx_path = os.path.join(tmpdir, 'updated.docx')
-            doc.save(updated_docx_path)
-            
+            tailored_docx.write_to(updated_docx_path)
+
             # Convert to PDF
             pdf_path = convert_to_pdf(updated_docx_path, tmpdir)
             
@@ -1165,7 +1563,7 @@ def download_docx():
                     updated_docx_path,
                     as_attachment=True,
                     download_name='tailored_resume.docx',
-                    mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+                    mimetype=DOCX_MIMETYPE
                 )
             
             return send_file(
@@ -1176,36 +1574,107 @@ def download_docx():
             )
             
     except Exception as e:
-        print(f'Error in /download-docx: {e}')
-        import traceback
-        traceback.print_exc()
+        logger.exception(f'Error in /download-docx: {e}')
         return jsonify({'error': str(e)}), 500
+    finally:
+        if content_hash:
+            resume_store.release(content_hash)
 
 # Add a cleanup function to run on server shutdown
 @atexit.register
 def cleanup_on_exit():
-    """Clean up all PDF files in the static/pdfs directory on server shutdown."""
-    pdf_dir = os.path.join(app.root_path, 'static', 'pdfs')
+    """Clean up all PDF files in the static/pdfs directory and cached uploads on server shutdown."""
+    if resume_store is not None:
+        resume_store.clear()
+    if job_contexts is not None:
+        job_contexts.clear()
+    if UPLOAD_PER_PROCESS:
+        try:
+            os.rmdir(resume_store.upload_folder)
+        except OSError:
+            pass
+        # Sibling workers keep serving the shared PDF directory; their files expire via cleanup_pdf_file
+        return
+    pdf_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'pdfs')
     if os.path.exists(pdf_dir):
         try:
             shutil.rmtree(pdf_dir)
-            print(f"Cleaned up PDF directory: {pdf_dir}")
+            logger.info(f"Cleaned up PDF directory: {pdf_dir}")
         except Exception as e:
-            print(f"Error cleaning up PDF directory: {e}")
+            logger.error(f"Error cleaning up PDF directory: {e}")
+
+# --- Application Factory ---
+
+class UploadRequest(Request):
+    """
+    Streams uploaded files into the resume store's folder (hashing on the way)
+    instead of Werkzeug's in-memory/temp spool, and rejects a .docx whose first
+    bytes are not a zip before the rest of the body is read.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = SpooledUpload(resume_store.upload_folder,
+                              check_signature=bool(filename) and filename.lower().endswith('.docx'))
+        self.__dict__.setdefault('_upload_spools', []).append(spool)
+        return spool
+
+    def close(self):
+        super().close()
+        # Also covers spools of a body that failed to parse (never reached request.files)
+        for spool in self.__dict__.pop('_upload_spools', ()):
+            spool.close()
+
+
+def init_worker(upload_folder=UPLOAD_FOLDER):
+    """
+    (Re)creates per-process state: upload store, sessions, warm-up probe,
+    compile slots and the Gemini client. create_app() calls it; a preforking
+    server that loads the app before forking calls it again in each worker
+    (see gunicorn.conf.py) so no locks, threads or connections are inherited.
+    """
+    global resume_store, session_store, readiness, compile_slots, job_contexts, preview_documents, preview_cache
+    global job_index, tailored_outputs, admission, toolchain
+    global gemini_model, _gemini_configured
+    if UPLOAD_PER_PROCESS:
+        # Workers evict uploads independently, so they must not share files
+        upload_folder = os.path.join(upload_folder, f"worker-{os.getpid()}")
+    resume_store = ResumeStore(upload_folder)
+    session_store = SessionStore()
+    toolchain = build_toolchain_registry()
+    readiness = build_readiness_probe()
+    compile_slots = threading.BoundedSemaphore(COMPILE_CONCURRENCY)
+    admission = AdmissionControl()
+    job_contexts = ContextCache()
+    preview_documents = DocumentStore()
+    preview_cache = CompiledPreviewCache()
+    job_index = JobIndex()
+    tailored_outputs = TailoredOutputCache()
+    with _gemini_lock:
+        if _gemini_configured:
+            # The gRPC channel is not fork-safe; configure a fresh client on first use
+            gemini_model = None
+            _gemini_configured = False
+            _gemini_models.clear()
+
+def create_app(config=None):
+    """Builds the Flask application and initializes this process's state."""
+    flask_app = Flask(__name__)
+    flask_app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+    flask_app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+    flask_app.config['MAX_FORM_MEMORY_SIZE'] = MAX_FORM_MEMORY_SIZE
+    flask_app.request_class = UploadRequest
+    if config:
+        flask_app.config.update(config)
+    flask_app.register_blueprint(bp)
+    init_worker(flask_app.config['UPLOAD_FOLDER'])
+    return flask_app
+
+app = create_app()
 
 # --- Main Execution ---
 if __name__ == '__main__':
-    # Check LaTeX packages before starting the server
-    if not check_latex_packages():
-        print("Warning: Required LaTeX packages may not be installed.")
-        print("Please install the following packages:")
-        print("  - texlive-latex-base")
-        print("  - texlive-latex-extra")
-        print("  - texlive-fonts-recommended")
-        print("  - texlive-fonts-extra")
-        print("\nOn macOS: brew install basictex")
-        print("On Ubuntu/Debian: sudo apt-get install texlive-latex-base texlive-latex-extra texlive-fonts-recommended texlive-fonts-extra")
-        print("On Windows: Install MiKTeX or TeX Live")
+    # Probe pdflatex/soffice and configure Gemini in the background while the server starts
+    readiness.start()
     
     # Set host='0.0.0.0' to make it accessible on your network (use with caution)
     # Remove debug=True for production environments
@@ -0,0 +1,505 @@
+# asgi.py
+"""
+Async serving mode for the tailoring endpoints.
+
+Same routes and responses as the Flask app, but Gemini calls use
+generate_content_async, pdflatex/soffice run through
+asyncio.create_subprocess_exec and file I/O goes through aiofiles, so one
+process can hold many in-flight requests without a thread each. CPU-bound
+parsing and DOCX rebuilding run in the default thread pool.
+
+Run with: uvicorn asgi:app --host 127.0.0.1 --port 5100
+The Flask app in app.py (wsgi:app) remains the compatibility entry point.
+"""
+
+import io
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+
+import aiofiles
+from quart import Quart, g, request, render_template, jsonify, send_file
+
+import app as core
+from observability import metrics, span
+from model_routing import choose_route, record_failure, record_result
+from hedging import hedged_generate_async, start_request_deadline, current_deadline, DeadlineExceeded
+from admission import AdmissionControl, ASYNC_ADMISSION_LIMITS, Overloaded, client_key
+
+logger = core.logger
+
+DOCX_MIMETYPE = core.DOCX_MIMETYPE
+
+app = Quart(__name__)
+app.config['MAX_CONTENT_LENGTH'] = core.MAX_CONTENT_LENGTH
+
+# Created on startup so it belongs to the serving event loop
+compile_slots = None
+# Queued requests wait as coroutines, so the limits are not bound to a thread count
+admission = AdmissionControl(ASYNC_ADMISSION_LIMITS)
+
+@app.before_serving
+async def startup():
+    global compile_slots
+    compile_slots = asyncio.Semaphore(core.COMPILE_CONCURRENCY)
+    core.readiness.start()
+
+# --- Async Helpers ---
+
+async def generate_async(call, text_chars, prompt, make_config, shared=None):
+    """Async core.routed_generate: hedged, bounded by the request deadline, without blocking the event loop."""
+    route = choose_route(call, text_chars)
+    model = core.get_gemini_model_for(route)
+    # Creating a shared context is a blocking API call (once per job description)
+    model, prompt = await asyncio.to_thread(core.shared_job_context, route, model, shared) or (model, prompt)
+    started = time.monotonic()
+    try:
+        response = await hedged_generate_async(model, prompt, call,
+                                               generation_config=make_config(route.max_output_tokens))
+    except Exception as e:
+        record_failure(route, e)
+        raise
+    record_result(route, response, time.monotonic() - started)
+    return response
+
+async def tailor_summary_and_skills_combined(summary, skills, job_description):
+    """Async version of core.tailor_summary_and_skills_combined."""
+    try:
+        with span("gemini", call="combined"):
+            response = await generate_async(
+                "combined", len(summary) + len(skills),
+                core.build_combined_prompt(summary, skills, job_description),
+                core.combined_generation_config
+            )
+        return core.read_combined_tailoring_response(response)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.warning(f"Combined tailoring request failed, falling back to separate requests: {e}")
+        metrics.increment("resume_tailor_combined_fallbacks_total", reason="error")
+        return None
+
+async def tailor_summary_only(summary, job_description):
+    """Async version of core.tailor_summary_only."""
+    with span("gemini", call="summary"):
+        response = await generate_async(
+            "summary", len(summary), core.build_summary_prompt(summary, job_description), core.section_generation_config,
+            shared=(core.JOB_CONTEXT_INSTRUCTION, core.job_description_block(job_description),
+                    core.build_summary_prompt(summary))
+        )
+    return core.read_section_response(response, "summary")
+
+async def tailor_summary_and_skills_separately(summary, skills, job_description):
+    """Async version of core.tailor_summary_and_skills_separately; both requests run concurrently."""
+    async def tailor(call, section, build_prompt):
+        shared = (core.JOB_CONTEXT_INSTRUCTION, core.job_description_block(job_description), build_prompt(section))
+        with span("gemini", call=call):
+            response = await generate_async(call, len(section), build_prompt(section, job_description),
+                                            core.section_generation_config, shared=shared)
+        return core.read_section_response(response, call)
+
+    return tuple(await asyncio.gather(
+        tailor("summary", summary, core.build_summary_prompt),
+        tailor("skills", skills, core.build_skills_prompt)
+    ))
+
+async def run_compiler(stage, args, cwd=None):
+    """
+    Runs a compiler subprocess without blocking the event loop.
+    Returns (returncode, stdout, stderr) as text.
+    """
+    async with compile_slots:
+        with span(stage):
+            process = await asyncio.create_subprocess_exec(
+                *args, cwd=cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await process.communicate()
+    return (process.returncode,
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace'))
+
+async def read_text_if_exists(path):
+    if not os.path.exists(path):
+        return ""
+    async with aiofiles.open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return await f.read()
+
+async def convert_to_pdf(docx_path, output_dir):
+    """Async version of core.convert_to_pdf (LibreOffice only; docx2pdf has no async interface)."""
+    soffice_path = await asyncio.to_thread(core.toolchain.path, "soffice")
+    if not soffice_path:
+        return None
+    try:
+        returncode, _, stderr = await run_compiler("soffice", [
+            soffice_path,
+            '--headless',
+            '--convert-to', 'pdf:writer_pdf_Export',
+            '--outdir', output_dir,
+            docx_path
+        ])
+        if returncode != 0:
+            logger.error(f"LibreOffice conversion failed: {stderr}")
+            return None
+        pdf_path = os.path.join(output_dir, 'updated.pdf')
+        if not os.path.exists(pdf_path):
+            for f in os.listdir(output_dir):
+                if f.endswith('.pdf'):
+                    return os.path.join(output_dir, f)
+            return None
+        return pdf_path
+    except Exception as e:
+        logger.error(f"LibreOffice conversion failed: {e}")
+        return None
+
+def render_tailored_docx(key, source, section_index, tailored_summary, tailored_skills):
+    """Builds the tailored DOCX and returns its bytes. `source` is a path or bytes."""
+    with span("docx_build"):
+        if isinstance(source, bytes):
+            load = lambda: source
+        else:
+            load = lambda: core.read_file_bytes(source)
+            if section_index is None:
+                section_index = core.resume_store.parse(key, core.build_docx_section_index, kind="section_index")
+        return core.build_tailored_docx(key, load, section_index, tailored_summary, tailored_skills).getvalue()
+
+# --- Routes ---
+
+@app.before_request
+async def start_deadline():
+    start_request_deadline(request.headers)
+
+@app.before_request
+async def start_warmup():
+    if not core.readiness.started:
+        core.readiness.start()
+
+@app.before_request
+async def admit_request():
+    limiter = admission.for_endpoint(request.endpoint)
+    if limiter is not None:
+        admitted_at = await limiter.acquire_async(client_key(request.headers, request.remote_addr), current_deadline())
+        g.admission = (limiter, admitted_at)
+
+@app.teardown_request
+async def release_admission(exc):
+    held = g.pop('admission', None)
+    if held is not None:
+        held[0].release(held[1])
+
+@app.errorhandler(Overloaded)
+async def overloaded(e):
+    return jsonify({"error": str(e)}), 503, {'Retry-After': str(e.retry_after)}
+
+@app.route('/')
+async def index():
+    """Serves the main HTML page."""
+    return await render_template('index.html')
+
+@app.route('/healthz')
+async def healthz():
+    return jsonify({"status": "ok", "uptime_seconds": round(time.time() - core.readiness.created_at, 1)})
+
+@app.route('/readyz')
+async def readyz():
+    status = core.readiness.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/process', methods=['POST'])
+async def process_resume():
+    """Async /process: same contract as the Flask route."""
+    files = await request.files
+    form = await request.form
+    if 'resume' not in files:
+        return jsonify({"error": "No resume file part in the request."}), 400
+
+    file = files['resume']
+    manual_jd = form.get('job_description', '').strip()
+
+    if file.filename == '':
+        return jsonify({"error": "No file selected."}), 400
+    if not manual_jd:
+        return jsonify({"error": "Job description is required."}), 400
+    if not core.allowed_file(file.filename):
+        return jsonify({"error": "Invalid file type. Only .docx is allowed."}), 400
+
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    content_hash = None
+    try:
+        with span("upload_save"):
+            content_hash, file_path = await asyncio.to_thread(core.resume_store.save, file, extension)
+        parsed_data = await asyncio.to_thread(core.resume_store.parse, content_hash, core.parse_resume)
+        if "ERROR" in parsed_data:
+            return jsonify({"error": f"Parsing failed: {parsed_data['ERROR']}"}), 400
+        if not parsed_data:
+            return jsonify({"error": "Parsing failed: No sections found in the resume."}), 400
+
+        summary = parsed_data.get("SUMMARY")
+        skills = parsed_data.get("SKILLS") or parsed_data.get("KEY SKILLS")
+        if not summary:
+            return jsonify({"error": "No SUMMARY section found in the resume."}), 400
+        if not skills:
+            return jsonify({"error": "No SKILLS section found in the resume."}), 400
+
+        if not await asyncio.to_thread(core.get_gemini_model):
+            return jsonify({"error": "AI model is not configured."}), 500
+
+        job = core.job_index.canonicalize(manual_jd)
+        with span("keyword_match"):
+            match = core.keyword_match.match_resume_to_job(parsed_data, job.text)
+
+        try:
+            skills_covered = core.keyword_match.skills_cover_job(match)
+            mode = "summary" if skills_covered else "summary+skills"
+            tailored = core.tailored_outputs.get(job.job_id, mode, summary, skills)
+            if tailored is not None:
+                logger.info(f"Reusing tailored sections for job description {job.job_id}")
+            elif skills_covered:
+                logger.info("SKILLS already covers the job keywords, tailoring SUMMARY only")
+                metrics.increment("resume_tailor_gemini_skipped_total", section="skills")
+                tailored = await tailor_summary_only(summary, job.text), core.format_skill_lines(skills)
+            elif core.GEMINI_COMBINED_MODE:
+                tailored = await tailor_summary_and_skills_combined(summary, skills, job.text)
+            if tailored is None:
+                tailored = await tailor_summary_and_skills_separately(summary, skills, job.text)
+            tailored_summary, tailored_skills = tailored
+
+            if not tailored_summary or not tailored_skills:
+                return jsonify({"error": "AI did not return complete content."}), 500
+            core.tailored_outputs.put(job.job_id, mode, (summary, skills), tailored)
+
+            section_index = await asyncio.to_thread(
+                core.resume_store.parse, content_hash, core.build_docx_section_index, "section_index")
+            async with aiofiles.open(file_path, 'rb') as f:
+                docx_bytes = await f.read()
+            session_id = await asyncio.to_thread(
+                core.session_store.create, content_hash, docx_bytes, section_index, parsed_data, manual_jd)
+
+            return jsonify({
+                "tailored_summary": tailored_summary,
+                "tailored_skills": tailored_skills,
+                "session_id": session_id,
+                "match": match
+            })
+        except DeadlineExceeded as e:
+            logger.warning(f"Tailoring gave up at the request deadline: {e}")
+            return jsonify({"error": f"AI request timed out: {e}"}), 504
+        except Exception as e:
+            logger.error(f"Error calling Gemini: {e}")
+            return jsonify({"error": f"AI error: {e}"}), 500
+    finally:
+        if content_hash:
+            core.resume_store.release(content_hash)
+
+@app.route('/match', methods=['POST'])
+async def match_resume():
+    """Async /match: same contract as the Flask route; parsing and scoring run in the thread pool."""
+    files = await request.files
+    form = await request.form
+    job_description = form.get('job_description', '').strip()
+    session_id = form.get('session_id', '').strip()
+    if not job_description:
+        return jsonify({"error": "Job description is required."}), 400
+    if session_id:
+        session = await asyncio.to_thread(core.session_store.get, session_id)
+        if session is None:
+            return jsonify({'error': 'Session expired or not found. Please upload your resume again.'}), 410
+        parsed_data = session.parsed_sections
+    else:
+        file = files.get('resume')
+        if not file or not core.allowed_file(file.filename):
+            return jsonify({"error": "A .docx resume or a session_id is required."}), 400
+        content_hash = None
+        try:
+            with span("upload_save"):
+                content_hash, _ = await asyncio.to_thread(
+                    core.resume_store.save, file, file.filename.rsplit('.', 1)[1].lower())
+            parsed_data = await asyncio.to_thread(core.resume_store.parse, content_hash, core.parse_resume)
+        finally:
+            if content_hash:
+                core.resume_store.release(content_hash)
+        if "ERROR" in parsed_data:
+            return jsonify({"error": f"Parsing failed: {parsed_data['ERROR']}"}), 400
+
+    with span("keyword_match"):
+        match = await asyncio.to_thread(core.keyword_match.match_resume_to_job, parsed_data, job_description)
+    return jsonify(match)
+
+async def compile_latex_preview(latex_content):
+    """Async core.compile_latex_preview: returns (payload, status, static PDF path or None)."""
+    temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+    try:
+        base_name = str(uuid.uuid4())
+        tex_file = os.path.join(temp_dir, f"{base_name}.tex")
+        pdf_file = os.path.join(temp_dir, f"{base_name}.pdf")
+        log_file = os.path.join(temp_dir, f"{base_name}.log")
+
+        async with aiofiles.open(tex_file, 'w', encoding='utf-8') as f:
+            await f.write(latex_content)
+
+        returncode, _, stderr = await run_compiler(
+            "pdflatex", [core.pdflatex_command(), '-interaction=nonstopmode', tex_file], cwd=temp_dir)
+        if returncode != 0:
+            logger.warning(f"LaTeX compilation failed: {stderr}")
+            return {
+                "error": f"LaTeX compilation failed: {stderr}",
+                "details": await read_text_if_exists(log_file)
+            }, 400, None
+        if not os.path.exists(pdf_file):
+            logger.error("PDF file was not generated")
+            return {
+                "error": "PDF generation failed",
+                "details": await read_text_if_exists(log_file)
+            }, 500, None
+
+        static_dir = os.path.join(app.root_path, 'static', 'pdfs')
+        os.makedirs(static_dir, exist_ok=True)
+        static_pdf_path = os.path.join(static_dir, f"{base_name}.pdf")
+        with span("file_serve"):
+            async with aiofiles.open(pdf_file, 'rb') as src, aiofiles.open(static_pdf_path, 'wb') as dst:
+                await dst.write(await src.read())
+        core.cleanup_pdf_file(static_pdf_path, core.PREVIEW_PDF_LIFETIME)
+
+        return {
+            "preview_url": f"/static/pdfs/{base_name}.pdf",
+            "download_url": f"/download/{base_name}.pdf"
+        }, 200, static_pdf_path
+    finally:
+        await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+async def render_preview(latex_content):
+    """Async core.render_preview. Returns (payload, status); errors become a 500 payload."""
+    key = core.source_hash(latex_content)
+    cached = core.preview_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        payload, status, pdf_path = await compile_latex_preview(latex_content)
+    except FileNotFoundError as e:
+        logger.error(f"pdflatex not available: {e}")
+        return {"error": str(e)}, 500
+    except Exception as e:
+        logger.exception(f"Error in preview generation: {e}")
+        return {"error": str(e)}, 500
+    if status in (200, 400):
+        core.preview_cache.put(key, payload, status, pdf_path, core.PREVIEW_PDF_LIFETIME)
+    return payload, status
+
+@app.route('/preview', methods=['POST'])
+async def preview_latex():
+    """Async /preview: compiles LaTeX with a non-blocking pdflatex subprocess."""
+    form = await request.form
+    latex_content = form.get('latex', '').strip()
+    if not latex_content:
+        return jsonify({"error": "No LaTeX content provided"}), 400
+    payload, status = await render_preview(latex_content)
+    return jsonify(payload), status
+
+@app.route('/preview/documents', methods=['POST'])
+async def create_preview_document():
+    """Async POST /preview/documents: same contract as the Flask route."""
+    data = await request.get_json(silent=True) or {}
+    latex_content = data.get('latex')
+    if not isinstance(latex_content, str) or not latex_content.strip():
+        return jsonify({"error": "No LaTeX content provided"}), 400
+    document = await asyncio.to_thread(core.preview_documents.create, latex_content)
+    payload, status = await render_preview(latex_content.strip())
+    return jsonify({**payload, "document_id": document.document_id, "revision": document.revision}), status
+
+@app.route('/preview/documents/<document_id>', methods=['PATCH'])
+async def patch_preview_document(document_id):
+    """Async PATCH /preview/documents/<id>: same contract as the Flask route."""
+    data = await request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('base_revision'), int):
+        return jsonify({"error": "base_revision and patches are required."}), 400
+    try:
+        # Waits on the store's file lock, so it runs off the event loop
+        updated = await asyncio.to_thread(core.preview_documents.update, document_id, data['base_revision'],
+                                          data.get('patches', []), data.get('sha256'))
+    except core.RevisionConflict as e:
+        return jsonify({"error": str(e), "revision": e.current_revision}), 409
+    except core.PatchError as e:
+        return jsonify({"error": str(e)}), 400
+    if updated is None:
+        return jsonify({"error": "Document expired or not found. Create it again with the full source."}), 404
+
+    revision, latex_content = updated
+    if not latex_content.strip():
+        return jsonify({"error": "No LaTeX content provided", "document_id": document_id, "revision": revision}), 400
+    payload, status = await render_preview(latex_content.strip())
+    return jsonify({**payload, "document_id": document_id, "revision": revision}), status
+
+@app.route('/download/<filename>')
+async def download_pdf(filename):
+    """Handles PDF downloads."""
+    pdf_path = os.path.join(app.root_path, 'static', 'pdfs', filename)
+    if not os.path.exists(pdf_path):
+        return jsonify({"error": "PDF not found"}), 404
+    core.cleanup_pdf_file(pdf_path)
+    return await send_file(pdf_path, as_attachment=True, attachment_filename=filename)
+
+@app.route('/download-docx', methods=['POST'])
+async def download_docx():
+    """Async /download-docx: same contract as the Flask route."""
+    files = await request.files
+    form = await request.form
+    session_id = form.get('session_id', '').strip()
+    if (not session_id and 'resume' not in files) or 'tailored_summary' not in form or 'tailored_skills' not in form:
+        return jsonify({'error': 'Missing file or tailored sections.'}), 400
+    tailored_summary = form['tailored_summary']
+    tailored_skills = form['tailored_skills']
+    output_format = form.get('format', 'pdf').strip().lower()
+    if output_format not in ('pdf', 'docx'):
+        return jsonify({'error': 'format must be pdf or docx.'}), 400
+    if not session_id and not files['resume'].filename.lower().endswith('.docx'):
+        return jsonify({'error': 'Only .docx files are supported.'}), 400
+
+    content_hash = None
+    temp_dir = None
+    try:
+        if session_id:
+            session = await asyncio.to_thread(core.session_store.get, session_id)
+            if session is None:
+                return jsonify({'error': 'Session expired or not found. Please upload your resume again.'}), 410
+            template_key, source, section_index = session.content_hash, session.docx_bytes, session.section_index
+        else:
+            with span("upload_save"):
+                content_hash, source = await asyncio.to_thread(core.resume_store.save, files['resume'], 'docx')
+            template_key, section_index = content_hash, None
+
+        docx_bytes = await asyncio.to_thread(
+            render_tailored_docx, template_key, source, section_index, tailored_summary, tailored_skills)
+        if output_format == 'docx':
+            return await send_file(io.BytesIO(docx_bytes), mimetype=DOCX_MIMETYPE,
+                                   as_attachment=True, attachment_filename='tailored_resume.docx')
+
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+        updated_docx_path = os.path.join(temp_dir, 'updated.docx')
+        async with aiofiles.open(updated_docx_path, 'wb') as f:
+            await f.write(docx_bytes)
+
+        pdf_path = await convert_to_pdf(updated_docx_path, temp_dir)
+        if not pdf_path:
+            return await send_file(io.BytesIO(docx_bytes), mimetype=DOCX_MIMETYPE,
+                                   as_attachment=True, attachment_filename='tailored_resume.docx')
+        with span("file_serve"):
+            async with aiofiles.open(pdf_path, 'rb') as f:
+                pdf_bytes = await f.read()
+        return await send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf',
+                               as_attachment=True, attachment_filename='tailored_resume.pdf')
+    except Exception as e:
+        logger.exception(f'Error in /download-docx: {e}')
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if content_hash:
+            core.resume_store.release(content_hash)
+        if temp_dir:
+            await asyncio.to_thread(shutil.rmtree, temp_dir, True)
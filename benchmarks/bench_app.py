@@ -0,0 +1,345 @@
+# benchmarks/bench_app.py
+"""
+Offline load benchmark for the tailoring endpoints.
+
+Replaces app.gemini_model with FakeGeminiModel (configurable latency and error
+distributions, canned outputs), serves the app on a local port and drives
+/process, /preview and /download-docx with concurrent clients over a generated
+corpus of DOCX resumes and job descriptions. Reports throughput, p50/p95/p99
+latency and peak RSS per endpoint. No Gemini quota is used.
+
+The admission limits are raised to --admission-concurrency (default: one slot
+per client) unless ADMISSION_* variables are set, so the app's defaults for a
+gunicorn worker do not shed the load being measured. Requests shed with a 503
+are counted apart from errors.
+
+Usage: python benchmarks/bench_app.py [--clients 8] [--requests 200] [--latency-ms 400] [--admission-concurrency N]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import requests
+from werkzeug.serving import make_server
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ENDPOINTS = ('process', 'preview', 'download-docx')
+
+# --- Gemini Stand-in ---
+
+class _Part:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Content:
+    def __init__(self, text):
+        self.parts = [_Part(text)] if text else []
+
+
+class _Candidate:
+    def __init__(self, text):
+        self.content = _Content(text)
+
+
+class _Feedback:
+    block_reason = None
+    safety_ratings = []
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    """Mimics the parts of GenerateContentResponse the app reads."""
+
+    def __init__(self, text, prompt):
+        self.text = text
+        self.candidates = [_Candidate(text)]
+        self.prompt_feedback = _Feedback()
+        # Roughly 4 characters per token, like the real tokenizer on English text
+        self.usage_metadata = _Usage(len(prompt) // 4, len(text) // 4)
+
+
+class FakeGeminiModel:
+    """
+    Drop-in replacement for genai.GenerativeModel. Each call sleeps for a
+    lognormal latency (median `latency_ms`, shape `latency_sigma`) and fails
+    with probability `error_rate`.
+    """
+
+    def __init__(self, latency_ms=400, latency_sigma=0.5, error_rate=0.0, seed=None, model_name='fake-gemini'):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.model_name = model_name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _sample(self):
+        with self._lock:
+            self.calls += 1
+            latency = self._random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000.0
+            failed = self._random.random() < self.error_rate
+        return latency, failed
+
+    def _canned_output(self, generation_config):
+        if getattr(generation_config, 'response_mime_type', None) == 'application/json':
+            return json.dumps({
+                "tailored_summary": "Backend engineer with seven years building reliable Python services, "
+                                    "data pipelines and observability tooling for high-traffic products.",
+                "tailored_skills": ["Python, Flask, FastAPI", "PostgreSQL, Redis", "Kubernetes, Docker",
+                                    "Prometheus, Grafana", "CI/CD, GitHub Actions"]
+            })
+        return ("\\begin{itemize}\n\\item Built Python services handling 10k requests per second\n"
+                "\\item Led migration of batch jobs to Kubernetes\n\\end{itemize}")
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        latency, failed = self._sample()
+        time.sleep(latency)
+        if failed:
+            raise RuntimeError("Simulated Gemini error (503 Service Unavailable)")
+        return FakeResponse(self._canned_output(generation_config), str(prompt))
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        import asyncio
+        latency, failed = self._sample()
+        await asyncio.sleep(latency)
+        if failed:
+            raise RuntimeError("Simulated Gemini error (503 Service Unavailable)")
+        return FakeResponse(self._canned_output(generation_config), str(prompt))
+
+# --- Fixture Corpus ---
+
+SKILL_POOL = ["Python", "Flask", "Django", "PostgreSQL", "Redis", "Kubernetes", "Docker", "AWS", "GCP",
+              "Terraform", "Kafka", "Spark", "Airflow", "React", "TypeScript", "Go", "gRPC", "Prometheus"]
+VERBS = ["Built", "Designed", "Led", "Migrated", "Optimized", "Automated", "Scaled", "Owned"]
+OBJECTS = ["payment APIs", "data pipelines", "search ranking", "CI/CD pipelines", "observability stack",
+           "customer onboarding flow", "batch ETL jobs", "internal developer platform"]
+
+
+def build_resume_docx(rng, index):
+    """Returns the bytes of a synthetic resume with SUMMARY, SKILLS, EXPERIENCE and EDUCATION."""
+    document = docx.Document()
+    document.add_paragraph(f"Candidate {index}")
+    document.add_paragraph(f"candidate{index}@example.com")
+    document.add_paragraph("SUMMARY")
+    document.add_paragraph(f"Software engineer with {rng.randint(2, 15)} years of experience in "
+                           f"{', '.join(rng.sample(SKILL_POOL, 3))}.")
+    document.add_paragraph("SKILLS")
+    for skill in rng.sample(SKILL_POOL, rng.randint(5, 10)):
+        document.add_paragraph(f"• {skill}")
+    document.add_paragraph("EXPERIENCE")
+    for job in range(rng.randint(2, 5)):
+        document.add_paragraph(f"Senior Engineer, Company {job}")
+        document.add_paragraph(f"{2010 + job * 3} - {2013 + job * 3}")
+        for _ in range(rng.randint(3, 8)):
+            document.add_paragraph(f"• {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(SKILL_POOL)}")
+    document.add_paragraph("EDUCATION")
+    document.add_paragraph("B.Sc. Computer Science - 2009")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def build_job_description(rng):
+    """Returns a synthetic job description of a few hundred words."""
+    skills = rng.sample(SKILL_POOL, 8)
+    lines = [f"We are hiring a Senior Backend Engineer to work on {rng.choice(OBJECTS)}.", "Responsibilities:"]
+    lines += [f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} with {rng.choice(skills)}" for _ in range(rng.randint(8, 20))]
+    lines.append("Requirements:")
+    lines += [f"- {rng.randint(2, 8)}+ years of experience with {skill}" for skill in skills]
+    return "\n".join(lines)
+
+
+def build_corpus(size, seed):
+    """Builds `size` (resume bytes, job description) pairs deterministically."""
+    rng = random.Random(seed)
+    return [(build_resume_docx(rng, i), build_job_description(rng)) for i in range(size)]
+
+# --- Load Generation ---
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (includes the in-process server)."""
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float('nan')
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def run_endpoint(base_url, endpoint, corpus, latex_docs, sessions, clients, total_requests, timeout):
+    """Sends `total_requests` requests to one endpoint from `clients` threads. Returns a stats dict."""
+    latencies = []
+    errors = 0
+    shed = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one_request(i):
+        nonlocal errors, shed
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        resume_bytes, job_description = corpus[i % len(corpus)]
+        start = time.perf_counter()
+        try:
+            if endpoint == 'process':
+                response = local.session.post(f"{base_url}/process", timeout=timeout,
+                                              files={'resume': ('resume.docx', resume_bytes)},
+                                              data={'job_description': job_description})
+            elif endpoint == 'preview':
+                response = local.session.post(f"{base_url}/preview", timeout=timeout,
+                                              data={'latex': latex_docs[i % len(latex_docs)]})
+            else:
+                session_id = sessions[i % len(sessions)] if sessions else None
+                data = {'tailored_summary': 'Tailored summary text.', 'tailored_skills': 'Python\nKubernetes'}
+                files = None
+                if session_id:
+                    data['session_id'] = session_id
+                else:
+                    files = {'resume': ('resume.docx', resume_bytes)}
+                response = local.session.post(f"{base_url}/download-docx", timeout=timeout, data=data, files=files)
+            status = response.status_code
+        except requests.RequestException:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if status == 503:
+                shed += 1  # Admission control turned it away
+            elif status is None or status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one_request, range(total_requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": f"/{endpoint}",
+        "requests": total_requests,
+        "errors": errors,
+        "shed": shed,
+        "throughput_rps": round(total_requests / wall, 2) if wall else float('nan'),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients per endpoint')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated subset of: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--corpus-size', type=int, default=20, help='Number of generated resume/JD pairs')
+    parser.add_argument('--latency-ms', type=float, default=400, help='Median fake Gemini latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Lognormal shape of the fake latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Probability a fake Gemini call fails')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request client timeout (seconds)')
+    parser.add_argument('--admission-concurrency', type=int, default=None,
+                        help='Admission concurrency and queue per endpoint class (default: --clients; 0 removes the limit)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    args = parser.parse_args()
+
+    endpoints = [e.strip().lstrip('/') for e in args.endpoints.split(',') if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # As a gunicorn worker: otherwise app's exit cleanup deletes static/pdfs of the checkout
+    os.environ.setdefault('UPLOAD_PER_PROCESS', '1')
+    admitted = args.clients if args.admission_concurrency is None else args.admission_concurrency
+    for name in ('PROCESS', 'PREVIEW', 'DOCX'):
+        os.environ.setdefault(f'ADMISSION_{name}_CONCURRENCY', str(admitted))
+        os.environ.setdefault(f'ADMISSION_{name}_QUEUE', str(admitted))
+    import app as app_module
+
+    app_module.gemini_model = FakeGeminiModel(args.latency_ms, args.latency_sigma, args.error_rate, seed=args.seed)
+
+    corpus = build_corpus(args.corpus_size, args.seed)
+    latex_docs = []
+    for resume_bytes, _ in corpus[:5]:
+        path = os.path.join(app_module.app.config['UPLOAD_FOLDER'], f"bench-{len(latex_docs)}.docx")
+        with open(path, 'wb') as f:
+            f.write(resume_bytes)
+        try:
+            latex_docs.append(app_module.convert_to_latex(app_module.parse_resume(path)))
+        finally:
+            os.remove(path)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # Per-request access lines would dominate the output
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # /download-docx is driven through session handles, as the UI does
+    sessions = []
+    if 'download-docx' in endpoints:
+        for resume_bytes, job_description in corpus[:args.clients]:
+            response = requests.post(f"{base_url}/process", files={'resume': ('resume.docx', resume_bytes)},
+                                     data={'job_description': job_description}, timeout=args.timeout)
+            if response.ok and response.json().get('session_id'):
+                sessions.append(response.json()['session_id'])
+
+    # Only the PDFs this run compiles are removed afterwards
+    pdf_dir = os.path.join(os.path.dirname(os.path.abspath(app_module.__file__)), 'static', 'pdfs')
+    existing_pdfs = set(os.listdir(pdf_dir)) if os.path.isdir(pdf_dir) else set()
+
+    results = []
+    try:
+        for endpoint in endpoints:
+            stats = run_endpoint(base_url, endpoint, corpus, latex_docs, sessions,
+                                 args.clients, args.requests, args.timeout)
+            results.append(stats)
+            if args.json:
+                print(json.dumps(stats))
+    finally:
+        server.shutdown()
+        if os.path.isdir(pdf_dir):
+            for name in set(os.listdir(pdf_dir)) - existing_pdfs:
+                os.remove(os.path.join(pdf_dir, name))
+
+    if not args.json:
+        print(f"{'endpoint':<15} {'reqs':>6} {'errors':>6} {'shed':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak RSS MB':>12}")
+        for stats in results:
+            print(f"{stats['endpoint']:<15} {stats['requests']:>6} {stats['errors']:>6} {stats['shed']:>6} {stats['throughput_rps']:>8} "
+                  f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['peak_rss_mb']:>12}")
+        print(f"fake Gemini calls: {app_module.gemini_model.calls}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_context.py
+"""
+Offline check of the shared job description context (context_cache.py).
+
+Tailors SUMMARY and SKILLS with separate requests for several resumes per job
+description, once with GEMINI_CONTEXT_CACHE=off and once with the local
+backend, and records every prompt the app hands to a model. Reports the calls
+made on a shared context and the prompt characters sent per call (what goes
+over the wire with the gemini backend). Exits with status 1 if a call on a
+shared context carries more than its own section prompt.
+
+Usage: python benchmarks/bench_context.py [--jobs 5] [--resumes 4]
+"""
+
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_app import FakeGeminiModel, SKILL_POOL, build_job_description
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=5, help='Distinct job descriptions')
+    parser.add_argument('--resumes', type=int, default=4, help='Resumes tailored per job description')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # As a gunicorn worker: otherwise app's exit cleanup deletes static/pdfs of the checkout
+    os.environ.setdefault('UPLOAD_PER_PROCESS', '1')
+    import app as app_module
+    from context_cache import ContextCache, LocalContextModel
+
+    rng = random.Random(args.seed)
+    jobs = [build_job_description(rng) for _ in range(args.jobs)]
+    resumes = [(f"Software engineer with {rng.randint(2, 15)} years of experience in "
+                f"{', '.join(rng.sample(SKILL_POOL, 3))}.",
+                "\n".join(f"• {skill}" for skill in rng.sample(SKILL_POOL, 6)))
+               for _ in range(args.resumes)]
+
+    sent = []  # (model, prompt) for every Gemini call
+    hedged_generate = app_module.hedged_generate
+
+    def recording_generate(model, prompt, call, **kwargs):
+        sent.append((model, prompt))
+        return hedged_generate(model, prompt, call, **kwargs)
+
+    app_module.hedged_generate = recording_generate
+    app_module.gemini_model = FakeGeminiModel(latency_ms=1, seed=args.seed)
+
+    failures = []
+    print(f"{args.jobs} job descriptions x {args.resumes} resumes, SUMMARY and SKILLS tailored separately")
+    print(f"{'backend':<8} {'calls':>6} {'shared':>7} {'contexts':>9} {'chars/call':>11}")
+    for backend in ('off', 'local'):
+        app_module.job_contexts = ContextCache(backend=backend)
+        sent.clear()
+        for job_description in jobs:
+            for summary, skills in resumes:
+                app_module.tailor_summary_and_skills_separately(summary, skills, job_description)
+                expected = (app_module.build_summary_prompt(summary), app_module.build_skills_prompt(skills))
+                for model, prompt in sent[-2:]:
+                    if isinstance(model, LocalContextModel) and prompt not in expected:
+                        failures.append(f"{backend}: a call on a shared context sent {len(prompt)} characters "
+                                        f"instead of its section prompt")
+        shared = sum(isinstance(model, LocalContextModel) for model, _ in sent)
+        chars = sum(len(prompt) for _, prompt in sent) / max(1, len(sent))
+        print(f"{backend:<8} {len(sent):>6} {shared:>7} {len(app_module.job_contexts._contexts):>9} {chars:>11.0f}")
+        if backend == 'local' and shared == 0:
+            failures.append("local: no call used a shared context")
+
+    for failure in failures:
+        print(f"FAILED {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_extract.py
+"""
+Benchmarks job description extraction on the saved job-board pages in
+benchmarks/fixtures/job_pages, comparing the lxml engine with the
+BeautifulSoup (html.parser) fallback.
+
+Usage: python benchmarks/bench_extract.py [--repeat N]
+"""
+
+import io
+import os
+import sys
+import glob
+import time
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jd_extract
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'job_pages')
+
+
+def time_engine(engine, html, url, repeat):
+    """Returns (best seconds per call, extracted text) for one engine on one page."""
+    best = float('inf')
+    text = None
+    for _ in range(repeat):
+        # Silence the extractor's own warnings so they don't skew the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            text = engine(html, url)
+            best = min(best, time.perf_counter() - start)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per page and engine (best time is reported)')
+    args = parser.parse_args()
+
+    engines = [('bs4', jd_extract._extract_with_bs4)]
+    if jd_extract.HAS_LXML:
+        engines.append(('lxml', jd_extract._extract_with_lxml))
+    else:
+        print("lxml is not installed; only the BeautifulSoup engine is benchmarked.")
+
+    print(f"{'fixture':<32} {'engine':<6} {'ms/page':>9} {'chars':>7}")
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            html = f.read()
+        name = os.path.basename(path)
+        url = f"https://jobs.example.com/{name}"
+        results = {}
+        for engine_name, engine in engines:
+            seconds, text = time_engine(engine, html, url, args.repeat)
+            results[engine_name] = text
+            print(f"{name:<32} {engine_name:<6} {seconds * 1000:>9.2f} {len(text):>7}")
+        if len(set(results.values())) > 1:
+            print(f"  note: engines disagree on {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# benchmarks/bench_http.py
+"""
+Offline benchmark for the job posting HTTP client (http_cache.CachedHttpClient).
+
+Serves the saved pages in benchmarks/fixtures/job_pages from a local HTTP
+stand-in with a configurable origin latency, ETags and keep-alive, then
+fetches them with:
+
+  requests.get  - a new connection per fetch, no cache (the old behaviour)
+  revalidate    - the pooled client with a TTL of 0: every fetch is a 304
+  cached        - the pooled client with fresh entries: no request at all
+  pruned        - distinct URLs past --max-entries, to check the cache cap
+
+Reports ms per fetch (p50, p95), requests and connections seen by the origin,
+and the cache size on disk. No network access is needed.
+
+Usage: python benchmarks/bench_http.py [--fetches 200] [--latency-ms 50] [--max-entries 32]
+"""
+
+import os
+import sys
+import glob
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import http_cache
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'job_pages')
+
+# --- Origin Stand-in ---
+
+class OriginStats:
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+def make_origin(pages, latency, stats):
+    """A keep-alive HTTP server that serves `pages` ({name: bytes}) at /<name>/<anything> after `latency` seconds."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, like a real job board
+        disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+        def setup(self):
+            super().setup()
+            stats.add(connections=1)
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = pages.get(self.path.split('/')[1])
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                stats.add(requests=1)
+                return
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                stats.add(requests=1, not_modified=1)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+            stats.add(requests=1)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- Fetch Modes ---
+
+def plain_get(url):
+    response = requests.get(url, headers=http_cache.DEFAULT_HEADERS, timeout=15)
+    response.raise_for_status()
+    return response.content
+
+
+def run(label, fetch, urls, stats, cache_dir=None):
+    stats.requests = stats.not_modified = stats.connections = 0
+    timings = []
+    for url in urls:
+        start = time.perf_counter()
+        fetch(url)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000
+    entries, size = '-', '-'
+    if cache_dir is not None:
+        names = [name for name in os.listdir(cache_dir) if name.endswith('.json')]
+        entries = len(names)
+        size = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+    print(f"{label:<14} {p50:>8.2f} {p95:>8.2f} {stats.requests:>9} {stats.not_modified:>5} "
+          f"{stats.connections:>6} {entries:>8} {size:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fetches', type=int, default=200, help='Fetches per mode')
+    parser.add_argument('--latency-ms', type=float, default=50, help='Origin latency per request')
+    parser.add_argument('--max-entries', type=int, default=32, help='Cache entry cap for the pruned mode')
+    args = parser.parse_args()
+
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    stats = OriginStats()
+    server = make_origin(pages, args.latency_ms / 1000.0, stats)
+    base = f"http://127.0.0.1:{server.server_port}"
+    names = list(pages)
+    repeated = [f"{base}/{names[i % len(names)]}/posting" for i in range(args.fetches)]
+    distinct = [f"{base}/{names[i % len(names)]}/{i}" for i in range(args.fetches)]
+
+    print(f"{len(pages)} fixture pages, {args.fetches} fetches per mode, origin latency {args.latency_ms:.0f} ms")
+    print(f"{'mode':<14} {'p50 ms':>8} {'p95 ms':>8} {'requests':>9} {'304s':>5} {'conns':>6} {'entries':>8} {'disk bytes':>10}")
+    run('requests.get', plain_get, repeated, stats)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = http_cache.CachedHttpClient(cache_dir=cache_dir, ttl=0)
+        for url in set(repeated):
+            client.get(url)  # Fill the cache so every timed fetch revalidates
+        run('revalidate', client.get, repeated, stats, cache_dir)
+        client.close()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = http_cache.CachedHttpClient(cache_dir=cache_dir, ttl=3600)
+        for url in set(repeated):
+            client.get(url)
+        run('cached', client.get, repeated, stats, cache_dir)
+        client.close()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        client = http_cache.CachedHttpClient(cache_dir=cache_dir, ttl=3600, max_entries=args.max_entries)
+        run('pruned', client.get, distinct, stats, cache_dir)
+        client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_import.py
+"""
+Measures worker boot cost: wall time of `import app` in a fresh interpreter,
+the slowest modules from `python -X importtime`, and how long the background
+warm-up takes until /readyz reports it complete.
+
+Usage: python benchmarks/bench_import.py [--repeat 5] [--top 10]
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+WARMUP_SNIPPET = """
+import time, json
+t = time.perf_counter()
+import app
+imported = time.perf_counter() - t
+client = app.app.test_client()
+client.get('/healthz')
+while True:
+    status = client.get('/readyz').get_json()
+    if status['warmup'] == 'complete':
+        break
+    time.sleep(0.01)
+print(json.dumps({'import': imported, 'warm': time.perf_counter() - t, 'status': status}))
+"""
+
+
+def run_python(args):
+    # As a gunicorn worker: otherwise app's exit cleanup deletes static/pdfs of the checkout
+    env = dict(os.environ, LOG_LEVEL='CRITICAL', UPLOAD_PER_PROCESS='1')
+    return subprocess.run([sys.executable] + args, cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_times(repeat):
+    """Returns the in-process import time of app.py for `repeat` fresh interpreters."""
+    return [float(run_python(['-c', IMPORT_SNIPPET]).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+
+
+def slowest_imports(top):
+    """Parses -X importtime output and returns the `top` modules by cumulative time."""
+    stderr = run_python(['-X', 'importtime', '-c', 'import app']).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level; keep direct imports of app and its children
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters to time')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    times = import_times(args.repeat)
+    print(f"import app: median {statistics.median(times) * 1000:.0f} ms, "
+          f"min {min(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms ({args.repeat} runs)")
+
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, self_us, name in slowest_imports(args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    result = json.loads(run_python(['-c', WARMUP_SNIPPET]).stdout.strip().splitlines()[-1])
+    print(f"\nWarm-up: import {result['import'] * 1000:.0f} ms, warm-up complete after {result['warm'] * 1000:.0f} ms")
+    for name, check in result['status']['checks'].items():
+        print(f"  {name:<10} {check['state']:<12} {check.get('seconds', 0) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_ranking.py
+"""
+Builds a synthetic ResumeIndex and times top-k queries against it.
+
+Usage: python benchmarks/bench_ranking.py [--docs 100000] [--queries 20] [--top 20]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resume_ranking import ResumeIndex
+
+SKILLS = ["Python", "Java", "Go", "Rust", "TypeScript", "JavaScript", "React", "Django", "Flask", "Spring",
+          "PostgreSQL", "MySQL", "MongoDB", "Redis", "Kafka", "Spark", "Airflow", "Snowflake", "AWS", "Azure",
+          "GCP", "Docker", "Kubernetes", "Terraform", "Ansible", "Jenkins", "CI/CD", "Prometheus", "Grafana",
+          "machine learning", "PyTorch", "TensorFlow", "pandas", "NumPy", "SQL", "GraphQL", "gRPC", "Linux"]
+WORDS = ["built", "designed", "led", "migrated", "optimized", "automated", "scaled", "services", "pipelines",
+         "platform", "APIs", "dashboards", "latency", "throughput", "customers", "reliability", "migration",
+         "billing", "search", "payments", "analytics", "ingestion", "streaming", "batch", "mobile", "frontend"]
+
+
+def synthetic_resume(rng):
+    skills = rng.sample(SKILLS, rng.randint(5, 12))
+    experience = []
+    for _ in range(rng.randint(4, 12)):
+        experience.append(' '.join(rng.sample(WORDS, 5) + rng.sample(skills, 2)))
+    return {
+        "SUMMARY": f"Engineer with {rng.randint(1, 20)} years of experience in {', '.join(skills[:3])}.",
+        "SKILLS": '\n'.join(skills),
+        "EXPERIENCE": '\n'.join(experience)
+    }
+
+
+def synthetic_job(rng):
+    skills = rng.sample(SKILLS, 8)
+    return ("We are hiring an engineer. Requirements: " + ', '.join(skills) + ". "
+            + ' '.join(rng.sample(WORDS, 10)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docs', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=10000, help='Documents per commit (segment)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as index_dir:
+        index = ResumeIndex(index_dir)
+        started = time.perf_counter()
+        for i in range(args.docs):
+            index.add(f"resume-{i}", synthetic_resume(rng))
+            if (i + 1) % args.batch == 0:
+                index.commit()
+        index.commit()
+        print(f"Indexed {len(index)} resumes in {time.perf_counter() - started:.1f}s "
+              f"({len(index.terms)} terms, {len(index.segments)} segments)")
+
+        started = time.perf_counter()
+        reloaded = ResumeIndex(index_dir)
+        print(f"Reloaded index in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        for method in ('bm25', 'tfidf'):
+            started = time.perf_counter()
+            reloaded.rank(synthetic_job(rng), args.top, method)
+            first = time.perf_counter() - started
+            timings = []
+            for _ in range(args.queries):
+                job = synthetic_job(rng)
+                started = time.perf_counter()
+                reloaded.rank(job, args.top, method)
+                timings.append(time.perf_counter() - started)
+            print(f"{method:<6} first query (builds weights) {first * 1000:7.1f} ms, "
+                  f"then p50 {statistics.median(timings) * 1000:6.1f} ms, max {max(timings) * 1000:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+# context_cache.py
+"""
+Job description context shared across the section prompts of a tailoring session.
+
+The instruction prefix and the job description are uploaded once per model
+through the Gemini cached-content API. Each section request then sends only
+its own instructions and text to a model bound to that cache. Like a
+tailoring session, a context expires SESSION_TTL after its last use; the TTL
+of the remote cached content is extended as it is used.
+
+The API only caches contexts above a model-specific minimum (32768 tokens for
+1.5 models). A job description is cut to a few thousand characters, so its
+context is usually far below that and the prompts are sent in full; the
+remote call is skipped in that case. The local backend has no such minimum
+and shares any context above LOCAL_MIN_TOKENS. Creating a context is bounded by the
+request's remaining deadline: a slow create falls back to the full prompt and
+the context is kept for later requests when it arrives.
+
+Backends (GEMINI_CONTEXT_CACHE):
+  gemini - cached-content API (needs a versioned model name, e.g. gemini-1.5-flash-001)
+  local  - in-process stand-in that prepends the shared prefix to each prompt;
+           same code path without the API, for tests and test doubles
+  off    - every prompt carries the full job description
+  auto   - gemini with the app's own client, off when a model was assigned (default)
+"""
+
+import os
+import time
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from lazy_imports import lazy_import
+from observability import get_logger, metrics, record_cache_lookup
+from sessions import SESSION_TTL
+
+genai = lazy_import('google.generativeai')
+
+# --- Configuration ---
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "auto").lower()
+# Smallest context worth caching; 0 uses the backend default (the gemini backend never goes below the API minimum)
+GEMINI_CONTEXT_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_MIN_TOKENS", "0"))
+GEMINI_CONTEXT_MAX_ENTRIES = int(os.getenv("GEMINI_CONTEXT_MAX_ENTRIES", "64"))
+GEMINI_CONTEXT_CREATE_SECONDS = float(os.getenv("GEMINI_CONTEXT_CREATE_SECONDS", "10"))  # Longest a request waits for a create
+
+CHARS_PER_TOKEN = 4
+FAILURE_BACKOFF_SECONDS = 300  # A context the API refused is not retried for this long
+API_MIN_TOKENS = (("1.5", 32768),)  # Model name fragment -> smallest context the API caches
+DEFAULT_API_MIN_TOKENS = 4096
+LOCAL_MIN_TOKENS = 128  # Default for the local backend: below a paragraph of job description a context is not worth it
+
+logger = get_logger('context_cache')
+
+metrics.describe("resume_tailor_gemini_contexts_total", "Shared job description contexts by backend and outcome.")
+
+
+def api_min_tokens(model_name):
+    """The smallest context the cached-content API accepts for `model_name`."""
+    for fragment, tokens in API_MIN_TOKENS:
+        if fragment in model_name:
+            return tokens
+    return DEFAULT_API_MIN_TOKENS
+
+
+class SharedContext:
+    """
+    A cached prefix and the model that reads it. `model` takes the per-section
+    prompt in place of the full prompt.
+    """
+
+    def __init__(self, key, backend, model, expires_at, remote=None):
+        self.key = key
+        self.backend = backend
+        self.model = model
+        self.expires_at = expires_at
+        self.remote = remote  # caching.CachedContent for the gemini backend
+        self.remote_expires_at = expires_at
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+
+class LocalContextModel:
+    """Stand-in for a model bound to cached content: prepends the shared prefix to every prompt."""
+
+    def __init__(self, base_model, prefix):
+        self.base_model = base_model
+        self.prefix = prefix
+        self.model_name = getattr(base_model, 'model_name', None)
+
+    def generate_content(self, prompt, **kwargs):
+        return self.base_model.generate_content(self.prefix + prompt, **kwargs)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        if hasattr(self.base_model, 'generate_content_async'):
+            return await self.base_model.generate_content_async(self.prefix + prompt, **kwargs)
+        import asyncio
+        return await asyncio.to_thread(self.base_model.generate_content, self.prefix + prompt, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.base_model, name)
+
+
+class ContextCache:
+    """Shared contexts keyed by (backend, model, prefix), expiring `ttl` seconds after their last use."""
+
+    def __init__(self, backend=GEMINI_CONTEXT_CACHE, ttl=SESSION_TTL, min_tokens=GEMINI_CONTEXT_MIN_TOKENS,
+                 max_entries=GEMINI_CONTEXT_MAX_ENTRIES, create_seconds=GEMINI_CONTEXT_CREATE_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.create_seconds = create_seconds
+        self._contexts = OrderedDict()  # key -> SharedContext
+        self._failed = {}               # key -> time of the last refused creation
+        self._pending = {}              # key -> Future of a create still running
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def resolve_backend(self, own_client):
+        if self.backend == "auto":
+            return "gemini" if own_client else "off"
+        return self.backend
+
+    def min_tokens_for(self, backend, model_name):
+        """Contexts smaller than this are not cached; the gemini backend never goes below the API minimum."""
+        if backend == "gemini":
+            return max(self.min_tokens, api_min_tokens(model_name))
+        return self.min_tokens if self.min_tokens > 0 else LOCAL_MIN_TOKENS
+
+    def get(self, model_name, base_model, system_instruction, context_text, own_client=True, deadline=None):
+        """
+        Returns the SharedContext for this instruction prefix and job description on
+        `model_name`, creating it on first use. None when disabled, too small, refused
+        or not created within the remaining `deadline` (hedging.Deadline).
+        """
+        backend = self.resolve_backend(own_client)
+        if backend not in ("gemini", "local") or base_model is None:
+            return None
+        if (len(system_instruction) + len(context_text)) / CHARS_PER_TOKEN < self.min_tokens_for(backend, model_name):
+            metrics.increment("resume_tailor_gemini_contexts_total", backend=backend, result="too_small")
+            return None
+
+        key = hashlib.sha256(f"{backend}\0{model_name}\0{system_instruction}\0{context_text}".encode('utf-8')).hexdigest()
+        context = self._lookup(key)
+        if context is not None:
+            record_cache_lookup("gemini_context", True)
+            return context
+        record_cache_lookup("gemini_context", False)
+
+        with self._lock:
+            failed_at = self._failed.get(key)
+            if failed_at is not None and time.time() - failed_at < FAILURE_BACKOFF_SECONDS:
+                return None
+            # Requests for the same context wait for one create
+            future = self._pending.get(key)
+            started = future is None
+            if started:
+                future = self._pending[key] = self._submit_locked(
+                    self._create, key, backend, model_name, base_model, system_instruction, context_text)
+        if started:
+            # Outside the lock: the callback runs right here if the create already finished
+            future.add_done_callback(lambda done: self._finish(key, backend, model_name, done))
+
+        timeout = self.create_seconds
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline.remaining()))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            # The context is stored for later requests when the create completes
+            logger.info(f"Shared context on {model_name} not ready within {timeout:.1f}s, sending the full prompt")
+            metrics.increment("resume_tailor_gemini_contexts_total", backend=backend, result="late")
+            return None
+        except Exception:
+            return None  # Logged by _finish
+
+    def _finish(self, key, backend, model_name, future):
+        """Stores a completed create, or records its failure for FAILURE_BACKOFF_SECONDS."""
+        error = future.exception()
+        evicted = []
+        with self._lock:
+            self._pending.pop(key, None)
+            if error is not None:
+                self._failed[key] = time.time()
+            else:
+                self._contexts[key] = future.result()
+                while len(self._contexts) > self.max_entries:
+                    evicted.append(self._contexts.popitem(last=False)[1])
+        if error is not None:
+            logger.warning(f"Could not create a shared job description context on {model_name}: {error}")
+            metrics.increment("resume_tailor_gemini_contexts_total", backend=backend, result="failed")
+            return
+        metrics.increment("resume_tailor_gemini_contexts_total", backend=backend, result="created")
+        for old in evicted:
+            self._delete(old)
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is None:
+                return None
+            if context.expired:
+                del self._contexts[key]
+            else:
+                context.expires_at = now + self.ttl
+                self._contexts.move_to_end(key)
+                if context.remote is not None and context.remote_expires_at - now < self.ttl / 2:
+                    # Claimed before the update runs, so one request extends it
+                    previous, context.remote_expires_at = context.remote_expires_at, now + self.ttl
+                    self._submit_locked(self._extend, context, previous)
+                return context
+        self._delete(context)
+        return None
+
+    def _submit_locked(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='gemini-context')
+        return self._executor.submit(fn, *args)
+
+    def _extend(self, context, previous_expiry):
+        """Moves the remote TTL along with the local expiry; on failure the context ends with the remote one."""
+        try:
+            context.remote.update(ttl=datetime.timedelta(seconds=self.ttl))
+        except Exception as e:
+            logger.warning(f"Could not extend cached content {context.remote.name}: {e}")
+            with self._lock:
+                context.remote_expires_at = previous_expiry
+                context.expires_at = min(context.expires_at, previous_expiry)
+
+    def _create(self, key, backend, model_name, base_model, system_instruction, context_text):
+        expires_at = time.time() + self.ttl
+        if backend == "local":
+            prefix = f"{system_instruction}\n\n{context_text}\n\n"
+            return SharedContext(key, backend, LocalContextModel(base_model, prefix), expires_at)
+        remote = genai.caching.CachedContent.create(
+            model=model_name if model_name.startswith('models/') else f"models/{model_name}",
+            display_name=f"resume-tailor-{key[:12]}",
+            system_instruction=system_instruction,
+            contents=[context_text],
+            ttl=datetime.timedelta(seconds=self.ttl)
+        )
+        model = genai.GenerativeModel.from_cached_content(cached_content=remote)
+        return SharedContext(key, backend, model, expires_at, remote)
+
+    def _delete(self, context):
+        if context.remote is None:
+            return
+        try:
+            context.remote.delete()
+        except Exception as e:
+            # The API also drops it when its TTL runs out
+            logger.debug(f"Could not delete cached content {context.remote.name}: {e}")
+
+    def clear(self):
+        """Drops every context (and deletes the remote cached content)."""
+        with self._lock:
+            contexts = list(self._contexts.values())
+            self._contexts.clear()
+            self._failed.clear()
+            self._pending.clear()
+        for context in contexts:
+            self._delete(context)
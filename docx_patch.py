@@ -0,0 +1,310 @@
+# docx_patch.py
+"""
+Tailored DOCX output without re-serializing the whole package.
+
+A DocxTemplate is built once per base resume. It records where each body-level
+paragraph sits in word/document.xml and where every zip member's compressed
+data sits in the original file. Rendering a variant splices new paragraph XML
+into document.xml. That is the only member that is compressed again; all other
+members are copied byte-for-byte. The result is a list of chunks that can be
+streamed into a response without ever building the file in memory.
+
+Packages this writer does not handle (zip64, encryption, non UTF-8 XML, unknown
+styles) make render() return None, and the caller falls back to python-docx.
+"""
+
+import io
+import os
+import re
+import zlib
+import struct
+import zipfile
+import threading
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from observability import get_logger, record_cache_lookup
+
+# --- Configuration ---
+DOCX_TEMPLATE_CACHE_SIZE = int(os.getenv("DOCX_TEMPLATE_CACHE_SIZE", "32"))  # Base resumes kept prepared
+
+DOCUMENT_PART = 'word/document.xml'
+STYLES_PART = 'word/styles.xml'
+W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W = '{%s}' % W_NAMESPACE
+
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+CENTRAL_HEADER = struct.Struct('<4s6H3L5H2L')
+END_OF_CENTRAL_DIRECTORY = struct.Struct('<4s4H2LH')
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+ZIP64_LIMIT = 0xFFFFFFFF
+
+# Markup, comments, CDATA and processing instructions; attribute values may contain '>'
+TAG_PATTERN = re.compile(
+    rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<\?.*?\?>|<!.*?>'
+    rb'|<(/?)([^\s/>]+)(?:[^>"\']|"[^"]*"|\'[^\']*\')*?(/?)>', re.S)
+XML_ILLEGAL_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+logger = get_logger('docx_patch')
+
+
+class UnsupportedDocx(ValueError):
+    """The package uses a feature the patch writer does not handle."""
+
+
+# --- document.xml ---
+
+def index_body_paragraphs(document_xml):
+    """
+    Returns (prefix, spans): the namespace prefix of <w:body> and the (start, end)
+    byte offsets of each paragraph directly under it, in document order. This
+    is the same list python-docx exposes as Document.paragraphs.
+    """
+    depth = 0
+    body_depth = None
+    prefix = None
+    paragraph_tag = None
+    spans = []
+    open_paragraph = None
+    for match in TAG_PATTERN.finditer(document_xml):
+        name = match.group(2)
+        if name is None:
+            continue  # Comment, CDATA, declaration
+        closing, self_closing = match.group(1), match.group(3)
+        if closing:
+            depth -= 1
+            if body_depth is not None and depth == body_depth + 1 and open_paragraph is not None and name == paragraph_tag:
+                spans.append((open_paragraph, match.end()))
+                open_paragraph = None
+            elif depth == body_depth:
+                break  # </w:body>
+            continue
+        if body_depth is None:
+            if depth == 1 and name.split(b':')[-1] == b'body':
+                body_depth = depth
+                prefix = name[:-len(b'body')]
+                paragraph_tag = prefix + b'p'
+        elif depth == body_depth + 1 and name == paragraph_tag:
+            if self_closing:
+                spans.append((match.start(), match.end()))
+            else:
+                open_paragraph = match.start()
+        if not self_closing:
+            depth += 1
+    if body_depth is None:
+        raise UnsupportedDocx("No <w:body> found in document.xml.")
+    return prefix.decode('ascii'), spans
+
+def read_paragraph_styles(styles_xml):
+    """Returns ({style name: style id}, default paragraph style id) from styles.xml."""
+    from docx.styles import BabelFish  # python-docx's UI name <-> stored name mapping
+
+    style_ids = {}
+    default_id = None
+    if styles_xml is None:
+        return style_ids, default_id
+    root = etree.fromstring(styles_xml)
+    for style in root.iter(W + 'style'):
+        if style.get(W + 'type') != 'paragraph':
+            continue
+        style_id = style.get(W + 'styleId')
+        name = style.find(W + 'name')
+        if name is not None:
+            style_ids[BabelFish.internal2ui(name.get(W + 'val'))] = style_id
+        if style.get(W + 'default') in ('1', 'true', 'on'):
+            default_id = style_id
+    return style_ids, default_id
+
+def paragraph_xml(prefix, text, style_id=None):
+    """A single-run paragraph, as python-docx's add_paragraph(text, style) writes it."""
+    text = XML_ILLEGAL_CHARS.sub('', text)
+    properties = ''
+    if style_id:
+        properties = f'<{prefix}pPr><{prefix}pStyle {prefix}val="{escape(style_id, {chr(34): "&quot;"})}"/></{prefix}pPr>'
+    pieces = []
+    for i, segment in enumerate(text.split('\t')):
+        if i:
+            pieces.append(f'<{prefix}tab/>')
+        if segment:
+            space = ' xml:space="preserve"' if segment != segment.strip() else ''
+            pieces.append(f'<{prefix}t{space}>{escape(segment)}</{prefix}t>')
+    return f'<{prefix}p>{properties}<{prefix}r>{"".join(pieces)}</{prefix}r></{prefix}p>'
+
+# --- Zip Output ---
+
+class PatchedDocx:
+    """A rendered DOCX as a list of byte chunks (mostly views into the original file)."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = sum(len(chunk) for chunk in chunks)
+
+    def __iter__(self):
+        # WSGI servers only accept bytes body chunks, not memoryviews
+        return (bytes(chunk) for chunk in self.chunks)
+
+    def getvalue(self):
+        return b''.join(self.chunks)
+
+    def write_to(self, path):
+        with open(path, 'wb') as f:
+            for chunk in self.chunks:
+                f.write(chunk)
+
+
+class DocxTemplate:
+    """A base resume prepared for cheap patching (see the module docstring)."""
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            infos = archive.infolist()
+            names = {info.filename for info in infos}
+            if DOCUMENT_PART not in names:
+                raise UnsupportedDocx("word/document.xml is missing.")
+            self.document = archive.read(DOCUMENT_PART)
+            styles = archive.read(STYLES_PART) if STYLES_PART in names else None
+        if len(infos) >= 0xFFFF or len(data) >= ZIP64_LIMIT:
+            raise UnsupportedDocx("zip64 packages are not supported.")
+        if self.document.startswith((b'\xff\xfe', b'\xfe\xff')) or b'\x00' in self.document[:4]:
+            raise UnsupportedDocx("document.xml is not UTF-8.")
+
+        # (info, raw local header fields, filename bytes, data offset) per member, in archive order
+        self.members = []
+        for info in infos:
+            header = LOCAL_HEADER.unpack_from(data, info.header_offset)
+            if header[0] != b'PK\x03\x04':
+                raise UnsupportedDocx(f"Bad local header for {info.filename}.")
+            if info.flag_bits & FLAG_ENCRYPTED:
+                raise UnsupportedDocx("Encrypted packages are not supported.")
+            name_start = info.header_offset + LOCAL_HEADER.size
+            name_length, extra_length = header[9], header[10]
+            filename = bytes(data[name_start:name_start + name_length])
+            self.members.append((info, header, filename, name_start + name_length + extra_length))
+
+        self.prefix, self.paragraphs = index_body_paragraphs(self.document)
+        self.style_ids, self.default_style_id = read_paragraph_styles(styles)
+
+    def _style_id(self, style_name):
+        if not style_name:
+            return None
+        style_id = self.style_ids.get(style_name)
+        if style_id is None:
+            raise UnsupportedDocx(f"Unknown paragraph style {style_name!r}.")
+        # python-docx leaves the default style implicit
+        return None if style_id == self.default_style_id else style_id
+
+    def patch_document(self, section_index, replacements):
+        """
+        Returns document.xml with each indexed section's content paragraphs
+        replaced by `replacements[name]` (a list of lines), styled by cycling
+        through the section's original content styles.
+        """
+        edits = []  # (start, end, replacement bytes)
+        replaced = []
+        for section_name, lines in replacements.items():
+            section = section_index.get(section_name)
+            if not section:
+                continue
+            start, end = section["start"], section["end"]
+            if end > len(self.paragraphs) or start >= end:
+                raise UnsupportedDocx("Section index does not match the document.")
+            if any(other_start < start < other_end for other_start, other_end in replaced):
+                continue  # Header was inside a section that has already been replaced
+            if any(start < other_end and other_start < end for other_start, other_end in replaced):
+                raise UnsupportedDocx("Overlapping sections.")
+            replaced.append((start, end))
+
+            content_styles = section["content_styles"]
+            new_xml = ''.join(
+                paragraph_xml(self.prefix, line,
+                              self._style_id(content_styles[i % len(content_styles)] if content_styles else None))
+                for i, line in enumerate(lines))
+            header_end = self.paragraphs[start][1]
+            edits.append((header_end, header_end, new_xml.encode('utf-8')))
+            # Tables and other non-paragraph content in the range stay where they are
+            edits.extend((s, e, b'') for s, e in self.paragraphs[start + 1:end])
+
+        edits.sort(key=lambda edit: (edit[0], edit[1]))
+        pieces = []
+        position = 0
+        for start, end, replacement in edits:
+            pieces.append(self.document[position:start])
+            pieces.append(replacement)
+            position = end
+        pieces.append(self.document[position:])
+        return b''.join(pieces)
+
+    def render(self, section_index, replacements):
+        """Returns the tailored package as a PatchedDocx."""
+        document = self.patch_document(section_index, replacements)
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        compressed = compressor.compress(document) + compressor.flush()
+        document_crc = zlib.crc32(document)
+
+        chunks = []
+        central = []
+        offset = 0
+        for info, header, filename, data_start in self.members:
+            flags = header[2] & ~FLAG_DATA_DESCRIPTOR
+            mod_time, mod_date = header[4], header[5]
+            if info.filename == DOCUMENT_PART:
+                method, crc, body = zipfile.ZIP_DEFLATED, document_crc, compressed
+                compressed_size, size = len(compressed), len(document)
+            else:
+                method, crc = info.compress_type, info.CRC
+                compressed_size, size = info.compress_size, info.file_size
+                body = self.data[data_start:data_start + compressed_size]
+            local = LOCAL_HEADER.pack(b'PK\x03\x04', info.extract_version, flags, method, mod_time, mod_date,
+                                      crc, compressed_size, size, len(filename), 0)
+            chunks.extend((local, filename, body))
+            comment = info.comment or b''
+            central.append(CENTRAL_HEADER.pack(
+                b'PK\x01\x02', info.create_version | (info.create_system << 8), info.extract_version, flags,
+                method, mod_time, mod_date, crc, compressed_size, size, len(filename), 0, len(comment), 0,
+                info.internal_attr, info.external_attr, offset) + filename + comment)
+            offset += len(local) + len(filename) + len(body)
+
+        directory = b''.join(central)
+        chunks.append(directory)
+        chunks.append(END_OF_CENTRAL_DIRECTORY.pack(b'PK\x05\x06', 0, 0, len(central), len(central),
+                                                    len(directory), offset, 0))
+        return PatchedDocx(chunks)
+
+# --- Template Cache ---
+
+_templates = OrderedDict()  # key -> DocxTemplate, or None when the package is unsupported
+_templates_lock = threading.Lock()
+
+def get_template(key, load):
+    """Returns the cached DocxTemplate for `key`, building it from load() -> bytes. None if unsupported."""
+    with _templates_lock:
+        if key in _templates:
+            _templates.move_to_end(key)
+            record_cache_lookup("docx_template", True)
+            return _templates[key]
+    record_cache_lookup("docx_template", False)
+    try:
+        template = DocxTemplate(load())
+    except (UnsupportedDocx, zipfile.BadZipFile, etree.XMLSyntaxError, struct.error) as e:
+        logger.info(f"Falling back to python-docx for this resume: {e}")
+        template = None
+    with _templates_lock:
+        _templates[key] = template
+        while len(_templates) > DOCX_TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return template
+
+def render_tailored(key, load, section_index, replacements):
+    """Patches `replacements` into the base resume identified by `key`. Returns a PatchedDocx or None."""
+    template = get_template(key, load)
+    if template is None or not section_index:
+        return None
+    try:
+        return template.render(section_index, replacements)
+    except UnsupportedDocx as e:
+        logger.info(f"Falling back to python-docx for this variant: {e}")
+        return None
@@ -0,0 +1,48 @@
+# gunicorn.conf.py
+#
+# Usage: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Processes carry the CPU-bound work (DOCX/PDF parsing, document rebuilds) past
+# the GIL; threads inside each worker cover the I/O-bound waits on Gemini,
+# pdflatex and soffice.
+
+import os
+import multiprocessing
+
+# Each worker gets its own upload directory and parse cache (read by app.py at import)
+os.environ.setdefault("UPLOAD_PER_PROCESS", "true")
+
+# --- Server Socket ---
+bind = os.getenv("BIND", "127.0.0.1:5100")
+backlog = 512
+
+# --- Workers ---
+# Tailoring sessions and preview documents are files under cache/, so any worker
+# can serve any session_id or document_id; no sticky routing is needed
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))  # In-flight Gemini calls per worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))  # Gemini retries plus a pdflatex run can take a while
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to bound memory growth from document libraries
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+# Heartbeat files on tmpfs so a slow disk cannot make healthy workers look hung
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Importing the app once in the master shares its memory between workers.
+# Per-process state is rebuilt after fork in post_fork below.
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+# --- Logging ---
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# --- Hooks ---
+
+def post_fork(server, worker):
+    """Rebuilds per-process state inherited from a preloaded master."""
+    if server.cfg.preload_app:
+        import app as resume_tailor
+        resume_tailor.init_worker()
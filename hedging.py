@@ -0,0 +1,264 @@
+# hedging.py
+"""
+End-to-end request deadlines and hedged Gemini calls.
+
+Every HTTP request gets a deadline: REQUEST_DEADLINE_SECONDS after it starts,
+or sooner if the client sends X-Request-Timeout (seconds). Gemini calls made
+while handling the request use the time left as their timeout and raise
+DeadlineExceeded once it is gone.
+
+When a call has not answered within the GEMINI_HEDGE_PERCENTILE latency
+observed for that call type, one duplicate request is sent and whichever
+response arrives first is used. In the async path the loser is cancelled; in
+the sync path the blocking HTTP call cannot be interrupted, so the loser is
+abandoned and ends at the deadline through its own timeout.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from observability import get_logger, metrics
+
+# --- Configuration ---
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60"))  # Keep below the gunicorn timeout
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95"))      # 0 disables hedging
+GEMINI_HEDGE_DEFAULT_DELAY = float(os.getenv("GEMINI_HEDGE_DEFAULT_DELAY", "4.0"))  # Until enough samples exist
+GEMINI_HEDGE_MIN_DELAY = float(os.getenv("GEMINI_HEDGE_MIN_DELAY", "0.5"))
+GEMINI_HEDGE_THREADS = int(os.getenv("GEMINI_HEDGE_THREADS", "32"))
+
+DEADLINE_HEADER = 'X-Request-Timeout'
+LATENCY_WINDOW = 200       # Recent successful calls kept per call type
+HEDGE_MIN_SAMPLES = 20     # Below this the default delay is used
+
+logger = get_logger('hedging')
+
+metrics.describe("resume_tailor_gemini_hedges_total", "Duplicate Gemini requests sent after the hedge delay.")
+metrics.describe("resume_tailor_gemini_hedge_wins_total", "Hedged Gemini calls answered first by the duplicate.")
+metrics.describe("resume_tailor_gemini_deadline_exceeded_total", "Gemini calls abandoned at the request deadline.")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out while waiting on Gemini."""
+
+
+# --- Deadlines ---
+
+class Deadline:
+    """A point in time (monotonic clock) by which the current request must finish."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+_current_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+def start_request_deadline(headers=None, default=REQUEST_DEADLINE_SECONDS):
+    """
+    Starts the deadline for the request being handled in this context. A valid
+    X-Request-Timeout header can only shorten the default budget.
+    """
+    seconds = default
+    value = headers.get(DEADLINE_HEADER) if headers is not None else None
+    if value:
+        try:
+            requested = float(value)
+            if requested > 0:
+                seconds = min(seconds, requested)
+        except ValueError:
+            logger.debug(f"Ignoring invalid {DEADLINE_HEADER} header: {value!r}")
+    deadline = Deadline(seconds)
+    _current_deadline.set(deadline)
+    return deadline
+
+def clear_request_deadline():
+    _current_deadline.set(None)
+
+def current_deadline():
+    """The deadline of the request being handled, or None outside a request."""
+    return _current_deadline.get()
+
+# --- Latency Tracking ---
+
+class LatencyTracker:
+    """Recent Gemini latencies per call type, used to pick the hedge delay."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, call, seconds):
+        with self._lock:
+            self._samples.setdefault(call, deque(maxlen=self.window)).append(seconds)
+
+    def hedge_delay(self, call, percentile=GEMINI_HEDGE_PERCENTILE):
+        """Seconds to wait before sending a duplicate, or None when hedging is disabled."""
+        if percentile <= 0:
+            return None
+        with self._lock:
+            samples = sorted(self._samples.get(call, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return GEMINI_HEDGE_DEFAULT_DELAY
+        position = min(len(samples) - 1, int(len(samples) * percentile / 100.0))
+        return max(GEMINI_HEDGE_MIN_DELAY, samples[position])
+
+
+latencies = LatencyTracker()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GEMINI_HEDGE_THREADS, thread_name_prefix='gemini')
+    return _executor
+
+def _reset_after_fork():
+    """The parent's pool threads do not exist in the child; it starts its own on first use."""
+    global _executor, _executor_lock, latencies
+    _executor = None
+    _executor_lock = threading.Lock()
+    latencies = LatencyTracker()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+# --- Hedged Calls ---
+
+def _timeout_options(deadline, call):
+    """generate_content keyword arguments carrying the remaining budget."""
+    if deadline is None:
+        return {}
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        metrics.increment("resume_tailor_gemini_deadline_exceeded_total", call=call)
+        raise DeadlineExceeded(f"Request deadline of {deadline.seconds:g}s exceeded before the {call} call.")
+    return {"request_options": {"timeout": remaining}}
+
+def _deadline_exceeded(deadline, call):
+    metrics.increment("resume_tailor_gemini_deadline_exceeded_total", call=call)
+    return DeadlineExceeded(f"Request deadline of {deadline.seconds:g}s exceeded waiting for the {call} call.")
+
+def hedged_generate(model, prompt, call, generation_config=None, deadline=None):
+    """
+    model.generate_content(prompt) bounded by the request deadline, with one
+    hedged duplicate after the call type's latency percentile. Raises
+    DeadlineExceeded, or the last error if every attempt failed.
+    """
+    deadline = deadline or current_deadline()
+    delay = latencies.hedge_delay(call)
+
+    def attempt():
+        options = _timeout_options(deadline, call)
+        started = time.monotonic()
+        response = model.generate_content(prompt, generation_config=generation_config, **options)
+        latencies.record(call, time.monotonic() - started)
+        return response
+
+    if deadline is None and delay is None:
+        return attempt()
+
+    executor = _get_executor()
+    started = time.monotonic()
+    attempts = [executor.submit(attempt)]
+    hedge = None
+    error = None
+    while attempts:
+        remaining = deadline.remaining() if deadline else None
+        timeout = remaining
+        if hedge is None and delay is not None:
+            until_hedge = max(0.0, started + delay - time.monotonic())
+            timeout = until_hedge if remaining is None else min(until_hedge, remaining)
+
+        done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            attempts.remove(future)
+            try:
+                response = future.result()
+            except Exception as e:
+                error = e
+                continue
+            for loser in attempts:
+                loser.cancel()
+            if future is hedge:
+                metrics.increment("resume_tailor_gemini_hedge_wins_total", call=call)
+            return response
+
+        if deadline is not None and deadline.expired:
+            for future in attempts:
+                future.cancel()
+            raise _deadline_exceeded(deadline, call)
+        if attempts and hedge is None and delay is not None and time.monotonic() - started >= delay:
+            logger.debug(f"Gemini {call} call slower than {delay:.2f}s, sending a hedged request")
+            metrics.increment("resume_tailor_gemini_hedges_total", call=call)
+            hedge = executor.submit(attempt)
+            attempts.append(hedge)
+    raise error
+
+async def hedged_generate_async(model, prompt, call, generation_config=None, deadline=None):
+    """Async hedged_generate; the slower attempt is cancelled once one answers."""
+    deadline = deadline or current_deadline()
+    delay = latencies.hedge_delay(call)
+
+    async def attempt():
+        options = _timeout_options(deadline, call)
+        started = time.monotonic()
+        if hasattr(model, 'generate_content_async'):
+            response = await model.generate_content_async(prompt, generation_config=generation_config, **options)
+        else:
+            # Models without an async client (e.g. test doubles) run in a worker thread
+            response = await asyncio.to_thread(model.generate_content, prompt,
+                                               generation_config=generation_config, **options)
+        latencies.record(call, time.monotonic() - started)
+        return response
+
+    started = time.monotonic()
+    attempts = {asyncio.ensure_future(attempt())}
+    hedge = None
+    error = None
+    try:
+        while attempts:
+            remaining = deadline.remaining() if deadline else None
+            timeout = remaining
+            if hedge is None and delay is not None:
+                until_hedge = max(0.0, started + delay - time.monotonic())
+                timeout = until_hedge if remaining is None else min(until_hedge, remaining)
+
+            done, attempts = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if task is hedge:
+                    metrics.increment("resume_tailor_gemini_hedge_wins_total", call=call)
+                return response
+
+            if deadline is not None and deadline.expired:
+                raise _deadline_exceeded(deadline, call)
+            if attempts and hedge is None and delay is not None and time.monotonic() - started >= delay:
+                logger.debug(f"Gemini {call} call slower than {delay:.2f}s, sending a hedged request")
+                metrics.increment("resume_tailor_gemini_hedges_total", call=call)
+                hedge = asyncio.ensure_future(attempt())
+                attempts.add(hedge)
+        raise error
+    finally:
+        for task in attempts:
+            task.cancel()
@@ -0,0 +1,282 @@
+# http_cache.py
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from observability import get_logger, record_cache_lookup
+
+# --- Configuration ---
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join("cache", "http"))
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", "3600"))  # Seconds a cached page is served without revalidation
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", str(5 * 1024 * 1024)))  # Cap for large pages
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "1024"))  # Cached pages kept on disk
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # Disk cap across pages
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://www.google.com/' # Sometimes helps
+}
+
+# Response headers worth keeping alongside a cached body
+CACHED_HEADER_NAMES = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+logger = get_logger('http_cache')
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Raised when a response body exceeds the configured size cap."""
+
+
+class CachedResponse:
+    """Minimal response object returned by CachedHttpClient.get."""
+
+    def __init__(self, url, status_code, headers, content, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+
+class CachedHttpClient:
+    """
+    Shared HTTP client with a pooled keep-alive session and an on-disk response
+    cache. Fresh entries (younger than the TTL) are served without touching the
+    network; stale entries are revalidated with If-None-Match/If-Modified-Since.
+    Beyond `max_entries` pages or `max_cache_bytes` on disk, the least recently
+    used entries are pruned when a new page is stored.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL,
+                 max_bytes=HTTP_MAX_RESPONSE_BYTES, pool_size=HTTP_POOL_SIZE,
+                 max_entries=HTTP_CACHE_MAX_ENTRIES, max_cache_bytes=HTTP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.pool_size = pool_size
+        self.max_entries = max_entries
+        self.max_cache_bytes = max_cache_bytes
+        self._session = None
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def session(self):
+        """Lazily builds the pooled session (one per process)."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                                    allowed_methods=frozenset(['GET', 'HEAD']))
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                          max_retries=retries)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers.update(DEFAULT_HEADERS)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        """Closes pooled connections."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    # --- Cache storage ---
+
+    def _cache_paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.body'
+
+    def _load(self, url):
+        meta_path, body_path = self._cache_paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+            # The metadata mtime is the entry's last use for pruning
+            os.utime(meta_path)
+            return meta, body
+        except (OSError, ValueError):
+            return None
+
+    def _atomic_write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _store(self, url, meta, body):
+        meta_path, body_path = self._cache_paths(url)
+        try:
+            # Body first so a reader never sees metadata without its body
+            if body is not None:
+                self._atomic_write(body_path, body)
+            self._atomic_write(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"Could not write HTTP cache entry for {url}: {e}")
+            return
+        if body is not None:
+            self._prune()
+
+    def _prune(self):
+        """Removes the least recently used entries while over max_entries or max_cache_bytes."""
+        entries = {}  # key -> [last use, bytes]
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            key, extension = os.path.splitext(name)
+            if name.startswith('.') or extension not in ('.json', '.body'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entry = entries.setdefault(key, [0.0, 0])
+            entry[0] = max(entry[0], stat.st_mtime)
+            entry[1] += stat.st_size
+        count = len(entries)
+        total = sum(size for _, size in entries.values())
+        if count <= self.max_entries and total <= self.max_cache_bytes:
+            return
+        # Other workers may prune at the same time; removing a file twice is harmless
+        for key, (_, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if count <= self.max_entries and total <= self.max_cache_bytes:
+                break
+            for extension in ('.json', '.body'):
+                try:
+                    os.remove(os.path.join(self.cache_dir, key + extension))
+                except OSError:
+                    pass
+            count -= 1
+            total -= size
+        logger.debug(f"Pruned the HTTP cache to {count} entries ({total} bytes)")
+
+    def _is_fresh(self, meta):
+        return time.time() - meta.get('fetched_at', 0) < self._freshness_lifetime(meta)
+
+    def _freshness_lifetime(self, meta):
+        """Seconds a page is served without revalidation: the TTL, capped by its own Cache-Control."""
+        lifetime = self.ttl
+        for directive in meta['headers'].get('Cache-Control', '').lower().split(','):
+            name, _, value = directive.strip().partition('=')
+            if name == 'no-cache':
+                return 0
+            if name == 'max-age':
+                value = value.strip().strip('"')
+                if not value.isdigit():
+                    return 0  # An invalid max-age makes the page stale
+                lifetime = min(lifetime, int(value))
+        return lifetime
+
+    # --- Fetching ---
+
+    def _read_capped(self, response):
+        """Reads the response body, refusing anything larger than max_bytes."""
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response.close()
+            raise ResponseTooLarge(f"Response is {content_length} bytes, limit is {self.max_bytes} bytes.")
+        chunks = []
+        total = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            total += len(chunk)
+            if total > self.max_bytes:
+                response.close()
+                raise ResponseTooLarge(f"Response exceeded the {self.max_bytes} byte limit.")
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def get(self, url, timeout=15):
+        """
+        GETs a URL through the cache. Raises requests exceptions like requests.get
+        (HTTPError for 4xx/5xx, ResponseTooLarge for oversized bodies).
+        """
+        cached = self._load(url)
+        if cached:
+            meta, body = cached
+            if self._is_fresh(meta):
+                record_cache_lookup("http", True)
+                return CachedResponse(meta['url'], meta['status_code'], meta['headers'], body, from_cache=True)
+
+        request_headers = {}
+        if cached:
+            meta, _ = cached
+            if meta['headers'].get('ETag'):
+                request_headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                request_headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = self.session.get(url, headers=request_headers, timeout=timeout,
+                                    allow_redirects=True, stream=True)
+        try:
+            if response.status_code == 304 and cached:
+                # Consume the empty body so close() returns the connection to the pool
+                response.content
+                meta, body = cached
+                # A 304 carries the current validators and Cache-Control
+                meta['headers'].update({name: response.headers[name] for name in CACHED_HEADER_NAMES
+                                        if name != 'Content-Type' and name in response.headers})
+                meta['fetched_at'] = time.time()
+                self._store(url, meta, None)
+                record_cache_lookup("http", True)
+                return CachedResponse(meta['url'], meta['status_code'], meta['headers'], body, from_cache=True)
+
+            record_cache_lookup("http", False)
+            response.raise_for_status()
+            content = self._read_capped(response)
+        finally:
+            response.close()
+
+        headers = {name: response.headers[name] for name in CACHED_HEADER_NAMES if name in response.headers}
+        if 'no-store' not in response.headers.get('Cache-Control', '').lower():
+            self._store(url, {
+                'url': response.url,
+                'status_code': response.status_code,
+                'headers': headers,
+                'fetched_at': time.time()
+            }, content)
+        return CachedResponse(response.url, response.status_code, headers, content)
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_http_client():
+    """Returns the process-wide CachedHttpClient."""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = CachedHttpClient()
+    return _http_client
+
+def _reset_http_client_after_fork():
+    """Pooled sockets must not be shared with the parent; the child builds its own client."""
+    global _http_client, _http_client_lock
+    _http_client = None
+    _http_client_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_http_client_after_fork)
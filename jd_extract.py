@@ -0,0 +1,234 @@
+# jd_extract.py
+
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from observability import get_logger
+
+# lxml is much faster than html.parser; fall back to BeautifulSoup when it is missing
+try:
+    import lxml.html
+    import lxml.etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# --- Extraction Rules ---
+JOB_DESCRIPTION_SELECTORS = (
+    'div[class*="job-description"]', 'div[id*="job-description"]',
+    'div[class*="jobdescription"]', 'div[id*="jobdescription"]',
+    'div[class*="job-details"]', 'div[id*="job-details"]',
+    'div[class*="jobDetails"]', 'div[id*="jobDetails"]',
+    'section[class*="job-description"]', 'article[class*="job-description"]',
+    'div[role="main"]', # Common on some platforms
+    'main'
+)
+# Tags removed from the chosen container before extracting its text
+CONTAINER_NOISE_TAGS = ('script', 'style', 'button', 'input', 'nav', 'header', 'footer', 'aside', 'form', 'figure', 'img')
+BODY_NOISE_TAGS = ('script', 'style', 'nav', 'header', 'footer', 'aside', 'form', 'figure', 'img', 'button', 'input', 'svg')
+# Tags whose text never counts towards a container's length
+NON_TEXT_TAGS = frozenset(('script', 'style', 'noscript', 'template'))
+
+# Remembers which selector won per domain, so later pages from the same job board
+# only evaluate that rule (bounded LRU)
+MAX_DOMAIN_RULES = 512
+_domain_rules = OrderedDict()
+_domain_rules_lock = threading.Lock()
+
+_SELECTOR_PATTERN = re.compile(r'^([a-z0-9]+)(?:\[([\w-]+)(\*?=)"([^"]*)"\])?$', re.IGNORECASE)
+
+
+logger = get_logger('jd_extract')
+
+
+class ExtractionError(Exception):
+    """Raised when no job description text can be located in a page."""
+
+
+@lru_cache(maxsize=64)
+def compile_selectors(selectors):
+    """
+    Compiles simple `tag[attr*="value"]` / `tag[attr="value"]` / `tag` selectors
+    into {tag: [(index, attr, op, value), ...]} rules, so every element
+    in the tree is tested against all rules in a single traversal.
+    """
+    by_tag = {}
+    for index, selector in enumerate(selectors):
+        match = _SELECTOR_PATTERN.match(selector.strip())
+        if not match:
+            raise ValueError(f"Unsupported selector: {selector}")
+        tag, attr, op, value = match.groups()
+        by_tag.setdefault(tag.lower(), []).append((index, attr, op, value))
+    return by_tag
+
+def _matching_rule(element, rules):
+    """Returns the index of the first rule the element satisfies, or None."""
+    for index, attr, op, value in rules:
+        if attr is None:
+            return index
+        attr_value = element.get(attr)
+        if attr_value is None:
+            continue
+        if op == '*=' and value in attr_value:
+            return index
+        if op == '=' and value == attr_value:
+            return index
+    return None
+
+def get_domain_selectors(url):
+    """Returns the learned selector for the URL's domain, or the full default rule set."""
+    domain = urlparse(url).netloc.lower() if url else ''
+    with _domain_rules_lock:
+        selector = _domain_rules.get(domain)
+        if selector is not None:
+            _domain_rules.move_to_end(domain)
+            return domain, (selector,)
+    return domain, JOB_DESCRIPTION_SELECTORS
+
+def remember_domain_selector(domain, selector):
+    """Caches the selector that located the job description for a domain."""
+    if not domain:
+        return
+    with _domain_rules_lock:
+        _domain_rules[domain] = selector
+        _domain_rules.move_to_end(domain)
+        while len(_domain_rules) > MAX_DOMAIN_RULES:
+            _domain_rules.popitem(last=False)
+
+def forget_domain_selector(domain):
+    """Drops a learned selector that no longer matches the domain's pages."""
+    with _domain_rules_lock:
+        _domain_rules.pop(domain, None)
+
+# --- lxml Engine ---
+
+def _text_lengths(root):
+    """
+    Computes, in one bottom-up pass, the length each element's
+    get_text(strip=True, separator=' ') would have. Returns {element: length}.
+    """
+    # Pre-order list reversed means every child is visited before its parent
+    elements = list(root.iter())
+    stats = {}  # element -> [total chars of stripped strings, number of strings]
+    for element in reversed(elements):
+        chars, count = stats.get(element, (0, 0))  # Children have already been added
+        if isinstance(element.tag, str) and element.tag.lower() not in NON_TEXT_TAGS:
+            own = (element.text or '').strip()
+            if own:
+                chars += len(own)
+                count += 1
+        elif isinstance(element.tag, str):
+            chars, count = 0, 0  # Script/style content is not visible text
+        stats[element] = (chars, count)
+
+        parent = element.getparent()
+        if parent is not None:
+            tail = (element.tail or '').strip()
+            parent_chars, parent_count = stats.get(parent, (0, 0))
+            parent_chars += chars + len(tail)
+            parent_count += count + (1 if tail else 0)
+            stats[parent] = (parent_chars, parent_count)
+    return {element: chars + max(count - 1, 0) for element, (chars, count) in stats.items()}
+
+def _visible_text(element, separator):
+    """Equivalent of BeautifulSoup's get_text(separator=..., strip=True)."""
+    return separator.join(s.strip() for s in element.itertext() if s.strip())
+
+def _drop_tags(element, tags):
+    for child in list(element.iter(*tags)):
+        if child is not element:
+            child.drop_tree()
+
+def _extract_with_lxml(html, url):
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (lxml.etree.ParserError, ValueError) as e:
+        raise ExtractionError(f"Could not parse HTML: {e}")
+
+    domain, selectors = get_domain_selectors(url)
+    rules_by_tag = compile_selectors(selectors)
+
+    # Single traversal: every element is checked against all selectors for its tag
+    candidates = []
+    for position, element in enumerate(root.iter(*rules_by_tag.keys())):
+        rules = rules_by_tag.get(element.tag.lower())
+        if rules:
+            rule_index = _matching_rule(element, rules)
+            if rule_index is not None:
+                candidates.append((rule_index, position, element))
+
+    if not candidates and selectors is not JOB_DESCRIPTION_SELECTORS:
+        # The learned rule no longer matches this board, retry with every rule
+        forget_domain_selector(domain)
+        return _extract_with_lxml(html, url)
+
+    if candidates:
+        lengths = _text_lengths(root)
+        # Longest text wins; ties go to the earlier selector, then the earlier element
+        rule_index, _, best_container = max(
+            candidates, key=lambda c: (lengths.get(c[2], 0), -c[0], -c[1]))
+        remember_domain_selector(domain, selectors[rule_index])
+        _drop_tags(best_container, CONTAINER_NOISE_TAGS)
+        return _visible_text(best_container, '\n')
+
+    # Fallback: Get text from body, after cleaning common noise tags
+    logger.warning("Could not find specific job description container via selectors. Falling back to cleaned body text.")
+    body = root.find('body')
+    if body is None:
+        raise ExtractionError("Could not find body tag in HTML.")
+    _drop_tags(body, BODY_NOISE_TAGS)
+    job_text = _visible_text(body, '\n')
+    # Basic cleaning (remove excessive blank lines)
+    return re.sub(r'\n\s*\n', '\n', job_text)
+
+# --- BeautifulSoup Engine (fallback) ---
+
+def _extract_with_bs4(html, url):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    potential_containers = []
+    for selector in JOB_DESCRIPTION_SELECTORS:
+        try:
+            elements = soup.select(selector)
+            if elements:
+                potential_containers.extend(elements)
+        except Exception as e:
+            logger.warning(f"CSS selector '{selector}' failed: {e}")
+
+    if potential_containers:
+        # Find the container with the most text content, preferring deeper elements
+        best_container = max(potential_containers, key=lambda tag: len(tag.get_text(strip=True, separator=' ')))
+        # Clean the chosen container before extracting text
+        for element in best_container(list(CONTAINER_NOISE_TAGS)):
+            element.decompose()
+        return best_container.get_text(separator='\n', strip=True)
+
+    # Fallback: Get text from body, after cleaning common noise tags
+    logger.warning("Could not find specific job description container via selectors. Falling back to cleaned body text.")
+    body = soup.find('body')
+    if not body:
+        raise ExtractionError("Could not find body tag in HTML.")
+    for element in body(list(BODY_NOISE_TAGS)):
+        element.decompose()
+    job_text = body.get_text(separator='\n', strip=True)
+    # Basic cleaning (remove excessive blank lines)
+    return re.sub(r'\n\s*\n', '\n', job_text)
+
+def extract_job_text(html, url=None):
+    """
+    Extracts the job description text from an HTML page. Uses lxml when it is
+    installed and BeautifulSoup's html.parser otherwise.
+    Raises ExtractionError if the page has no usable content.
+    """
+    if HAS_LXML:
+        return _extract_with_lxml(html, url)
+    return _extract_with_bs4(html, url)
+
+def clean_job_text(job_text):
+    """Removes short lines that are likely remnants of UI elements."""
+    job_text_lines = [line for line in job_text.split('\n') if len(line.strip()) > 10 or line.strip().endswith(':')]
+    return '\n'.join(job_text_lines)
@@ -0,0 +1,175 @@
+# jd_ingest.py
+"""
+Concurrent ingestion of many job posting URLs.
+
+Fetches run on a thread pool capped globally and per host; HTML extraction is
+handed to a separate worker pool so a slow page never holds up fetching the
+fast ones. Results are yielded in completion order.
+
+Usage: python jd_ingest.py urls.txt postings.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+
+from http_cache import get_http_client, ResponseTooLarge
+from jd_extract import extract_job_text, clean_job_text, ExtractionError
+from observability import setup_logging
+
+# --- Configuration ---
+INGEST_MAX_CONCURRENCY = int(os.getenv("INGEST_MAX_CONCURRENCY", "16"))  # Fetches in flight overall
+INGEST_MAX_PER_HOST = int(os.getenv("INGEST_MAX_PER_HOST", "2"))  # Fetches in flight per host
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 2)))
+INGEST_FETCH_TIMEOUT = float(os.getenv("INGEST_FETCH_TIMEOUT", "15"))
+
+
+def _fetch_page(url, timeout):
+    """Fetches one posting. Returns (html, final_url) or raises requests exceptions."""
+    response = get_http_client().get(url, timeout=timeout)
+    content_type = response.headers.get('Content-Type', '').lower()
+    if 'html' not in content_type:
+        raise ValueError(f"URL points to non-HTML content ({content_type})")
+    return response.content, response.url
+
+def _parse_page(html, url):
+    """Extracts and cleans the job description (runs in the parse worker pool)."""
+    return clean_job_text(extract_job_text(html, url))
+
+def _fetch_error_message(e):
+    """Formats fetch errors the same way scrape_job_description does."""
+    if isinstance(e, requests.exceptions.Timeout):
+        return "The request timed out."
+    if isinstance(e, ResponseTooLarge):
+        return f"The page is too large to process. {e}"
+    if isinstance(e, requests.exceptions.HTTPError):
+        return f"Could not fetch URL (HTTP {e.response.status_code})."
+    if isinstance(e, requests.exceptions.RequestException):
+        return f"Could not fetch URL: {e}"
+    return str(e)
+
+def _result(url, started, job_description=None, error=None):
+    return {
+        "url": url,
+        "job_description": job_description,
+        "error": error,
+        "elapsed": round(time.monotonic() - started, 3)
+    }
+
+def ingest_job_descriptions(urls, max_concurrency=INGEST_MAX_CONCURRENCY, max_per_host=INGEST_MAX_PER_HOST,
+                            parse_workers=INGEST_PARSE_WORKERS, fetch_timeout=INGEST_FETCH_TIMEOUT,
+                            total_timeout=None):
+    """
+    Fetches and extracts job descriptions for many URLs concurrently.
+
+    Yields one dict per URL ({"url", "job_description", "error", "elapsed"}) in
+    completion order. At most `max_concurrency` fetches are in flight overall and
+    `max_per_host` per host. Extraction runs in a process pool of `parse_workers`
+    (0 parses on the fetch threads instead). URLs still unfinished after
+    `total_timeout` seconds are reported with a timeout error.
+    """
+    started = time.monotonic()
+    deadline = started + total_timeout if total_timeout else None
+
+    # Queue URLs per host so one slow board can't take every fetch slot
+    pending_by_host = defaultdict(deque)
+    host_order = deque()
+    for url in dict.fromkeys(urls):  # Drop duplicates, keep order
+        host = urlparse(url).netloc.lower()
+        if not pending_by_host[host]:
+            host_order.append(host)
+        pending_by_host[host].append(url)
+    in_flight_by_host = defaultdict(int)
+
+    fetch_pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='jd-fetch')
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
+    fetches = {}  # future -> (url, host)
+    parses = {}   # future -> url
+
+    def schedule_fetches():
+        # Round-robin over hosts that still have queued URLs and a free slot
+        for _ in range(len(host_order)):
+            if len(fetches) >= max_concurrency:
+                return
+            host = host_order[0]
+            host_order.rotate(-1)
+            queue = pending_by_host[host]
+            while queue and in_flight_by_host[host] < max_per_host and len(fetches) < max_concurrency:
+                url = queue.popleft()
+                in_flight_by_host[host] += 1
+                if parse_pool is None:
+                    future = fetch_pool.submit(lambda u=url: _parse_page(*_fetch_page(u, fetch_timeout)))
+                else:
+                    future = fetch_pool.submit(_fetch_page, url, fetch_timeout)
+                fetches[future] = (url, host)
+
+    try:
+        schedule_fetches()
+        while fetches or parses:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+            done, _ = wait(list(fetches) + list(parses), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future in fetches:
+                    url, host = fetches.pop(future)
+                    in_flight_by_host[host] -= 1
+                    try:
+                        outcome = future.result()
+                    except ExtractionError as e:
+                        yield _result(url, started, error=str(e))
+                        continue
+                    except Exception as e:
+                        yield _result(url, started, error=_fetch_error_message(e))
+                        continue
+                    if parse_pool is None:
+                        yield _result(url, started, job_description=outcome)
+                    else:
+                        html, final_url = outcome
+                        parses[parse_pool.submit(_parse_page, html, final_url)] = url
+                else:
+                    url = parses.pop(future)
+                    try:
+                        yield _result(url, started, job_description=future.result())
+                    except Exception as e:
+                        yield _result(url, started, error=f"Failed to parse the page: {e}")
+            schedule_fetches()
+
+        # Anything left when the deadline passed is reported as timed out
+        for url, _ in fetches.values():
+            yield _result(url, started, error="Ingestion deadline exceeded.")
+        for url in parses.values():
+            yield _result(url, started, error="Ingestion deadline exceeded.")
+        for host in host_order:
+            for url in pending_by_host[host]:
+                yield _result(url, started, error="Ingestion deadline exceeded.")
+    finally:
+        for future in list(fetches) + list(parses):
+            future.cancel()
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    if len(sys.argv) != 3:
+        print(__doc__.strip(), file=sys.stderr)
+        sys.exit(2)
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        url_list = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    with open(sys.argv[2], 'w', encoding='utf-8') as out:
+        for result in ingest_job_descriptions(url_list):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            status = 'ok' if result['error'] is None else result['error']
+            print(f"{result['url']}: {status} ({result['elapsed']}s)")
@@ -0,0 +1,258 @@
+# jd_similarity.py
+"""
+Near-duplicate detection for job descriptions.
+
+The same posting is often syndicated across job boards with small edits: a
+different footer, a reordered benefits list, an extra line of boilerplate. An
+exact hash misses these copies. JobIndex maps every job description to a
+canonical one using MinHash signatures over word shingles of the normalized
+text, with LSH banding to find candidates. Requests for a near-duplicate then
+use the canonical text and id, so keyword extraction, the shared Gemini
+context and tailored outputs (TailoredOutputCache) are reused across copies.
+
+JD_SIMILARITY_THRESHOLD is the estimated Jaccard similarity of the shingle
+sets above which two postings count as the same. 0 turns the near-duplicate
+lookup off, leaving only exact matches after normalization.
+"""
+
+import os
+import re
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+from lazy_imports import lazy_import
+from observability import get_logger, metrics, record_cache_lookup
+
+np = lazy_import('numpy')
+
+# --- Configuration ---
+JD_SIMILARITY_THRESHOLD = float(os.getenv("JD_SIMILARITY_THRESHOLD", "0.9"))
+JD_MINHASH_PERMUTATIONS = int(os.getenv("JD_MINHASH_PERMUTATIONS", "128"))
+JD_SHINGLE_WORDS = int(os.getenv("JD_SHINGLE_WORDS", "5"))
+JD_INDEX_MAX_ENTRIES = int(os.getenv("JD_INDEX_MAX_ENTRIES", "2048"))  # Canonical postings kept per process
+JD_TAILORED_CACHE_SIZE = int(os.getenv("JD_TAILORED_CACHE_SIZE", "512"))  # Tailored outputs kept per process
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+SIGNATURE_CHUNK = 2048  # Shingles hashed per NumPy batch, bounds the temporary matrix
+WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+logger = get_logger('jd_similarity')
+
+metrics.describe("resume_tailor_jd_matches_total", "Job descriptions by match against the index (exact, near, new).")
+
+
+def normalize_job_text(text):
+    """Lowercase words without punctuation or layout, the form postings are compared in."""
+    return WORD_PATTERN.findall(text.lower())
+
+def shingle_hashes(words, size=JD_SHINGLE_WORDS):
+    """32-bit hashes of the distinct `size`-word shingles (the whole text if shorter)."""
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {zlib.crc32(' '.join(words[i:i + size]).encode('utf-8')) for i in range(len(words) - size + 1)}
+
+def lsh_shape(threshold, permutations):
+    """
+    (bands, rows) for the LSH index. Uses the most rows per band whose
+    candidate threshold (1/bands)^(1/rows) stays 0.1 below `threshold`, so
+    true near-duplicates are almost always candidates and the full signature
+    comparison filters the rest.
+    """
+    best = (permutations, 1)
+    for rows in range(1, permutations + 1):
+        if permutations % rows:
+            continue
+        bands = permutations // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold - 0.1:
+            best = (bands, rows)
+    return best
+
+
+class MinHasher:
+    """MinHash signatures from universal hash functions (a*x + b) mod p, with fixed seeds so every process agrees."""
+
+    def __init__(self, permutations=JD_MINHASH_PERMUTATIONS, seed=1):
+        generator = np.random.RandomState(seed)
+        self.permutations = permutations
+        self.a = generator.randint(1, MAX_HASH, size=permutations, dtype=np.uint64)
+        self.b = generator.randint(0, MAX_HASH, size=permutations, dtype=np.uint64)
+
+    def signature(self, hashes):
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        signature = np.full(self.permutations, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(values), SIGNATURE_CHUNK):
+            chunk = values[start:start + SIGNATURE_CHUNK, None]
+            # a and x are below 2**32, so a*x + b fits in 64 bits
+            permuted = ((chunk * self.a + self.b) % MERSENNE_PRIME) & MAX_HASH
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature
+
+
+class CanonicalJob:
+    """The canonical posting a job description maps to. `similarity` is 1.0 for the posting itself."""
+
+    def __init__(self, job_id, text, similarity=1.0):
+        self.job_id = job_id
+        self.text = text
+        self.similarity = similarity
+
+    def __repr__(self):
+        return f"CanonicalJob({self.job_id}, {len(self.text)} chars, similarity={self.similarity:.2f})"
+
+
+class _Entry:
+    def __init__(self, job_id, normalized_hash, text, signature, band_keys):
+        self.job_id = job_id
+        self.normalized_hash = normalized_hash
+        self.text = text
+        self.signature = signature
+        self.band_keys = band_keys
+        self.aliases = []  # Normalized hashes of near-duplicates mapped here
+
+
+class JobIndex:
+    """
+    Canonical job descriptions with a MinHash/LSH index. The first posting
+    seen becomes canonical; later near-duplicates map to it. Least recently
+    used postings are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, threshold=JD_SIMILARITY_THRESHOLD, permutations=JD_MINHASH_PERMUTATIONS,
+                 shingle_words=JD_SHINGLE_WORDS, max_entries=JD_INDEX_MAX_ENTRIES):
+        self.threshold = threshold
+        self.permutations = permutations
+        self.shingle_words = shingle_words
+        self.max_entries = max_entries
+        self.bands, self.rows = lsh_shape(threshold, permutations)
+        self._hasher = None
+        self._entries = OrderedDict()  # job_id -> _Entry, least recently used first
+        self._by_hash = {}             # sha256 of normalized text -> job_id (canonical and aliases)
+        self._buckets = [{} for _ in range(self.bands)]  # band key -> set of job_ids
+        self._lock = threading.Lock()
+
+    def canonicalize(self, text):
+        """Returns the CanonicalJob for `text`, adding it to the index when no near-duplicate is known."""
+        words = normalize_job_text(text)
+        normalized_hash = hashlib.sha256(' '.join(words).encode('utf-8')).hexdigest()
+        with self._lock:
+            job = self._lookup_exact_locked(normalized_hash)
+        if job is not None:
+            metrics.increment("resume_tailor_jd_matches_total", kind="exact")
+            record_cache_lookup("job_description", True)
+            return job
+        if not words:
+            return CanonicalJob(normalized_hash[:16], text)
+
+        signature = self._signature(words) if self.threshold > 0 else None
+        band_keys = self._band_keys(signature) if signature is not None else []
+        with self._lock:
+            # Another request may have added it meanwhile
+            job, kind = self._lookup_exact_locked(normalized_hash), "exact"
+            if job is None and signature is not None:
+                job, kind = self._lookup_similar_locked(signature, band_keys, normalized_hash), "near"
+            if job is None:
+                job, kind = self._add_locked(normalized_hash, text, signature, band_keys), "new"
+        if kind == "near":
+            logger.info(f"Job description is a near-duplicate of {job.job_id} (similarity {job.similarity:.2f})")
+        metrics.increment("resume_tailor_jd_matches_total", kind=kind)
+        record_cache_lookup("job_description", kind != "new")
+        return job
+
+    def _signature(self, words):
+        if self._hasher is None:
+            self._hasher = MinHasher(self.permutations)
+        return self._hasher.signature(shingle_hashes(words, self.shingle_words))
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _lookup_exact_locked(self, normalized_hash):
+        job_id = self._by_hash.get(normalized_hash)
+        if job_id is None:
+            return None
+        entry = self._entries[job_id]
+        self._entries.move_to_end(job_id)
+        return CanonicalJob(job_id, entry.text)
+
+    def _lookup_similar_locked(self, signature, band_keys, normalized_hash):
+        candidates = set()
+        for bucket, key in zip(self._buckets, band_keys):
+            candidates.update(bucket.get(key, ()))
+        best, best_similarity = None, 0.0
+        for job_id in candidates:
+            similarity = float(np.mean(self._entries[job_id].signature == signature))
+            if similarity > best_similarity:
+                best, best_similarity = job_id, similarity
+        if best is None or best_similarity < self.threshold:
+            return None
+        entry = self._entries[best]
+        entry.aliases.append(normalized_hash)
+        self._by_hash[normalized_hash] = best
+        self._entries.move_to_end(best)
+        return CanonicalJob(best, entry.text, best_similarity)
+
+    def _add_locked(self, normalized_hash, text, signature, band_keys):
+        job_id = normalized_hash[:16]
+        entry = _Entry(job_id, normalized_hash, text, signature, band_keys)
+        self._entries[job_id] = entry
+        self._by_hash[normalized_hash] = job_id
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, set()).add(job_id)
+        while len(self._entries) > self.max_entries:
+            self._remove_locked(next(iter(self._entries)))
+        return CanonicalJob(job_id, text)
+
+    def _remove_locked(self, job_id):
+        entry = self._entries.pop(job_id)
+        for normalized_hash in [entry.normalized_hash] + entry.aliases:
+            self._by_hash.pop(normalized_hash, None)
+        for bucket, key in zip(self._buckets, entry.band_keys):
+            members = bucket.get(key)
+            if members is not None:
+                members.discard(job_id)
+                if not members:
+                    del bucket[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TailoredOutputCache:
+    """
+    Tailored (summary, skills) by canonical job id, tailoring mode and the
+    exact resume sections, so identical sections sent against copies of one
+    posting are tailored once.
+    """
+
+    def __init__(self, max_entries=JD_TAILORED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(job_id, mode, *sections):
+        return hashlib.sha256('\0'.join((job_id, mode) + sections).encode('utf-8')).hexdigest()
+
+    def get(self, job_id, mode, *sections):
+        key = self.key(job_id, mode, *sections)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        record_cache_lookup("tailored_output", value is not None)
+        return value
+
+    def put(self, job_id, mode, sections, value):
+        key = self.key(job_id, mode, *sections)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
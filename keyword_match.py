@@ -0,0 +1,273 @@
+# keyword_match.py
+"""
+Local keyword/skill matching between a parsed resume and a job description.
+
+The job description is reduced to a weighted keyword vector (TF-IDF, with known
+skills boosted) and the SKILLS / KEY SKILLS / EXPERIENCE sections from
+parse_resume are checked against it with NumPy. Produces coverage and
+missing-keyword reports in a few milliseconds without calling Gemini.
+"""
+
+import os
+import re
+import math
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+# --- Configuration ---
+KEYWORD_MATCH_MAX_KEYWORDS = int(os.getenv("KEYWORD_MATCH_MAX_KEYWORDS", "40"))  # JD keywords considered
+KEYWORD_MATCH_MAX_MISSING = int(os.getenv("KEYWORD_MATCH_MAX_MISSING", "15"))     # Missing keywords reported
+# Skip the SKILLS Gemini rewrite when the section already covers this share of the JD keywords (0 disables)
+KEYWORD_MATCH_SKIP_THRESHOLD = float(os.getenv("KEYWORD_MATCH_SKIP_THRESHOLD", "0"))
+
+RESUME_MATCH_SECTIONS = ("SKILLS", "KEY SKILLS", "EXPERIENCE")
+JD_CACHE_SIZE = 256
+SKILL_BOOST = 2.0  # Weight multiplier for terms in SKILL_LEXICON
+
+# --- Vocabulary ---
+
+STOPWORDS = frozenset("""
+a about above across after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each either etc few for from further
+had has have having he her here hers him his how i if in into is it its itself just least less let like
+may me might more most must my no nor not now of off on once only or other our ours out over own per
+please same she should so some such than that the their theirs them then there these they this those
+through to too under until up upon us very via was we well were what when where whether which while who
+whom whose why will with within without would yet you your yours
+ability able across additional applicant applicants apply based benefit benefits best candidate candidates
+company closely demonstrated desired environment equal etc excellent experience experienced familiar
+familiarity following good great help highly ideal including job join knowledge looking new opportunity
+plus position preferred proven related required requirement requirements responsibilities responsible role
+salary skill skills strong team teams understanding using work working world year years day days
+build building engineer engineers hire hiring junior nice office own remote senior full-time part-time
+""".split())
+
+# Different spellings of the same skill
+ALIASES = {
+    "js": "javascript", "ecmascript": "javascript", "ts": "typescript",
+    "k8s": "kubernetes", "postgres": "postgresql", "psql": "postgresql", "golang": "go",
+    "nodejs": "node.js", "node": "node.js", "reactjs": "react", "react.js": "react",
+    "vuejs": "vue", "vue.js": "vue", "angularjs": "angular", "dotnet": ".net",
+    "gcp": "google cloud", "amazon web services": "aws", "ml": "machine learning",
+    "nlp": "natural language processing", "ai": "artificial intelligence",
+    "cicd": "ci/cd", "ci-cd": "ci/cd", "tf": "terraform", "py": "python",
+    "mssql": "sql server", "restful": "rest", "rest api": "rest", "apis": "api",
+    "sklearn": "scikit-learn", "scikit": "scikit-learn",
+}
+
+# Known skills: boosted in the JD vector and never singularized
+SKILL_LEXICON = frozenset("""
+python java javascript typescript go rust ruby php scala kotlin swift c c++ c# .net perl r matlab bash sql
+nosql graphql html css sass react angular vue node.js django flask fastapi spring rails express next.js
+postgresql mysql sqlite oracle mongodb redis cassandra elasticsearch dynamodb kafka rabbitmq spark hadoop
+airflow dbt snowflake bigquery redshift databricks pandas numpy scipy scikit-learn pytorch tensorflow keras
+aws azure google cloud docker kubernetes terraform ansible helm jenkins git github gitlab ci/cd linux unix
+prometheus grafana datadog splunk rest api grpc microservices serverless tableau excel jira agile scrum
+kanban figma selenium cypress jest pytest junit oauth saml
+""".split()) | frozenset([
+    "google cloud", "machine learning", "deep learning", "data science", "computer vision",
+    "natural language processing", "artificial intelligence", "distributed systems", "data engineering",
+    "data analysis", "data visualization", "project management", "product management", "unit testing",
+    "github actions", "spring boot", "ruby on rails", "power bi", "sql server", "google analytics",
+    "a/b testing", "amazon web services",
+])
+
+# Multi-word skills recognized as single terms, by first word (longest first)
+SKILL_PHRASES = {}
+for _phrase in sorted((term for term in SKILL_LEXICON | frozenset(ALIASES) if ' ' in term),
+                      key=lambda phrase: -len(phrase.split())):
+    SKILL_PHRASES.setdefault(_phrase.split()[0], []).append(_phrase.split())
+
+# Slash-joined tokens that are one term; other "a/b" tokens are split
+KEEP_SLASH = frozenset(["ci/cd", "tcp/ip", "ui/ux", "a/b", "pl/sql"])
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./-]*[a-z0-9+#]|[a-z0-9]")
+DOTNET_PATTERN = re.compile(r"(?<![a-z0-9])\.net\b")
+HAS_LETTER = re.compile(r"[a-z]")
+
+# --- Tokenization ---
+
+def _singular(token):
+    if token in SKILL_LEXICON or len(token) <= 3 or not token.endswith('s') or token.endswith(('ss', 'us', 'is')):
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    return token[:-1]
+
+def _normalize(token):
+    token = ALIASES.get(token, token)
+    return ALIASES.get(_singular(token), _singular(token))
+
+def extract_terms(text):
+    """
+    Returns a Counter of normalized terms in `text`. Terms are single tokens
+    (stopwords and bare numbers dropped) plus known multi-word skills.
+    Also returns {term: surface form} for display.
+    """
+    text = DOTNET_PATTERN.sub(" dotnet", (text or "").lower())
+    counts = Counter()
+    surface = {}
+
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        token = token.strip('.-')
+        if '/' in token and token not in KEEP_SLASH:
+            tokens.extend(part for part in token.split('/') if part)
+        elif token:
+            tokens.append(token)
+
+    # Multi-word skills first so "machine learning" is not also counted as "machine" + "learning"
+    i = 0
+    n = len(tokens)
+    while i < n:
+        for words in SKILL_PHRASES.get(tokens[i], ()):
+            if tokens[i:i + len(words)] == words:
+                phrase = ' '.join(words)
+                term = ALIASES.get(phrase, phrase)
+                counts[term] += 1
+                surface.setdefault(term, phrase)
+                i += len(words)
+                break
+        else:
+            token = tokens[i]
+            i += 1
+            if token in STOPWORDS or not HAS_LETTER.search(token) or (len(token) == 1 and token != 'c'):
+                continue
+            term = _normalize(token)
+            if term in STOPWORDS:
+                continue
+            counts[term] += 1
+            surface.setdefault(term, term if term in SKILL_LEXICON else token)
+    return counts, surface
+
+# --- Job Description Vectors ---
+
+class DocumentFrequencies:
+    """Document frequencies over the job descriptions seen by this process (the IDF side of TF-IDF)."""
+
+    def __init__(self):
+        self.documents = 0
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, terms):
+        with self._lock:
+            self.documents += 1
+            self.counts.update(set(terms))
+
+    def idf(self, term):
+        # Smoothed; with few documents every term is weighted close to 1
+        return math.log((1 + self.documents) / (1 + self.counts.get(term, 0))) + 1.0
+
+
+document_frequencies = DocumentFrequencies()
+_jd_cache = OrderedDict()  # sha256(job description) -> JobKeywords
+_jd_cache_lock = threading.Lock()
+
+
+class JobKeywords:
+    """The top keywords of one job description and their weights (read-only)."""
+
+    def __init__(self, terms, weights, surface):
+        self.terms = terms
+        self.weights = weights
+        self.surface = surface
+        self.index = {term: i for i, term in enumerate(terms)}
+
+
+def analyze_job_description(job_description, max_keywords=KEYWORD_MATCH_MAX_KEYWORDS):
+    """Returns the JobKeywords for a job description, cached by content."""
+    key = hashlib.sha256(f"{max_keywords}:{job_description}".encode('utf-8')).hexdigest()
+    with _jd_cache_lock:
+        cached = _jd_cache.get(key)
+        if cached is not None:
+            _jd_cache.move_to_end(key)
+            return cached
+
+    counts, surface = extract_terms(job_description)
+    document_frequencies.add(counts)
+    scored = []
+    for term, tf in counts.items():
+        weight = (1.0 + math.log(tf)) * document_frequencies.idf(term)
+        if term in SKILL_LEXICON:
+            weight *= SKILL_BOOST
+        scored.append((weight, term))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    scored = scored[:max_keywords]
+
+    weights = np.array([weight for weight, _ in scored], dtype=np.float64)
+    weights.flags.writeable = False
+    keywords = JobKeywords([term for _, term in scored], weights, surface)
+
+    with _jd_cache_lock:
+        _jd_cache[key] = keywords
+        while len(_jd_cache) > JD_CACHE_SIZE:
+            _jd_cache.popitem(last=False)
+    return keywords
+
+# --- Matching ---
+
+def _presence(keywords, text):
+    """Boolean vector: which JD keywords appear in `text`."""
+    counts, _ = extract_terms(text)
+    presence = np.zeros(len(keywords.terms), dtype=bool)
+    for term in counts:
+        position = keywords.index.get(term)
+        if position is not None:
+            presence[position] = True
+    return presence
+
+def match_resume_to_job(parsed_sections, job_description, sections=RESUME_MATCH_SECTIONS,
+                        max_missing=KEYWORD_MATCH_MAX_MISSING):
+    """
+    Scores how well a parse_resume() result covers a job description.
+
+    Returns {"coverage", "matched", "missing", "sections": {name: {"coverage", "missing"}},
+    "keywords", "elapsed_ms"}. Coverage is the weighted share of JD keywords found.
+    """
+    started = time.perf_counter()
+    keywords = analyze_job_description(job_description)
+    weights = keywords.weights
+    total = float(weights.sum())
+
+    present = [name for name in sections if parsed_sections.get(name)]
+    if present and total > 0:
+        matrix = np.vstack([_presence(keywords, parsed_sections[name]) for name in present])
+        section_coverage = matrix.astype(np.float64) @ weights / total
+        overall = matrix.any(axis=0)
+    else:
+        matrix = np.zeros((0, len(keywords.terms)), dtype=bool)
+        section_coverage = np.zeros(0)
+        overall = np.zeros(len(keywords.terms), dtype=bool)
+
+    def labels(mask, limit=None):
+        # Keyword order is by descending weight already
+        found = [keywords.surface.get(term, term) for term, flag in zip(keywords.terms, mask) if flag]
+        return found[:limit] if limit else found
+
+    report = {
+        "coverage": round(float(overall @ weights / total), 3) if total > 0 else 0.0,
+        "matched": labels(overall),
+        "missing": labels(~overall, max_missing),
+        "sections": {
+            name: {
+                "coverage": round(float(section_coverage[row]), 3),
+                "missing": labels(~matrix[row], max_missing)
+            }
+            for row, name in enumerate(present)
+        },
+        "keywords": len(keywords.terms),
+    }
+    report["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+def skills_cover_job(report, threshold=KEYWORD_MATCH_SKIP_THRESHOLD):
+    """True when the SKILLS (or KEY SKILLS) section alone reaches the skip threshold."""
+    if threshold <= 0:
+        return False
+    skills = report["sections"].get("SKILLS") or report["sections"].get("KEY SKILLS")
+    return bool(skills) and skills["coverage"] >= threshold
@@ -0,0 +1,44 @@
+# lazy_imports.py
+
+import sys
+import importlib
+import threading
+
+_import_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+    `genai = LazyModule('google.generativeai')` keeps `genai.configure(...)`
+    working while moving the import cost from startup to first use.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        """Imports the module now (if needed) and returns it."""
+        if self._module is None:
+            with _import_lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    @property
+    def is_loaded(self):
+        """True once the module has been imported (by us or by anyone else)."""
+        return self._module is not None or self._name in sys.modules
+
+    def __repr__(self):
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name):
+    """Returns a LazyModule for `name`."""
+    return LazyModule(name)
@@ -0,0 +1,186 @@
+# model_routing.py
+"""
+Per-request choice of Gemini model and output-token budget.
+
+Each call is routed by its type (summary, skills, combined, section) and the
+size of the text being rewritten. Short sections go to GEMINI_MODEL_SHORT and
+long ones to GEMINI_MODEL_LONG. Each call type keeps its fixed output budget
+(1024 tokens for combined, 512 otherwise) as a minimum; only long sections get
+more, so long EXPERIENCE blocks are not truncated. A response that still stops
+at the limit (finish reason MAX_TOKENS) is treated as a failure.
+
+A model that has just returned a quota error (429 / ResourceExhausted) is
+skipped for GEMINI_QUOTA_COOLDOWN_SECONDS in favour of the next configured
+model. A model whose recent latency is above GEMINI_SLOW_MODEL_SECONDS is
+skipped the same way. Latency, tokens and (with GEMINI_MODEL_PRICES set)
+estimated cost are reported per route and model.
+"""
+
+import os
+import math
+import time
+import threading
+
+from observability import get_logger, metrics
+
+# --- Configuration ---
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_MODEL_SHORT = os.getenv("GEMINI_MODEL_SHORT", GEMINI_MODEL)
+GEMINI_MODEL_LONG = os.getenv("GEMINI_MODEL_LONG", GEMINI_MODEL)
+# Tried in order when the routed model is cooling down or slow
+GEMINI_FALLBACK_MODELS = [name.strip() for name in os.getenv("GEMINI_FALLBACK_MODELS", "").split(",") if name.strip()]
+GEMINI_SHORT_SECTION_CHARS = int(os.getenv("GEMINI_SHORT_SECTION_CHARS", "800"))
+GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "4096"))
+GEMINI_QUOTA_COOLDOWN_SECONDS = float(os.getenv("GEMINI_QUOTA_COOLDOWN_SECONDS", "60"))
+GEMINI_SLOW_MODEL_SECONDS = float(os.getenv("GEMINI_SLOW_MODEL_SECONDS", "0"))  # 0 disables latency-based rerouting
+# "model=input:output,..." in USD per million tokens, for the cost counter
+GEMINI_MODEL_PRICES = os.getenv("GEMINI_MODEL_PRICES", "")
+
+CHARS_PER_TOKEN = 4
+# Output tokens per input token of the rewritten text, and fixed headroom (JSON keys, LaTeX markup)
+OUTPUT_RATIO = {"summary": 1.5, "skills": 1.5, "combined": 1.5, "section": 2.0}
+OUTPUT_OVERHEAD = {"combined": 128, "section": 128}
+# Fixed budgets the calls used before routing; the scaled budget never goes below them
+MIN_OUTPUT_TOKENS = {"combined": 1024, "summary": 512, "skills": 512, "section": 512}
+LATENCY_SMOOTHING = 0.2  # Weight of the newest sample in the moving average
+
+logger = get_logger('model_routing')
+
+metrics.describe("resume_tailor_gemini_route_seconds", "Gemini call latency by route and model.")
+metrics.describe("resume_tailor_gemini_route_tokens_total", "Gemini token usage by route and model.")
+metrics.describe("resume_tailor_gemini_route_cost_usd_total", "Estimated Gemini cost by route and model (GEMINI_MODEL_PRICES).")
+metrics.describe("resume_tailor_gemini_quota_errors_total", "Quota errors returned per model.")
+metrics.describe("resume_tailor_gemini_truncated_total", "Gemini responses cut off at max_output_tokens, by call.")
+
+
+def parse_prices(spec):
+    """Parses GEMINI_MODEL_PRICES into {model: (input USD/token, output USD/token)}."""
+    prices = {}
+    for entry in spec.split(','):
+        if '=' not in entry:
+            continue
+        name, _, values = entry.partition('=')
+        try:
+            input_price, output_price = (float(value) / 1_000_000 for value in values.split(':'))
+        except ValueError:
+            logger.warning(f"Ignoring invalid GEMINI_MODEL_PRICES entry: {entry!r}")
+            continue
+        prices[name.strip()] = (input_price, output_price)
+    return prices
+
+PRICES = parse_prices(GEMINI_MODEL_PRICES)
+
+
+class Route:
+    """Where one Gemini call goes: model name and output budget. `name` is "<call>/<short|long>"."""
+
+    def __init__(self, call, size, model_name, max_output_tokens):
+        self.call = call
+        self.size = size
+        self.name = f"{call}/{size}"
+        self.model_name = model_name
+        self.max_output_tokens = max_output_tokens
+
+    def __repr__(self):
+        return f"Route({self.name} -> {self.model_name}, {self.max_output_tokens} tokens)"
+
+
+class ModelHealth:
+    """Quota cooldowns and smoothed latency per model name."""
+
+    def __init__(self):
+        self._cooldown_until = {}
+        self._latency = {}  # model -> (smoothed seconds, when last observed)
+        self._lock = threading.Lock()
+
+    def available(self, model_name):
+        with self._lock:
+            if time.monotonic() < self._cooldown_until.get(model_name, 0.0):
+                return False
+            latency, observed_at = self._latency.get(model_name, (None, 0.0))
+        if GEMINI_SLOW_MODEL_SECONDS <= 0 or latency is None:
+            return True
+        # A skipped model gets no new samples, so a slow verdict expires like a quota cooldown
+        return latency <= GEMINI_SLOW_MODEL_SECONDS or time.monotonic() - observed_at > GEMINI_QUOTA_COOLDOWN_SECONDS
+
+    def cool_down(self, model_name, seconds=GEMINI_QUOTA_COOLDOWN_SECONDS):
+        with self._lock:
+            self._cooldown_until[model_name] = time.monotonic() + seconds
+
+    def observe(self, model_name, seconds):
+        with self._lock:
+            previous, _ = self._latency.get(model_name, (None, 0.0))
+            smoothed = seconds if previous is None else LATENCY_SMOOTHING * seconds + (1 - LATENCY_SMOOTHING) * previous
+            self._latency[model_name] = (smoothed, time.monotonic())
+
+
+health = ModelHealth()
+
+def _reset_after_fork():
+    global health
+    health = ModelHealth()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+# --- Routing ---
+
+def output_budget(call, text_chars):
+    """max_output_tokens for rewriting `text_chars` characters with a `call` request."""
+    estimate = math.ceil(text_chars / CHARS_PER_TOKEN * OUTPUT_RATIO.get(call, 2.0)) + OUTPUT_OVERHEAD.get(call, 0)
+    return max(MIN_OUTPUT_TOKENS.get(call, 512), min(GEMINI_MAX_OUTPUT_TOKENS, estimate))
+
+def hit_output_limit(response, call):
+    """True when the first candidate stopped at max_output_tokens (its text is cut off)."""
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return False
+    reason = getattr(candidates[0], 'finish_reason', None)
+    if getattr(reason, 'name', reason) != "MAX_TOKENS" and reason != 2:
+        return False
+    logger.warning(f"Gemini {call} response stopped at max_output_tokens, discarding the truncated text")
+    metrics.increment("resume_tailor_gemini_truncated_total", call=call)
+    return True
+
+def choose_route(call, text_chars):
+    """Returns the Route for a `call` request rewriting `text_chars` characters."""
+    size = "short" if text_chars <= GEMINI_SHORT_SECTION_CHARS else "long"
+    preferred = GEMINI_MODEL_SHORT if size == "short" else GEMINI_MODEL_LONG
+    model_name = preferred
+    if not health.available(preferred):
+        for candidate in GEMINI_FALLBACK_MODELS + [GEMINI_MODEL_LONG, GEMINI_MODEL_SHORT]:
+            if candidate != preferred and health.available(candidate):
+                logger.info(f"Model {preferred} is over quota or slow, routing {call}/{size} to {candidate}")
+                model_name = candidate
+                break
+    return Route(call, size, model_name, output_budget(call, text_chars))
+
+def is_quota_error(error):
+    """True for Gemini rate-limit / quota exhaustion errors."""
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests") or getattr(error, "code", None) == 429
+
+def record_failure(route, error):
+    """Puts the route's model on cooldown after a quota error."""
+    if is_quota_error(error):
+        metrics.increment("resume_tailor_gemini_quota_errors_total", model=route.model_name)
+        logger.warning(f"Gemini quota error on {route.model_name}, cooling down for {GEMINI_QUOTA_COOLDOWN_SECONDS:g}s")
+        health.cool_down(route.model_name)
+
+def record_result(route, response, seconds):
+    """Reports latency, tokens and estimated cost of a successful call under its route."""
+    health.observe(route.model_name, seconds)
+    metrics.observe("resume_tailor_gemini_route_seconds", seconds, route=route.name, model=route.model_name)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    metrics.increment("resume_tailor_gemini_route_tokens_total", prompt_tokens,
+                      route=route.name, model=route.model_name, kind="prompt")
+    metrics.increment("resume_tailor_gemini_route_tokens_total", output_tokens,
+                      route=route.name, model=route.model_name, kind="candidates")
+    price = PRICES.get(route.model_name)
+    if price:
+        metrics.increment("resume_tailor_gemini_route_cost_usd_total",
+                          prompt_tokens * price[0] + output_tokens * price[1],
+                          route=route.name, model=route.model_name)
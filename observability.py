@@ -0,0 +1,214 @@
+# observability.py
+
+import os
+import sys
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from contextlib import contextmanager
+from functools import wraps
+
+# --- Configuration ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOGGER_NAME = "resume_tailor"
+
+# Histogram buckets (seconds) shared by every timed stage
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# --- Logging ---
+
+_log_listener = None
+_log_queue = None
+_log_setup_lock = threading.Lock()
+
+def setup_logging(level=None, stream=None):
+    """
+    Configures the application logger. Records go through a queue and are
+    written to stderr by a background thread, so request threads never block
+    on terminal or pipe I/O. Safe to call more than once; later calls only
+    change the level when one is given.
+    """
+    global _log_listener, _log_queue
+    with _log_setup_lock:
+        logger = logging.getLogger(LOGGER_NAME)
+        if level is not None:
+            logger.setLevel(level)
+        if _log_listener is not None:
+            return logger
+        if level is None:
+            logger.setLevel(LOG_LEVEL)
+
+        _log_queue = queue.SimpleQueue()
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+        _log_listener = logging.handlers.QueueListener(_log_queue, handler, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(stop_logging)
+
+        logger.handlers = [logging.handlers.QueueHandler(_log_queue)]
+        logger.propagate = False
+        return logger
+
+def stop_logging():
+    """Flushes queued log records and stops the writer thread."""
+    global _log_listener
+    with _log_setup_lock:
+        if _log_listener is not None:
+            _log_listener.stop()
+            _log_listener = None
+
+def _restart_logging_after_fork():
+    """The writer thread does not survive fork(); start a new one in the child."""
+    global _log_listener, _log_setup_lock
+    _log_setup_lock = threading.Lock()
+    if _log_listener is not None:
+        _log_listener = logging.handlers.QueueListener(
+            _log_queue, *_log_listener.handlers, respect_handler_level=True)
+        _log_listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_logging_after_fork)
+
+def get_logger(name=None):
+    """Returns the application logger or one of its children (e.g. get_logger('scraper'))."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+# --- Metrics ---
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process counter/gauge/histogram registry rendered in the Prometheus
+    text exposition format. Values are per process.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}    # name -> {label_key: value}
+        self._gauges = {}      # name -> {label_key: value}
+        self._histograms = {}  # name -> {label_key: [bucket counts..., sum, count]}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def increment(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def render(self):
+        """Returns all metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._gauges.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} gauge")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    for i, bound in enumerate(self.buckets):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {state[i]}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+metrics.describe("resume_tailor_stage_seconds", "Time spent in each request stage.")
+metrics.describe("resume_tailor_stage_errors_total", "Stages that ended with an exception.")
+metrics.describe("resume_tailor_gemini_tokens_total", "Gemini token usage from usage_metadata.")
+metrics.describe("resume_tailor_gemini_requests_total", "Gemini generate_content calls.")
+metrics.describe("resume_tailor_cache_requests_total", "Cache lookups by cache and result.")
+
+@contextmanager
+def span(stage, **labels):
+    """Times a block and records it under resume_tailor_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        metrics.increment("resume_tailor_stage_errors_total", stage=stage, **labels)
+        raise
+    finally:
+        metrics.observe("resume_tailor_stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_cache_lookup(cache, hit):
+    """Counts a hit or miss for the named cache."""
+    metrics.increment("resume_tailor_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+def record_gemini_usage(response, call):
+    """Adds the token counts from a Gemini response's usage_metadata to the counters."""
+    metrics.increment("resume_tailor_gemini_requests_total", call=call)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"),
+                       ("candidates", "candidates_token_count"),
+                       ("cached", "cached_content_token_count"),
+                       ("total", "total_token_count")):
+        count = getattr(usage, attr, None)
+        if count:
+            metrics.increment("resume_tailor_gemini_tokens_total", count, call=call, kind=kind)
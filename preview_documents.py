@@ -0,0 +1,290 @@
+# preview_documents.py
+"""
+Revisioned LaTeX documents for /preview, and a cache of compiled previews.
+
+A client creates a document once with the full source. After that it sends
+only text patches against the revision it last saw. The server keeps the
+current text per document and rejects patches based on any other revision
+(409), so the client can resync with the full source. Compiled output is
+cached by the hash of the source: a revision whose text was already compiled
+(an unchanged preview, or an edit that was undone) does not run pdflatex again.
+
+A patch is {"start": int, "end": int, "text": str}: replace characters
+[start, end) of the base revision with `text` (CodeMirror's indexFromPos
+offsets). Patches in one request all refer to the base revision and must not
+overlap.
+
+Documents are files in PREVIEW_DOCUMENT_DIR, shared by every worker process,
+so a PATCH can land on a different worker than the POST that created the
+document. A file lock serializes updates across workers. Compiled previews
+are cached per process.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from observability import get_logger, record_cache_lookup
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process; the in-process lock still serializes updates
+    fcntl = None
+
+# --- Configuration ---
+PREVIEW_DOCUMENT_DIR = os.getenv("PREVIEW_DOCUMENT_DIR", os.path.join("cache", "preview_documents"))
+PREVIEW_DOCUMENT_TTL = int(os.getenv("PREVIEW_DOCUMENT_TTL", "3600"))  # Seconds since last edit
+PREVIEW_DOCUMENT_MAX_BYTES = int(os.getenv("PREVIEW_DOCUMENT_MAX_BYTES", str(64 * 1024 * 1024)))  # Across documents
+PREVIEW_CACHE_SIZE = int(os.getenv("PREVIEW_CACHE_SIZE", "128"))  # Compiled results kept per process
+
+MAX_PATCHES = 1000
+DOCUMENT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+logger = get_logger('preview_documents')
+
+
+class PatchError(ValueError):
+    """A patch list that cannot be applied to the base revision."""
+
+
+class RevisionConflict(Exception):
+    """The patches were made against a revision other than the current one."""
+
+    def __init__(self, current_revision):
+        super().__init__(f"Document is at revision {current_revision}.")
+        self.current_revision = current_revision
+
+
+def source_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def apply_patches(text, patches):
+    """Returns `text` with the patches applied. Raises PatchError for malformed or overlapping patches."""
+    if not isinstance(patches, list) or len(patches) > MAX_PATCHES:
+        raise PatchError(f"patches must be a list of at most {MAX_PATCHES} edits.")
+    edits = []
+    for patch in patches:
+        try:
+            start, end, insert = patch["start"], patch["end"], patch.get("text", "")
+        except (TypeError, KeyError):
+            raise PatchError("Each patch needs start, end and text.")
+        if (not isinstance(start, int) or not isinstance(end, int) or not isinstance(insert, str)
+                or isinstance(start, bool) or isinstance(end, bool)):
+            raise PatchError("start and end must be integers and text a string.")
+        if not 0 <= start <= end <= len(text):
+            raise PatchError(f"Patch range [{start}, {end}) is outside the document ({len(text)} characters).")
+        edits.append((start, end, insert))
+    edits.sort(key=lambda edit: (edit[0], edit[1]))
+    pieces = []
+    position = 0
+    for start, end, insert in edits:
+        if start < position:
+            raise PatchError("Patches overlap.")
+        pieces.append(text[position:start])
+        pieces.append(insert)
+        position = end
+    pieces.append(text[position:])
+    return ''.join(pieces)
+
+
+class PreviewDocument:
+    """The current text of one editor document."""
+
+    def __init__(self, document_id, text, revision=1):
+        self.document_id = document_id
+        self.revision = revision
+        self.text = text
+
+
+class DocumentStore:
+    """
+    Documents keyed by an opaque id, one JSON file each in `directory`.
+    Documents expire `ttl` seconds after their last use (the file's mtime);
+    when a document is created over `max_bytes`, the least recently used go first.
+    """
+
+    def __init__(self, directory=PREVIEW_DOCUMENT_DIR, ttl=PREVIEW_DOCUMENT_TTL, max_bytes=PREVIEW_DOCUMENT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def create(self, text):
+        """Stores a new document at revision 1 and returns it."""
+        document = PreviewDocument(uuid.uuid4().hex, text)
+        with self._locked():
+            self._write(document)
+            self._evict()
+        return document
+
+    def get(self, document_id):
+        """The document, or None when it is unknown or expired. Counts as a use."""
+        path = self._path(document_id)
+        if path is None:
+            return None
+        with self._locked():
+            return self._read(document_id, path)
+
+    def update(self, document_id, base_revision, patches, expected_hash=None):
+        """
+        Applies patches made against `base_revision`. Returns (revision, text), or
+        None if the document is unknown. Raises RevisionConflict or PatchError.
+        With `expected_hash` (sha256 of the client's text) a diverged result is a conflict.
+        """
+        path = self._path(document_id)
+        if path is None:
+            return None
+        with self._locked():
+            document = self._read(document_id, path)
+            if document is None:
+                return None
+            if base_revision != document.revision:
+                raise RevisionConflict(document.revision)
+            text = apply_patches(document.text, patches)
+            if expected_hash and expected_hash != source_hash(text):
+                raise RevisionConflict(document.revision)
+            if text != document.text:
+                document.text = text
+                document.revision += 1
+                self._write(document)
+            return document.revision, document.text
+
+    def discard(self, document_id):
+        path = self._path(document_id)
+        if path is not None:
+            with self._locked():
+                self._remove(path)
+
+    def _path(self, document_id):
+        # Ids come from the URL; anything but our own hex ids is unknown
+        if not isinstance(document_id, str) or not DOCUMENT_ID_PATTERN.match(document_id):
+            return None
+        return os.path.join(self.directory, document_id + '.json')
+
+    def _read(self, document_id, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                self._remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return PreviewDocument(document_id, data["text"], data["revision"])
+
+    def _write(self, document):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-document-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"revision": document.revision, "text": document.text}, f)
+            os.replace(tmp_path, self._path(document.document_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict(self):
+        """Drops expired documents, then the least recently used while over max_bytes."""
+        now = time.time()
+        documents = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+            else:
+                documents.append((stat.st_mtime, stat.st_size, path))
+        total_bytes = sum(size for _, size, _ in documents)
+        for _, size, path in sorted(documents):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+    def _files(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [os.path.join(self.directory, name) for name in names
+                if name.endswith('.json') and not name.startswith('.')]
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @contextmanager
+    def _locked(self):
+        """Holds the store lock for this process and, with fcntl, across workers."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                lock_file = open(os.path.join(self.directory, '.lock'), 'a')
+            except OSError as e:
+                logger.warning(f"Could not open the preview document lock in {self.directory}: {e}")
+                yield
+                return
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def __len__(self):
+        return len(self._files())
+
+
+class CompiledPreviewCache:
+    """
+    Compile results (response payload and status) by source hash. Entries that
+    point at a preview PDF are only served while the PDF is still on disk with
+    at least `min_lifetime` seconds left before its scheduled cleanup.
+    """
+
+    def __init__(self, max_entries=PREVIEW_CACHE_SIZE, min_lifetime=30):
+        self.max_entries = max_entries
+        self.min_lifetime = min_lifetime
+        self._entries = OrderedDict()  # source hash -> (payload, status, pdf path or None, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, status, pdf_path, expires_at = entry
+                if pdf_path and (time.time() > expires_at - self.min_lifetime or not os.path.exists(pdf_path)):
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+        record_cache_lookup("preview", entry is not None)
+        return None if entry is None else (payload, status)
+
+    def put(self, key, payload, status, pdf_path=None, lifetime=None):
+        expires_at = time.time() + lifetime if lifetime else float('inf')
+        with self._lock:
+            self._entries[key] = (payload, status, pdf_path, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
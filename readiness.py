@@ -0,0 +1,112 @@
+# readiness.py
+
+import time
+import threading
+from collections import OrderedDict
+
+from observability import get_logger
+
+logger = get_logger('readiness')
+
+
+class ReadinessProbe:
+    """
+    Runs registered warm-up checks (toolchain detection, heavy imports, ...)
+    once in a background thread and caches their results. Callers that need a
+    result before the background run reaches it compute it inline instead of
+    waiting; either way each check runs at most once per process.
+    """
+
+    def __init__(self):
+        self._checks = OrderedDict()  # name -> (func, required)
+        self._results = {}            # name -> result dict
+        self._check_locks = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def register(self, name, func, required=False):
+        """Adds a check. A failing `required` check keeps the process not ready."""
+        self._checks[name] = (func, required)
+        self._check_locks[name] = threading.Lock()
+
+    def start(self):
+        """Starts the background warm-up if it has not started yet."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run_all, name="readiness-probe", daemon=True)
+            self._thread.start()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def _run_all(self):
+        for name in self._checks:
+            self._run(name)
+        self.finished_at = time.time()
+        logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.2f}s")
+
+    def _run(self, name):
+        with self._check_locks[name]:
+            if name in self._results:
+                return self._results[name]
+            func, required = self._checks[name]
+            start = time.perf_counter()
+            try:
+                value = func()
+                error = None
+            except Exception as e:
+                logger.error(f"Warm-up check {name} failed: {e}")
+                value, error = None, str(e)
+            self._results[name] = {
+                "ok": bool(value) and error is None,
+                "required": required,
+                "value": value,
+                "error": error,
+                "seconds": round(time.perf_counter() - start, 3)
+            }
+            return self._results[name]
+
+    def value(self, name):
+        """Returns a check's cached value, running the check now if needed."""
+        return self._run(name)["value"]
+
+    def reset(self, name):
+        """Forgets one cached result so the next value() call probes again."""
+        with self._check_locks[name]:
+            self._results.pop(name, None)
+
+    @property
+    def complete(self):
+        return all(name in self._results for name in self._checks)
+
+    @property
+    def ready(self):
+        """True once every check has run and every required check passed."""
+        return self.complete and all(result["ok"] for result in self._results.values() if result["required"])
+
+    def status(self):
+        """Returns a JSON-serializable summary for /readyz."""
+        checks = {}
+        for name, (_, required) in self._checks.items():
+            result = self._results.get(name)
+            if result is None:
+                checks[name] = {"state": "pending", "required": required}
+            else:
+                checks[name] = {
+                    "state": "ok" if result["ok"] else "unavailable",
+                    "required": required,
+                    "seconds": result["seconds"]
+                }
+                if result["error"]:
+                    checks[name]["error"] = result["error"]
+        return {
+            "ready": self.ready,
+            "warmup": "complete" if self.complete else ("running" if self.started else "not started"),
+            "checks": checks
+        }
@@ -0,0 +1,244 @@
+# resume_cache.py
+
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+from werkzeug.exceptions import UnsupportedMediaType
+
+from observability import get_logger, record_cache_lookup
+
+# --- Configuration ---
+RESUME_CACHE_MAX_ENTRIES = int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "256"))
+RESUME_CACHE_MAX_BYTES = int(os.getenv("RESUME_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # Upload bytes kept on disk
+RESUME_CACHE_TTL = int(os.getenv("RESUME_CACHE_TTL", "1800"))  # Seconds since last use
+
+CHUNK_SIZE = 64 * 1024
+# Every DOCX is a zip archive, which starts with a local file header
+DOCX_SIGNATURE = b'PK\x03\x04'
+
+logger = get_logger('resume_cache')
+
+
+class InvalidUpload(UnsupportedMediaType):
+    """Raised while an upload is still streaming when its first bytes are not a DOCX."""
+    description = "The uploaded file is not a valid .docx document."
+
+
+class SpooledUpload:
+    """
+    Writable file object handed to Werkzeug's multipart parser for each uploaded
+    file. Bytes go straight to a temp file in the upload folder while being
+    hashed, so memory per upload stays at one parser chunk and ResumeStore can
+    adopt the file without copying it. With `check_signature`, a body that does
+    not start with the zip signature is rejected on its first chunk.
+    """
+
+    def __init__(self, directory, check_signature=False):
+        self.directory = directory
+        self.path = os.path.join(directory, f".upload-{uuid.uuid4().hex}")
+        self.check_signature = check_signature
+        self.size = 0
+        self.adopted = False
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        if self.check_signature and len(self._head) < len(DOCX_SIGNATURE):
+            self._head += data[:len(DOCX_SIGNATURE) - len(self._head)]
+            if not DOCX_SIGNATURE.startswith(self._head):
+                self.close()
+                raise InvalidUpload()
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def readline(self, *args):
+        return self._file.readline(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        return self._file.flush()
+
+    def detach(self):
+        """Closes the handle and hands the file over to the caller (it is no longer deleted on close)."""
+        self._file.close()
+        self.adopted = True
+        return self.path
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.adopted and os.path.exists(self.path):
+            os.remove(self.path)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+
+class ResumeStore:
+    """
+    Content-addressed storage for uploaded resumes plus a cache of their parsed
+    sections. Identical uploads share one file (named by SHA-256) and are parsed
+    once. Entries are evicted least-recently-used when the entry count or total
+    stored bytes exceed their limits, or after `ttl` seconds without use. Entries
+    pinned by an in-flight request are never evicted.
+    """
+
+    def __init__(self, upload_folder, max_entries=RESUME_CACHE_MAX_ENTRIES,
+                 max_bytes=RESUME_CACHE_MAX_BYTES, ttl=RESUME_CACHE_TTL):
+        self.upload_folder = upload_folder
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # content_hash -> entry dict, oldest use first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.upload_folder, exist_ok=True)
+
+    def save(self, file_storage, extension):
+        """
+        Stores an uploaded file under its content hash and pins it.
+        Returns (content_hash, path); call release(content_hash) when done.
+        """
+        stream = file_storage.stream
+        if isinstance(stream, SpooledUpload) and stream.directory == self.upload_folder and not stream.adopted:
+            # Already on disk and hashed while the request body streamed in
+            if stream.check_signature and stream.size < len(DOCX_SIGNATURE):
+                stream.close()
+                raise InvalidUpload()
+            size, content_hash = stream.size, stream.sha256
+            return self.adopt(stream.detach(), content_hash, size, extension)
+
+        # Stream to a unique temp name while hashing, so concurrent uploads never collide
+        temp_path = os.path.join(self.upload_folder, f".upload-{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while True:
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        content_hash = digest.hexdigest()
+        return self.adopt(temp_path, content_hash, size, extension)
+
+    def adopt(self, temp_path, content_hash, size, extension):
+        """Moves an already-hashed temp file into the store and pins it. Returns (content_hash, path)."""
+        path = os.path.join(self.upload_folder, f"{content_hash}.{extension}")
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                os.replace(temp_path, path)
+                entry = {
+                    "path": path,
+                    "size": size,
+                    "derived": {},
+                    "parse_lock": threading.Lock(),
+                    "pins": 0,
+                    "last_used": time.time()
+                }
+                self._entries[content_hash] = entry
+                self._total_bytes += size
+            else:
+                # Same bytes already stored, drop the duplicate copy
+                os.remove(temp_path)
+            entry["pins"] += 1
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(content_hash)
+            self._evict_locked()
+        return content_hash, entry["path"]
+
+    def release(self, content_hash):
+        """Unpins an entry so it becomes eligible for eviction."""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is not None and entry["pins"] > 0:
+                entry["pins"] -= 1
+            self._evict_locked()
+
+    def path_for(self, content_hash):
+        """Returns the stored path for a hash, or None if it has been evicted."""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            return entry["path"] if entry else None
+
+    def parse(self, content_hash, parse_func, kind="sections"):
+        """
+        Returns parse_func(path) for a stored upload, computing it at most once
+        per distinct file and `kind` of result. A shallow copy is returned so
+        callers may mutate it.
+        """
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                raise KeyError(f"No stored upload for {content_hash}")
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(content_hash)
+
+        # Per-entry lock: concurrent requests for the same file wait for one parse
+        with entry["parse_lock"]:
+            if kind in entry["derived"]:
+                self.hits += 1
+                record_cache_lookup(f"resume_{kind}", True)
+                logger.debug(f"Parse cache hit for {content_hash[:12]} ({kind})")
+            else:
+                self.misses += 1
+                record_cache_lookup(f"resume_{kind}", False)
+                entry["derived"][kind] = parse_func(entry["path"])
+        return dict(entry["derived"][kind])
+
+    def _evict_locked(self):
+        now = time.time()
+        for content_hash in list(self._entries):
+            entry = self._entries[content_hash]
+            expired = now - entry["last_used"] > self.ttl
+            over_limit = len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+            if not expired and not over_limit:
+                # Entries are ordered by last use, so nothing later is expired either
+                break
+            if entry["pins"] > 0:
+                continue
+            self._remove_locked(content_hash)
+
+    def _remove_locked(self, content_hash):
+        entry = self._entries.pop(content_hash)
+        self._total_bytes -= entry["size"]
+        try:
+            if os.path.exists(entry["path"]):
+                os.remove(entry["path"])
+        except OSError as e:
+            logger.error(f"Error removing cached upload {entry['path']}: {e}")
+
+    def clear(self):
+        """Removes every unpinned entry and its file."""
+        with self._lock:
+            for content_hash in list(self._entries):
+                if self._entries[content_hash]["pins"] == 0:
+                    self._remove_locked(content_hash)
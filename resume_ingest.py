@@ -0,0 +1,232 @@
+# resume_ingest.py
+"""
+Bulk parsing of resume exports (a directory tree or a .zip of DOCX/PDF files).
+
+Files are parsed with parse_resume in a process pool and written as JSONL, one
+line per file in completion order. Re-running with the same output file skips
+files already recorded there, so an interrupted run resumes where it stopped.
+Per-file failures are recorded in the "error" field and never abort the run.
+
+Usage: python resume_ingest.py exports/ sections.jsonl [--workers N] [--retry-errors]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import argparse
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from observability import setup_logging, get_logger
+
+# --- Configuration ---
+RESUME_INGEST_WORKERS = int(os.getenv("RESUME_INGEST_WORKERS", str(os.cpu_count() or 2)))
+RESUME_INGEST_MAX_FILE_BYTES = int(os.getenv("RESUME_INGEST_MAX_FILE_BYTES", str(16 * 1024 * 1024)))  # Same cap as uploads
+
+RESUME_EXTENSIONS = ('.docx', '.pdf')
+# Tasks queued per worker; keeps every core busy without materializing the whole batch
+IN_FLIGHT_PER_WORKER = 4
+
+logger = get_logger('resume_ingest')
+
+
+# --- Discovery ---
+
+def discover_resumes(source):
+    """
+    Yields (source_id, location) for every DOCX/PDF under a directory or inside a
+    zip. `location` is a path, or (zip_path, member_name) for archive members.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(RESUME_EXTENSIONS) and not name.startswith(('.', '~$')):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                base = os.path.basename(name)
+                if info.is_dir() or not name.lower().endswith(RESUME_EXTENSIONS) or base.startswith(('.', '~$')):
+                    continue
+                if name.startswith('__MACOSX/'):
+                    continue
+                yield f"{os.path.basename(source)}:{name}", (source, name)
+    else:
+        raise ValueError(f"{source} is neither a directory nor a zip archive")
+
+
+# --- Worker ---
+
+def _parse_one(source_id, location, max_bytes):
+    """Parses one file in a worker process. Never raises for per-file problems."""
+    from resume_parser import parse_resume  # Imported once per worker; heavy libraries load on first use
+
+    started = time.monotonic()
+    result = {"source": source_id, "sha256": None, "sections": None, "error": None}
+    temp_path = None
+    try:
+        if isinstance(location, tuple):
+            zip_path, member = location
+            with zipfile.ZipFile(zip_path) as archive:
+                info = archive.getinfo(member)
+                if info.file_size > max_bytes:
+                    raise ValueError(f"File is {info.file_size} bytes, limit is {max_bytes} bytes.")
+                data = archive.read(member)
+            # parse_resume works on paths and picks the parser from the extension
+            fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(member)[1].lower())
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            path = temp_path
+        else:
+            size = os.path.getsize(location)
+            if size > max_bytes:
+                raise ValueError(f"File is {size} bytes, limit is {max_bytes} bytes.")
+            with open(location, 'rb') as f:
+                data = f.read()
+            path = location
+
+        result["sha256"] = hashlib.sha256(data).hexdigest()
+        parsed = parse_resume(path)
+        if "ERROR" in parsed:
+            result["error"] = parsed["ERROR"]
+        else:
+            result["sections"] = parsed
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+    result["elapsed"] = round(time.monotonic() - started, 3)
+    return result
+
+
+# --- Checkpointing ---
+
+def load_checkpoint(output_path, retry_errors=False):
+    """Returns the source ids already recorded in an output file (skipping errors if retry_errors)."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn final line from an interrupted run
+            if retry_errors and record.get("error"):
+                continue
+            done.add(record.get("source"))
+    return done
+
+def _open_for_append(output_path):
+    """Opens the output for appending, terminating a torn final line first."""
+    out = open(output_path, 'a+', encoding='utf-8')
+    if out.tell() > 0:
+        out.seek(out.tell() - 1)
+        if out.read(1) != '\n':
+            out.write('\n')
+    return out
+
+
+# --- Ingestion ---
+
+def ingest_resumes(source, skip=(), workers=RESUME_INGEST_WORKERS, max_bytes=RESUME_INGEST_MAX_FILE_BYTES):
+    """
+    Parses every resume under `source` except ids in `skip`.
+    Yields {"source", "sha256", "sections", "error", "elapsed"} in completion order.
+
+    A worker crash (e.g. out of memory on a pathological file) breaks the whole
+    pool and fails every file in flight. Those files are then parsed again one
+    at a time on a fresh pool; only a file that crashes a worker on its own is
+    recorded as an error.
+    """
+    pending = ((source_id, location) for source_id, location in discover_resumes(source)
+               if source_id not in skip)
+    max_in_flight = max(1, workers) * IN_FLIGHT_PER_WORKER
+    pool = ProcessPoolExecutor(max_workers=max(1, workers))
+    in_flight = {}      # future -> (source_id, location, submitted alone)
+    suspects = deque()  # (source_id, location) in flight when the pool broke
+
+    def fill():
+        if suspects:
+            # Isolating a crash: one file in flight at a time
+            if not in_flight:
+                source_id, location = suspects.popleft()
+                in_flight[pool.submit(_parse_one, source_id, location, max_bytes)] = (source_id, location, True)
+            return
+        for source_id, location in pending:
+            in_flight[pool.submit(_parse_one, source_id, location, max_bytes)] = (source_id, location, False)
+            if len(in_flight) >= max_in_flight:
+                return
+
+    try:
+        fill()
+        while in_flight:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                source_id, location, alone = in_flight.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    if alone:
+                        logger.warning(f"{source_id} crashed the parse worker on its own")
+                        yield {"source": source_id, "sha256": None, "sections": None,
+                               "error": "Worker process died while parsing this file.", "elapsed": None}
+                    else:
+                        suspects.append((source_id, location))
+                except Exception as e:
+                    yield {"source": source_id, "sha256": None, "sections": None,
+                           "error": f"{type(e).__name__}: {e}", "elapsed": None}
+            if broken:
+                # Every future of the broken pool fails; none of the others is recorded yet
+                suspects.extend((source_id, location) for source_id, location, _ in in_flight.values())
+                in_flight.clear()
+                logger.warning(f"Parse pool broke, retrying {len(suspects)} files one at a time on a new pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=max(1, workers))
+            fill()
+    finally:
+        for future in in_flight:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='Directory of resumes or a .zip export')
+    parser.add_argument('output', help='JSONL output file (appended to; also the checkpoint)')
+    parser.add_argument('--workers', type=int, default=RESUME_INGEST_WORKERS, help='Parser processes')
+    parser.add_argument('--retry-errors', action='store_true', help='Parse files that failed in an earlier run again')
+    args = parser.parse_args()
+
+    setup_logging(os.getenv("LOG_LEVEL", "WARNING").upper())  # parse_resume logs every file at INFO
+
+    already_done = load_checkpoint(args.output, args.retry_errors)
+    if already_done:
+        print(f"Resuming: {len(already_done)} files already in {args.output}", file=sys.stderr)
+
+    started = time.monotonic()
+    parsed = failed = 0
+    with _open_for_append(args.output) as out:
+        for result in ingest_resumes(args.source, skip=already_done, workers=args.workers):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            if result["error"]:
+                failed += 1
+                print(f"{result['source']}: {result['error']}", file=sys.stderr)
+            else:
+                parsed += 1
+            if (parsed + failed) % 100 == 0:
+                rate = (parsed + failed) / max(time.monotonic() - started, 1e-9)
+                print(f"{parsed + failed} files ({failed} errors), {rate:.1f} files/s", file=sys.stderr)
+    print(f"Done: {parsed} parsed, {failed} errors in {time.monotonic() - started:.1f}s", file=sys.stderr)
@@ -0,0 +1,166 @@
+# resume_parser.py
+"""
+Resume text and section extraction (DOCX via python-docx, PDF via PyPDF2).
+
+Kept apart from app.py so bulk tools (resume_ingest.py) can parse in worker
+processes without building the Flask app.
+"""
+
+import re
+
+from lazy_imports import lazy_import
+from observability import get_logger, timed
+
+# Heavy document libraries load on first use
+docx = lazy_import('docx')  # python-docx
+PyPDF2 = lazy_import('PyPDF2')
+
+logger = get_logger('resume_parser')
+
+
+@timed("parse")
+def parse_resume(file_path):
+    """
+    Parses resume file (PDF or DOCX) and attempts to extract text and basic sections.
+    Returns a dictionary of sections or {"ERROR": "message"}.
+    """
+    text = ""
+    try:
+        file_ext = file_path.rsplit('.', 1)[1].lower()
+        if file_ext == 'docx':
+            doc = docx.Document(file_path)
+            full_text = [para.text for para in doc.paragraphs]
+            text = '\n'.join(full_text)
+        elif file_ext == 'pdf':
+            try:
+                with open(file_path, 'rb') as f:
+                    reader = PyPDF2.PdfReader(f)
+                    if reader.is_encrypted:
+                         # Attempt to decrypt with an empty password, might fail
+                         try:
+                             reader.decrypt('')
+                         except Exception as decrypt_err:
+                             logger.warning(f"Could not decrypt PDF: {decrypt_err}")
+                             return {"ERROR": "Could not decrypt password-protected PDF."}
+
+                    full_text = []
+                    for page_num, page in enumerate(reader.pages):
+                        try:
+                            full_text.append(page.extract_text())
+                        except Exception as page_extract_err:
+                             logger.warning(f"Could not extract text from PDF page {page_num + 1}: {page_extract_err}")
+                             # Optionally add placeholder or skip page
+                    text = '\n'.join(filter(None, full_text)) # Filter out None results if extraction failed on a page
+            except PyPDF2.errors.PdfReadError as pdf_err:
+                 logger.warning(f"Error reading PDF: {pdf_err}")
+                 return {"ERROR": f"Invalid or corrupted PDF file: {pdf_err}"}
+        else:
+            return {"ERROR": "Unsupported file type"}
+
+        if not text.strip():
+            return {"ERROR": "Could not extract text from file. It might be image-based, empty, or corrupted."}
+
+        # --- Basic Section Extraction (Improved Heuristic) ---
+        parsed_data = {}
+        # Regex to find potential section headers (e.g., all caps, or Title Case followed by newline)
+        # This is still a heuristic and might misinterpret lines.
+        # Prioritize common section names first.
+        common_sections = [
+            "SUMMARY", "PROFILE", "OBJECTIVE",
+            "EXPERIENCE", "EMPLOYMENT HISTORY", "WORK HISTORY",
+            "EDUCATION",
+            "KEY SKILLS", "SKILLS", "TECHNICAL SKILLS", "COMPETENCIES",
+            "PROJECTS",
+            "CERTIFICATIONS", "LICENSES",
+            "AWARDS", "HONORS",
+            "PUBLICATIONS",
+            "REFERENCES" # Often excluded or just a note
+        ]
+        # Normalize text slightly for matching
+        normalized_text = "\n" + text.strip() + "\n" # Add newlines for boundary matching
+        section_indices = {}
+
+        # Find indices of common sections first
+        for section in common_sections:
+            # Search for the section name possibly followed by variations (e.g., space, colon) and newline
+            # Case-insensitive search
+            pattern = re.compile(r'\n\s*(' + re.escape(section) + r'[:\s]*)\n', re.IGNORECASE | re.MULTILINE)
+            match = pattern.search(normalized_text)
+            if match:
+                # Store the start index and the matched header text (preserving original case if possible)
+                section_indices[match.start(1)] = match.group(1).strip()
+
+        # Sort found sections by their appearance order
+        sorted_indices = sorted(section_indices.keys())
+
+        # Extract content between sections
+        last_index = 0
+        current_section_name = "HEADER" # Content before the first recognized section
+
+        for i, index in enumerate(sorted_indices):
+            header_text = section_indices[index]
+            content = normalized_text[last_index:index].strip()
+
+            # Assign content to the previous section name
+            if content:
+                 # Normalize common section names for consistency
+                 normalized_section_name = current_section_name.upper()
+                 if "EXPERIENCE" in normalized_section_name or "EMPLOYMENT" in normalized_section_name or "WORK HISTORY" in normalized_section_name:
+                     normalized_section_name = "EXPERIENCE"
+                 elif "EDUCATION" in normalized_section_name:
+                     normalized_section_name = "EDUCATION"
+                 elif normalized_section_name == "KEY SKILLS":
+                     normalized_section_name = "KEY SKILLS"  # Preserve KEY SKILLS as distinct
+                 elif "SKILLS" in normalized_section_name or "TECHNICAL" in normalized_section_name or "COMPETENCIES" in normalized_section_name:
+                     normalized_section_name = "SKILLS"
+                 elif "SUMMARY" in normalized_section_name or "OBJECTIVE" in normalized_section_name or "PROFILE" in normalized_section_name:
+                     normalized_section_name = "SUMMARY"
+                 elif "PROJECTS" in normalized_section_name:
+                     normalized_section_name = "PROJECTS"
+                 # Add more normalizations if needed
+
+                 parsed_data[normalized_section_name] = content
+
+            # Update for the next iteration
+            current_section_name = header_text # Use the found header as the next section name
+            last_index = index + len(header_text) # Start next content search after the header
+
+        # Add the content after the last found section
+        final_content = normalized_text[last_index:].strip()
+        if final_content:
+             # Normalize the last section name as well
+             normalized_section_name = current_section_name.upper()
+             if "EXPERIENCE" in normalized_section_name or "EMPLOYMENT" in normalized_section_name or "WORK HISTORY" in normalized_section_name:
+                 normalized_section_name = "EXPERIENCE"
+             elif "EDUCATION" in normalized_section_name:
+                 normalized_section_name = "EDUCATION"
+             elif normalized_section_name == "KEY SKILLS":
+                 normalized_section_name = "KEY SKILLS"  # Preserve KEY SKILLS as distinct
+             elif "SKILLS" in normalized_section_name or "TECHNICAL" in normalized_section_name or "COMPETENCIES" in normalized_section_name:
+                 normalized_section_name = "SKILLS"
+             elif "SUMMARY" in normalized_section_name or "OBJECTIVE" in normalized_section_name or "PROFILE" in normalized_section_name:
+                 normalized_section_name = "SUMMARY"
+             elif "PROJECTS" in normalized_section_name:
+                 normalized_section_name = "PROJECTS"
+
+             parsed_data[normalized_section_name] = final_content
+
+        # If no sections were found, put everything under "FULL_TEXT"
+        if not parsed_data and text.strip():
+             parsed_data["FULL_TEXT"] = text.strip()
+             # Remove the default "HEADER" if it's empty and we have FULL_TEXT
+             if "HEADER" in parsed_data and not parsed_data["HEADER"]:
+                 del parsed_data["HEADER"]
+
+        # Remove empty sections
+        parsed_data = {k: v for k, v in parsed_data.items() if v and v.strip()}
+
+        logger.info(f"Parsed Sections: {list(parsed_data.keys())}")
+        if not parsed_data:
+             return {"ERROR": "Parsing finished, but no content sections were identified."}
+
+        return parsed_data
+
+    except Exception as e:
+        logger.exception(f"Error parsing resume {file_path}: {e}") # Logs detailed traceback for debugging
+        return {"ERROR": f"An unexpected error occurred during parsing: {e}"}
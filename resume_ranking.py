@@ -0,0 +1,322 @@
+# resume_ranking.py
+"""
+Batched ranking of many parsed resumes against one job description.
+
+Resumes (parse_resume sections, e.g. the JSONL written by resume_ingest.py)
+are tokenized with keyword_match and stored as a sparse term-frequency matrix.
+A query scores every resume at once with BM25 (or TF-IDF cosine) as a single
+sparse matrix-vector product and returns the top k.
+
+The index lives in a directory: an append-only vocabulary and document list in
+meta.json plus one .npz matrix segment per commit, so adding resumes only
+writes the new rows. Segments are merged once there are too many.
+
+Usage:
+    python resume_ranking.py index sections.jsonl index_dir/
+    python resume_ranking.py query index_dir/ job_description.txt [--top 20] [--method bm25|tfidf]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+from keyword_match import extract_terms, analyze_job_description
+from observability import get_logger
+
+# --- Configuration ---
+RANKING_BM25_K1 = float(os.getenv("RANKING_BM25_K1", "1.2"))
+RANKING_BM25_B = float(os.getenv("RANKING_BM25_B", "0.75"))
+RANKING_MAX_SEGMENTS = int(os.getenv("RANKING_MAX_SEGMENTS", "8"))  # Merge segments beyond this
+
+# Contact details and the like carry no signal for ranking
+RANKING_SKIP_SECTIONS = ("HEADER",)
+
+logger = get_logger('resume_ranking')
+
+
+def resume_text(parsed_sections):
+    """Joins the rankable sections of a parse_resume() result."""
+    return '\n'.join(content for name, content in parsed_sections.items()
+                     if name not in RANKING_SKIP_SECTIONS and isinstance(content, str))
+
+
+class ResumeIndex:
+    """
+    Sparse term-frequency index of resumes, persisted under `directory`.
+    add() buffers documents; commit() appends them as a new segment on disk.
+    Re-adding a doc_id replaces the old version (the old row is tombstoned).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.vocabulary = {}   # term -> column
+        self.terms = []        # column -> term
+        self.doc_ids = []      # row -> doc_id
+        self.fingerprints = [] # row -> content hash (or None), to skip unchanged re-adds
+        self.rows = {}         # doc_id -> live row
+        self.deleted = np.zeros(0, dtype=bool)
+        self.segments = []     # segment file names, in row order
+        self._matrix = None    # CSR term frequencies, docs x terms
+        self._pending = []     # (doc_id, fingerprint, {column: tf})
+        self._scoring = {}     # cached per-method scoring matrices (CSC)
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    # --- Persistence ---
+
+    def _meta_path(self):
+        return os.path.join(self.directory, 'meta.json')
+
+    def _atomic_write(self, path, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _load(self):
+        if not os.path.exists(self._meta_path()):
+            self._matrix = sp.csr_matrix((0, 0), dtype=np.float32)
+            return
+        with open(self._meta_path(), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.terms = meta['terms']
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        self.doc_ids = meta['doc_ids']
+        self.fingerprints = meta['fingerprints']
+        self.deleted = np.zeros(len(self.doc_ids), dtype=bool)
+        self.deleted[meta['deleted']] = True
+        self.segments = meta['segments']
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids) if not self.deleted[row]}
+        blocks = []
+        for name in self.segments:
+            block = sp.load_npz(os.path.join(self.directory, name)).tocsr()
+            block.resize((block.shape[0], len(self.terms)))
+            blocks.append(block)
+        self._matrix = (sp.vstack(blocks, format='csr') if blocks
+                        else sp.csr_matrix((0, len(self.terms)), dtype=np.float32))
+
+    def _write_meta(self):
+        meta = {
+            'terms': self.terms,
+            'doc_ids': self.doc_ids,
+            'fingerprints': self.fingerprints,
+            'deleted': np.flatnonzero(self.deleted).tolist(),
+            'segments': self.segments
+        }
+        def write(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        self._atomic_write(self._meta_path(), write)
+
+    # --- Updates ---
+
+    def __len__(self):
+        return len(self.rows) + sum(1 for doc_id, _, _ in self._pending if doc_id not in self.rows)
+
+    def add(self, doc_id, parsed_sections, fingerprint=None):
+        """Queues a resume for the next commit. Returns False if it is already indexed unchanged."""
+        with self._lock:
+            row = self.rows.get(doc_id)
+            if row is not None and fingerprint is not None and self.fingerprints[row] == fingerprint:
+                return False
+            counts, _ = extract_terms(resume_text(parsed_sections))
+            columns = {}
+            for term, tf in counts.items():
+                column = self.vocabulary.get(term)
+                if column is None:
+                    column = self.vocabulary[term] = len(self.terms)
+                    self.terms.append(term)
+                columns[column] = tf
+            self._pending.append((doc_id, fingerprint, columns))
+            return True
+
+    def commit(self):
+        """Writes queued resumes as a new segment and updates the metadata. Returns rows added."""
+        with self._lock:
+            if not self._pending:
+                return 0
+            row_ids, col_ids, values = [], [], []
+            for i, (_, _, columns) in enumerate(self._pending):
+                row_ids.extend([i] * len(columns))
+                col_ids.extend(columns.keys())
+                values.extend(columns.values())
+            block = sp.csr_matrix((np.array(values, dtype=np.float32), (row_ids, col_ids)),
+                                  shape=(len(self._pending), len(self.terms)))
+
+            name = f"segment-{time.time_ns()}.npz"
+            self._atomic_write(os.path.join(self.directory, name), lambda path: sp.save_npz(path, block))
+
+            matrix = self._matrix
+            matrix.resize((matrix.shape[0], len(self.terms)))
+            self._matrix = sp.vstack([matrix, block], format='csr')
+            first_row = len(self.doc_ids)
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(self._pending), dtype=bool)])
+            for offset, (doc_id, fingerprint, _) in enumerate(self._pending):
+                old_row = self.rows.get(doc_id)
+                if old_row is not None:
+                    self.deleted[old_row] = True
+                self.rows[doc_id] = first_row + offset
+                self.doc_ids.append(doc_id)
+                self.fingerprints.append(fingerprint)
+            self.segments.append(name)
+            added = len(self._pending)
+            self._pending = []
+            self._scoring = {}
+
+            if len(self.segments) > RANKING_MAX_SEGMENTS or self.deleted.sum() > 0.2 * max(len(self.doc_ids), 1):
+                self._compact()
+            else:
+                self._write_meta()
+            return added
+
+    def _compact(self):
+        """Rewrites the index as a single segment without tombstoned rows."""
+        live = np.flatnonzero(~self.deleted)
+        self._matrix = self._matrix[live]
+        self.doc_ids = [self.doc_ids[row] for row in live]
+        self.fingerprints = [self.fingerprints[row] for row in live]
+        self.deleted = np.zeros(len(self.doc_ids), dtype=bool)
+        self.rows = {doc_id: row for row, doc_id in enumerate(self.doc_ids)}
+        old_segments = self.segments
+        name = f"segment-{time.time_ns()}.npz"
+        matrix = self._matrix
+        self._atomic_write(os.path.join(self.directory, name), lambda path: sp.save_npz(path, matrix))
+        self.segments = [name]
+        self._write_meta()
+        for old in old_segments:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+        logger.info(f"Compacted ranking index to {len(self.doc_ids)} documents")
+
+    # --- Scoring ---
+
+    def _scoring_matrix(self, method):
+        """Docs x terms weights for `method`, in CSC so query columns slice cheaply."""
+        cached = self._scoring.get(method)
+        if cached is not None:
+            return cached
+        tf = self._matrix
+        n_docs = int((~self.deleted).sum())
+        # Document frequency over live rows only
+        live_tf = tf[np.flatnonzero(~self.deleted)] if self.deleted.any() else tf
+        df = np.bincount(live_tf.indices, minlength=tf.shape[1]).astype(np.float64)
+        row_nnz = np.diff(tf.indptr)
+
+        weights = tf.copy().astype(np.float32)
+        if method == 'bm25':
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            lengths = np.asarray(tf.sum(axis=1)).ravel()
+            average = lengths[~self.deleted].mean() if n_docs else 1.0
+            norm = RANKING_BM25_K1 * (1 - RANKING_BM25_B + RANKING_BM25_B * lengths / max(average, 1e-9))
+            norm_per_entry = np.repeat(norm, row_nnz)
+            weights.data = (tf.data * (RANKING_BM25_K1 + 1) / (tf.data + norm_per_entry)
+                            * idf[tf.indices]).astype(np.float32)
+        elif method == 'tfidf':
+            idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+            weights.data = ((1 + np.log(tf.data)) * idf[tf.indices]).astype(np.float32)
+            row_norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+            row_norms[row_norms == 0] = 1.0
+            weights.data /= np.repeat(row_norms, row_nnz).astype(np.float32)
+        else:
+            raise ValueError(f"Unknown ranking method: {method}")
+
+        cached = self._scoring[method] = weights.tocsc()
+        return cached
+
+    def rank(self, job_description, top_k=20, method='bm25'):
+        """
+        Scores every indexed resume against a job description.
+        Returns [{"doc_id", "score"}] for the top_k, best first.
+        """
+        with self._lock:
+            if self._pending:
+                self.commit()
+            if not self.rows:
+                return []
+            keywords = analyze_job_description(job_description)
+            columns, query_weights = [], []
+            for term, weight in zip(keywords.terms, keywords.weights):
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    columns.append(column)
+                    query_weights.append(weight)
+            if not columns:
+                return []
+
+            weights = self._scoring_matrix(method)
+            query = np.asarray(query_weights, dtype=np.float32)
+            if method == 'tfidf':
+                query /= np.linalg.norm(query) or 1.0
+            scores = np.asarray(weights[:, columns] @ query).ravel()
+            scores[self.deleted] = -np.inf
+
+            k = min(top_k, len(self.rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [{"doc_id": self.doc_ids[row], "score": round(float(scores[row]), 4)}
+                    for row in top if scores[row] > 0]
+
+
+# --- Command Line ---
+
+def index_jsonl(index, path):
+    """Adds every successfully parsed line of a resume_ingest.py JSONL file. Returns (added, skipped)."""
+    added = skipped = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('error') or not record.get('sections'):
+                continue
+            if index.add(record['source'], record['sections'], fingerprint=record.get('sha256')):
+                added += 1
+            else:
+                skipped += 1
+    index.commit()
+    return added, skipped
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    index_parser = commands.add_parser('index', help='Add resumes from a resume_ingest.py JSONL file')
+    index_parser.add_argument('jsonl')
+    index_parser.add_argument('index_dir')
+    query_parser = commands.add_parser('query', help='Rank indexed resumes against a job description file')
+    query_parser.add_argument('index_dir')
+    query_parser.add_argument('job_description')
+    query_parser.add_argument('--top', type=int, default=20)
+    query_parser.add_argument('--method', choices=('bm25', 'tfidf'), default='bm25')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    resume_index = ResumeIndex(args.index_dir)
+    if args.command == 'index':
+        added, skipped = index_jsonl(resume_index, args.jsonl)
+        print(f"Indexed {added} resumes ({skipped} unchanged), {len(resume_index)} total "
+              f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    else:
+        with open(args.job_description, 'r', encoding='utf-8') as f:
+            jd_text = f.read()
+        loaded = time.perf_counter()
+        for rank, hit in enumerate(resume_index.rank(jd_text, args.top, args.method), 1):
+            print(f"{rank:>4}  {hit['score']:>9.4f}  {hit['doc_id']}")
+        print(f"Ranked {len(resume_index)} resumes in {(time.perf_counter() - loaded) * 1000:.0f} ms "
+              f"(index load {(loaded - started) * 1000:.0f} ms)", file=sys.stderr)
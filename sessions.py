@@ -0,0 +1,180 @@
+# sessions.py
+"""
+Server-side tailoring sessions: the original DOCX, its section index and the
+parsed sections, kept after /process so /download-docx and /match only need
+the handle.
+
+Sessions are files in SESSION_DIR, shared by every worker process, so the
+request that uses a session_id can land on any gunicorn worker. A session is
+written once and never changed: the DOCX goes to <id>.docx, then the rest to
+<id>.json, whose presence marks the session as complete.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import tempfile
+import threading
+
+from observability import record_cache_lookup
+
+# --- Configuration ---
+SESSION_DIR = os.getenv("SESSION_DIR", os.path.join("cache", "sessions"))
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))  # Seconds since last use
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(128 * 1024 * 1024)))  # Disk cap across sessions
+SESSION_EVICT_INTERVAL = float(os.getenv("SESSION_EVICT_INTERVAL", "30"))  # Seconds between eviction scans per process
+
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class TailoringSession:
+    """Server-side state for one tailoring round: the original DOCX and its section index."""
+
+    def __init__(self, session_id, content_hash, docx_bytes, section_index, parsed_sections, job_description):
+        self.session_id = session_id
+        self.content_hash = content_hash
+        self.docx_bytes = docx_bytes
+        self.section_index = section_index
+        self.parsed_sections = parsed_sections
+        self.job_description = job_description
+
+
+class SessionStore:
+    """
+    Artifact store keyed by an opaque session handle, one pair of files per
+    session in `directory`. Sessions expire `ttl` seconds after their last use
+    (the mtime of the .json file), checked when they are read. Creating a
+    session scans the directory at most every `evict_interval` seconds, dropping
+    expired sessions and then the least recently used ones while over `max_bytes`.
+    """
+
+    def __init__(self, directory=SESSION_DIR, ttl=SESSION_TTL, max_bytes=SESSION_MAX_BYTES,
+                 evict_interval=SESSION_EVICT_INTERVAL):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self._next_evict = 0.0
+        self._evict_lock = threading.Lock()
+
+    def create(self, content_hash, docx_bytes, section_index, parsed_sections, job_description=None):
+        """Stores a new session and returns its handle."""
+        session_id = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._path(session_id, '.docx'), docx_bytes)
+        self._write(self._path(session_id, '.json'), json.dumps({
+            "content_hash": content_hash,
+            "section_index": section_index,
+            "parsed_sections": parsed_sections,
+            "job_description": job_description
+        }).encode('utf-8'))
+        if self._evict_due():
+            self._evict()
+        return session_id
+
+    def get(self, session_id):
+        """Returns the live session for a handle, or None if it is unknown or expired."""
+        session = self._read(session_id)
+        record_cache_lookup("session", session is not None)
+        return session
+
+    def discard(self, session_id):
+        """Drops a session early."""
+        if self._valid(session_id):
+            self._remove(session_id)
+
+    def _read(self, session_id):
+        if not self._valid(session_id):
+            return None
+        meta_path = self._path(session_id, '.json')
+        try:
+            if time.time() - os.path.getmtime(meta_path) > self.ttl:
+                self._remove(session_id)
+                return None
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with open(self._path(session_id, '.docx'), 'rb') as f:
+                docx_bytes = f.read()
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            # Unknown, or evicted by another worker while being read
+            return None
+        return TailoringSession(session_id, data["content_hash"], docx_bytes, data["section_index"],
+                                data["parsed_sections"], data["job_description"])
+
+    def _write(self, path, content):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-session-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _evict_due(self):
+        # A scan lists the whole directory, so each process runs one per interval
+        now = time.monotonic()
+        with self._evict_lock:
+            if now < self._next_evict:
+                return False
+            self._next_evict = now + self.evict_interval
+            return True
+
+    def _evict(self):
+        """Drops expired sessions, then the least recently used while over max_bytes."""
+        # Sessions never change after create, so workers evicting at once only race on
+        # removing the same files; no lock is needed
+        now = time.time()
+        sessions = []
+        for session_id in self._session_ids(('.json', '.docx')):
+            # A .docx without its .json is a create that did not finish; it ages out the same way
+            stats = []
+            for suffix in ('.json', '.docx'):
+                try:
+                    stats.append(os.stat(self._path(session_id, suffix)))
+                except OSError:
+                    pass
+            if not stats:
+                continue
+            last_used = max(stat.st_mtime for stat in stats)
+            size = sum(stat.st_size for stat in stats)
+            if now - last_used > self.ttl:
+                self._remove(session_id)
+            else:
+                sessions.append((last_used, size, session_id))
+        total_bytes = sum(size for _, size, _ in sessions)
+        for _, size, session_id in sorted(sessions):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(session_id)
+            total_bytes -= size
+
+    def _session_ids(self, suffixes=('.json',)):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        ids = {os.path.splitext(name)[0] for name in names if os.path.splitext(name)[1] in suffixes}
+        return [session_id for session_id in ids if self._valid(session_id)]
+
+    def _remove(self, session_id):
+        for suffix in ('.json', '.docx'):
+            try:
+                os.remove(self._path(session_id, suffix))
+            except OSError:
+                pass
+
+    def _path(self, session_id, suffix):
+        return os.path.join(self.directory, session_id + suffix)
+
+    @staticmethod
+    def _valid(session_id):
+        # Handles come from clients; anything but our own hex ids is unknown
+        return isinstance(session_id, str) and bool(SESSION_ID_PATTERN.match(session_id))
+
+    def __len__(self):
+        return len(self._session_ids())
@@ -0,0 +1,200 @@
+# toolchain.py
+"""
+Registry of the external document tools (pdflatex, soffice, docx2pdf) and
+what they can do.
+
+Each tool has a cheap `locate` function (PATH lookup, no subprocess) and an
+expensive `probe` (e.g. compiling a test document with the required LaTeX
+packages). Probe results are kept in a small JSON file keyed by the located
+binary's path, mtime and size, so every worker process and every restart
+reuses them until the binary changes. A file lock makes concurrent workers
+wait for one probe instead of each running its own. Inside a process the
+resolved capabilities are kept in memory, so requests do not start a probe;
+a failed result is kept for TOOLCHAIN_FAILURE_TTL only, so a tool installed
+while the app runs is picked up without a restart.
+"""
+
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from observability import get_logger, record_cache_lookup
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers may probe concurrently, the cache file stays consistent
+    fcntl = None
+
+# --- Configuration ---
+TOOLCHAIN_CACHE_PATH = os.getenv("TOOLCHAIN_CACHE_PATH", os.path.join("cache", "toolchain.json"))
+TOOLCHAIN_CACHE_TTL = int(os.getenv("TOOLCHAIN_CACHE_TTL", str(7 * 24 * 3600)))  # Re-probe a working tool after this long
+TOOLCHAIN_FAILURE_TTL = int(os.getenv("TOOLCHAIN_FAILURE_TTL", "300"))  # Re-probe a failing tool after this long
+
+logger = get_logger('toolchain')
+
+
+def fingerprint(path):
+    """[path, mtime_ns, size] of a located tool, or None when it was not found."""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+
+class ToolchainRegistry:
+    """
+    Capabilities by tool name. A capability is the dict returned by the tool's
+    probe, plus "available" (bool) and "path" (the located binary or module).
+    """
+
+    def __init__(self, cache_path=TOOLCHAIN_CACHE_PATH, ttl=TOOLCHAIN_CACHE_TTL, failure_ttl=TOOLCHAIN_FAILURE_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._tools = {}      # name -> (locate, probe)
+        self._resolved = {}   # name -> capability, for this process
+        self._resolved_at = {}  # name -> time.monotonic() of the resolution
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, locate, probe):
+        """`locate()` returns a path or None; `probe(path)` returns a dict with at least "available"."""
+        self._tools[name] = (locate, probe)
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        """Returns the capability of `name`, from memory, the shared cache file or a new probe."""
+        capability = self._current(name)
+        if capability is not None:
+            return capability
+        with self._locks[name]:
+            capability = self._current(name)
+            if capability is None:
+                capability = self._resolve(name)
+                self._resolved[name] = capability
+                self._resolved_at[name] = time.monotonic()
+            return capability
+
+    def _current(self, name):
+        """The in-memory capability, unless it is a failure older than failure_ttl."""
+        capability = self._resolved.get(name)
+        if capability is None or capability["available"]:
+            return capability
+        if time.monotonic() - self._resolved_at.get(name, 0.0) > self.failure_ttl:
+            return None
+        return capability
+
+    def available(self, name):
+        return self.get(name)["available"]
+
+    def path(self, name):
+        """The located binary of an available tool, else None."""
+        capability = self.get(name)
+        return capability["path"] if capability["available"] else None
+
+    def refresh(self, name):
+        """Probes `name` again, replacing the cached result in memory and on disk."""
+        with self._locks[name]:
+            self._resolved.pop(name, None)
+            capability = self._resolve(name, force=True)
+            self._resolved[name] = capability
+            self._resolved_at[name] = time.monotonic()
+            return capability
+
+    def _resolve(self, name, force=False):
+        locate, probe = self._tools[name]
+        path = locate()
+        key = fingerprint(path)
+        if not force:
+            capability = self._cached(name, key)
+            if capability is not None:
+                record_cache_lookup("toolchain", True)
+                return capability
+        record_cache_lookup("toolchain", False)
+        with self._file_lock():
+            # Another worker may have probed while this one waited for the lock
+            capability = None if force else self._cached(name, key)
+            if capability is None:
+                capability = self._probe(name, probe, path)
+                self._store(name, key, capability)
+        return capability
+
+    def _probe(self, name, probe, path):
+        started = time.perf_counter()
+        if path is None:
+            capability = {"available": False}
+        else:
+            try:
+                capability = dict(probe(path))
+            except Exception as e:
+                logger.error(f"Probing {name} at {path} failed: {e}")
+                capability = {"available": False, "error": str(e)}
+        capability["path"] = path
+        logger.info(f"Probed {name} in {time.perf_counter() - started:.2f}s: "
+                    f"{'available' if capability['available'] else 'unavailable'} ({path or 'not found'})")
+        return capability
+
+    def _cached(self, name, key):
+        entry = self._read().get(name)
+        if not entry or entry.get("fingerprint") != key:
+            return None
+        capability = entry.get("capability") or {}
+        ttl = self.ttl if capability.get("available") else self.failure_ttl
+        if time.time() - entry.get("probed_at", 0) > ttl:
+            return None
+        return capability
+
+    def _read(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _store(self, name, key, capability):
+        data = self._read()
+        data[name] = {"fingerprint": key, "capability": capability, "probed_at": time.time()}
+        directory = os.path.dirname(self.cache_path) or '.'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-toolchain-')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=1, sort_keys=True)
+                os.replace(tmp_path, self.cache_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            # The result still holds for this process
+            logger.warning(f"Could not write the toolchain cache {self.cache_path}: {e}")
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            lock_file = open(self.cache_path + '.lock', 'a')
+        except OSError:
+            yield
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def status(self):
+        """The capabilities resolved so far in this process (JSON-serializable)."""
+        return dict(self._resolved)
@@ -0,0 +1,7 @@
+# wsgi.py
+"""
+WSGI entry point: gunicorn -c gunicorn.conf.py wsgi:app
+The application is built by app.create_app().
+"""
+
+from app import app  # noqa: F401